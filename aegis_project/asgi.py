@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Servido por ASGI (p. ej. ``uvicorn aegis_project.asgi:application``), el stream de eventos de
+la bandeja de autorizaciones (operaciones.views.eventos_autorizaciones) mantiene la conexión
+abierta sin ocupar un worker por supervisor; por WSGI ese stream se degrada a sondeo.
 """
 
 import os
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Nuestras apps
     'core',
     'gestion',
@@ -56,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
+    'core.middleware.PerfilPermisosMiddleware',
 ]
 
 ROOT_URLCONF = 'aegis_project.urls'
@@ -96,6 +99,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Las reglas de planes, facetas y contadores se invalidan publicando versiones en esta caché.
+# Con varios workers debe ser compartida (Redis): export AEGIS_REDIS_URL=redis://localhost:6379/1
+
+if os.environ.get('AEGIS_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['AEGIS_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'aegis-claims',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -141,6 +165,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Le dice a Django que nuestro modelo de autenticación es el que creamos.
 AUTH_USER_MODEL = 'core.Usuario'
 
+# Carga el Rol junto con el usuario en cada request (ver core/backends.py)
+AUTHENTICATION_BACKENDS = ['core.backends.UsuarioRolBackend']
+
+# Historial (simple_history): con True, dentro de una transacción las filas se acumulan y se
+# insertan en bloque al confirmarla (ver core/auditoria.py). Es más rápido en cargas masivas,
+# pero el historial se escribe fuera de la transacción de los datos y puede perderse si ese
+# INSERT falla. False = una fila por save, en la misma transacción.
+AUDITORIA_DIFERIDA = False
+
+# Carpeta donde archivar_historial deja los meses de historial exportados (JSONL comprimido)
+HISTORIAL_ARCHIVO_DIR = os.environ.get('AEGIS_HISTORIAL_DIR', BASE_DIR / 'archivo_historial')
+
 # CONFIGURACIÓN DE CORREO PARA DESARROLLO
 # Imprime los correos en la consola en lugar de enviarlos realmente.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
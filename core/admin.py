@@ -9,7 +9,7 @@ from django.utils.http import urlsafe_base64_encode
 from django.urls import reverse
 from django.core.mail import send_mail
 
-from .models import Usuario, Rol
+from .models import HistorialArchivado, Usuario, Rol
 
 # Definimos una clase de administración personalizada para nuestro modelo de Usuario
 class UsuarioAdmin(UserAdmin):
@@ -56,5 +56,17 @@ admin.site.register(Rol)
 # Registramos nuestro modelo Usuario con la clase de admin personalizada
 admin.site.register(Usuario, UsuarioAdmin)
 
+# Índice de historial archivado: solo consulta, lo escribe el comando archivar_historial
+@admin.register(HistorialArchivado)
+class HistorialArchivadoAdmin(admin.ModelAdmin):
+    list_display = ('modelo', 'mes', 'filas', 'archivo', 'fecha_archivo')
+    list_filter = ('modelo',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Des-registramos el modelo Group para evitar el error 404
 admin.site.unregister(Group)
\ No newline at end of file
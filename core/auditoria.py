@@ -0,0 +1,149 @@
+# core/auditoria.py
+
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
+
+# Filas de historial por INSERT al vaciar el buffer de una transacción.
+TAMANO_LOTE_HISTORIAL = 1000
+
+# {nombre del modelo histórico: {'registros': n, 'inserts': n, 'segundos': s}} de este proceso.
+_estadisticas = {}
+_candado = threading.Lock()
+
+def _registrar(modelo, registros, inserts, segundos):
+    with _candado:
+        datos = _estadisticas.setdefault(modelo._meta.label, {'registros': 0, 'inserts': 0, 'segundos': 0.0})
+        datos['registros'] += registros
+        datos['inserts'] += inserts
+        datos['segundos'] += segundos
+
+def estadisticas_auditoria(reiniciar=False):
+    """
+    Costo acumulado del historial en este proceso, por modelo histórico: filas escritas, INSERTs
+    ejecutados y segundos dedicados a construirlas y escribirlas.
+    """
+    with _candado:
+        copia = {modelo: dict(datos) for modelo, datos in _estadisticas.items()}
+        if reiniciar:
+            _estadisticas.clear()
+    return copia
+
+@contextmanager
+def medir_auditoria():
+    """
+    Mide el historial escrito dentro del bloque (p. ej. una importación en la shell):
+
+        with medir_auditoria() as costo:
+            ...
+        print(costo)
+    """
+    antes = estadisticas_auditoria()
+    costo = {}
+    try:
+        yield costo
+    finally:
+        for modelo, datos in estadisticas_auditoria().items():
+            previo = antes.get(modelo, {'registros': 0, 'inserts': 0, 'segundos': 0.0})
+            delta = {clave: datos[clave] - previo[clave] for clave in datos}
+            if delta['registros']:
+                costo[modelo] = delta
+
+class _BufferHistorial:
+    """Filas de historial pendientes de una transacción; se insertan al confirmarla (on_commit)."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.pendientes = {}  # {modelo histórico: [(registro, instancia, usuario, motivo)]}
+        self.vaciado = False
+
+    def agregar(self, modelo, registro, instancia, usuario, motivo):
+        self.pendientes.setdefault(modelo, []).append((registro, instancia, usuario, motivo))
+
+    def __call__(self):
+        self.vaciado = True
+        for modelo, filas in self.pendientes.items():
+            inicio = time.perf_counter()
+            modelo.objects.using(self.alias).bulk_create([f[0] for f in filas], batch_size=TAMANO_LOTE_HISTORIAL)
+            for registro, instancia, usuario, motivo in filas:
+                post_create_historical_record.send(
+                    sender=modelo, instance=instancia, history_instance=registro,
+                    history_date=registro.history_date, history_user=usuario,
+                    history_change_reason=motivo, using=self.alias,
+                )
+            inserts = -(-len(filas) // TAMANO_LOTE_HISTORIAL)
+            _registrar(modelo, 0, inserts, time.perf_counter() - inicio)
+        self.pendientes = {}
+
+class HistorialDiferido(HistoricalRecords):
+    """
+    HistoricalRecords que, dentro de una transacción, acumula las filas de historial y las inserta
+    con un bulk_create por modelo al confirmarla. Así un proceso que guarda miles de objetos en una
+    transacción paga unos pocos INSERTs de historial y no retiene esos locks mientras trabaja.
+
+    Si la transacción se revierte, el buffer se descarta con ella. Fuera de una transacción, dentro
+    de savepoints anidados (que pueden revertirse por separado) o con campos M2M historizados,
+    se escribe en el momento, igual que HistoricalRecords.
+
+    Solo difiere con AUDITORIA_DIFERIDA = True (desactivado por defecto): las filas se insertan
+    después de confirmar los datos, así que si ese INSERT falla o el proceso muere en ese momento,
+    el cambio queda sin su historial.
+    """
+
+    def create_historical_record(self, instance, history_type, using=None):
+        inicio = time.perf_counter()
+        manager = getattr(instance, self.manager_name)
+        alias = (using if self.use_base_model_db else None) or router.db_for_write(manager.model, instance=instance)
+        conexion = connections[alias]
+        diferir = (
+            getattr(settings, 'AUDITORIA_DIFERIDA', False)
+            and conexion.in_atomic_block
+            and not conexion.savepoint_ids
+            and not manager.model._history_m2m_fields
+        )
+        if not diferir:
+            super().create_historical_record(instance, history_type, using=using)
+            _registrar(manager.model, 1, 1, time.perf_counter() - inicio)
+            return
+
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+        attrs = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+        if getattr(manager.model, 'history_relation', None) is not None:
+            attrs['history_relation'] = instance
+        registro = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=manager.model, instance=instance, history_date=history_date,
+            history_user=history_user, history_change_reason=history_change_reason,
+            history_instance=registro, using=using,
+        )
+        self._buffer(conexion, alias).agregar(manager.model, registro, instance, history_user, history_change_reason)
+        _registrar(manager.model, 1, 0, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _buffer(conexion, alias):
+        # Un buffer por transacción. La conexión guarda solo una referencia débil: el buffer vive
+        # mientras su on_commit esté pendiente. Al confirmar se marca vaciado; al revertir, Django
+        # descarta el on_commit y con él el buffer, así que la próxima transacción empieza uno nuevo.
+        referencia = getattr(conexion, '_buffer_historial', None)
+        buffer = referencia() if referencia is not None else None
+        if buffer is None or buffer.vaciado:
+            buffer = _BufferHistorial(alias)
+            conexion._buffer_historial = weakref.ref(buffer)
+            transaction.on_commit(buffer, using=alias)
+        return buffer
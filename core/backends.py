@@ -0,0 +1,24 @@
+# core/backends.py
+
+from django.contrib.auth.backends import ModelBackend
+
+from .models import Usuario
+
+class UsuarioRolBackend(ModelBackend):
+    """
+    Igual que ModelBackend, pero carga el Rol junto con el usuario en la misma query,
+    para que los chequeos de permisos por rol (core/permisos.py) no consulten la base de datos.
+    """
+    def get_user(self, user_id):
+        try:
+            user = Usuario._default_manager.select_related('rol').get(pk=user_id)
+        except Usuario.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await Usuario._default_manager.select_related('rol').aget(pk=user_id)
+        except Usuario.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -1,20 +1,20 @@
 # core/context_processors.py
 
-from operaciones.models import OrdenDeServicio
+from operaciones.notificaciones import contar_pendientes
+from .permisos import perfil_de
 
 def notifications_context(request):
     """
-    Calcula el número de autorizaciones pendientes para mostrarlo en la cabecera.
+    Número de autorizaciones pendientes para mostrarlo en la cabecera.
+    Se lee del contador en caché (operaciones/notificaciones.py), sin queries por render.
     """
     pending_count = 0
-    if request.user.is_authenticated:
-        # Asumimos que los supervisores y superusuarios pueden ver la bandeja
-        is_supervisor = request.user.is_superuser or (hasattr(request.user, 'rol') and request.user.rol and 'supervisor' in request.user.rol.nombre_rol.lower())
-        if is_supervisor:
-            pending_count = OrdenDeServicio.objects.filter(
-                estado_os=OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
-            ).count()
+    perfil = perfil_de(request.user)
+    # Los supervisores y superusuarios pueden ver la bandeja
+    if perfil.puede_autorizar:
+        pending_count = contar_pendientes()
             
     return {
-        'pending_authorizations_count': pending_count
-    }
\ No newline at end of file
+        'pending_authorizations_count': pending_count,
+        'perfil': perfil,
+    }
@@ -0,0 +1,80 @@
+# core/exportacion.py
+
+import csv
+import tempfile
+
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.urls import path
+
+from gestion.utils import Echo
+
+# Filas que se leen por vuelta del cursor del servidor (y por cada prefetch de relaciones).
+TAMANO_BLOQUE = 2000
+
+def respuesta_csv(nombre_archivo, encabezados, filas):
+    """CSV en streaming: cada fila se escribe y se envía sin acumular el archivo en memoria."""
+    writer = csv.writer(Echo())
+
+    def contenido():
+        yield '\ufeff'  # BOM para que Excel reconozca UTF-8
+        yield writer.writerow(encabezados)
+        for fila in filas:
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(contenido(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.csv"'
+    return response
+
+def respuesta_xlsx(nombre_archivo, encabezados, filas):
+    """
+    XLSX generado con openpyxl en modo write_only: las filas se vuelcan a un archivo temporal a
+    medida que llegan y luego se envía ese archivo por bloques. Un XLSX es un zip y no puede
+    enviarse antes de terminarlo, pero la memoria del proceso no crece con la cantidad de filas.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(nombre_archivo[:31])
+    hoja.append(encabezados)
+    for fila in filas:
+        hoja.append(fila)
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return FileResponse(
+        archivo, as_attachment=True, filename=f'{nombre_archivo}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+FORMATOS_EXPORTACION = {'csv': respuesta_csv, 'xlsx': respuesta_xlsx}
+
+class ExportacionStreamingMixin:
+    """
+    Agrega a un ModelAdmin las URLs exportar/csv/ y exportar/xlsx/, que exportan lo que muestra
+    el listado (mismos filtros, búsqueda y orden) recorriendo la base con un cursor del servidor.
+
+    Cada admin define `exportacion_encabezados`, `exportacion_nombre` y `filas_exportacion(queryset)`,
+    donde aplica sus select_related/prefetch_related (se resuelven una vez por bloque).
+    """
+    exportacion_nombre = 'exportacion'
+    exportacion_encabezados = ()
+
+    def filas_exportacion(self, queryset):
+        raise NotImplementedError
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            path('exportar/<str:formato>/', self.admin_site.admin_view(self.exportacion_streaming_view), name='%s_%s_exportar' % info),
+        ]
+        return urls + super().get_urls()
+
+    def exportacion_streaming_view(self, request, formato):
+        if formato not in FORMATOS_EXPORTACION:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        queryset = self.get_changelist_instance(request).get_queryset(request)
+        filas = self.filas_exportacion(queryset)
+        return FORMATOS_EXPORTACION[formato](self.exportacion_nombre, list(self.exportacion_encabezados), filas)
@@ -0,0 +1,148 @@
+# core/historial.py
+
+import gzip
+import hashlib
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import HistorialArchivado
+
+# Modelos cuyo historial se archiva si no se indica otro.
+MODELOS_POR_DEFECTO = ('gestion.Asegurado', 'operaciones.OrdenDeServicio')
+
+# Filas leídas/insertadas por vuelta al exportar o restaurar.
+TAMANO_BLOQUE = 5000
+
+def directorio_archivo():
+    return Path(getattr(settings, 'HISTORIAL_ARCHIVO_DIR', settings.BASE_DIR / 'archivo_historial'))
+
+def modelo_historico(etiqueta):
+    """'gestion.Asegurado' -> gestion.HistoricalAsegurado"""
+    return apps.get_model(etiqueta).history.model
+
+def _siguiente_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+def _inicio(mes):
+    return timezone.make_aware(datetime(mes.year, mes.month, 1))
+
+def meses_por_archivar(historico, corte):
+    """Meses (date del día 1) con historial anterior a `corte` (también día 1), del más antiguo al más nuevo."""
+    return [
+        fecha.date().replace(day=1)
+        for fecha in historico.objects.filter(history_date__lt=_inicio(corte)).datetimes('history_date', 'month')
+    ]
+
+def archivar_mes(historico, mes):
+    """
+    Exporta el historial de `mes` a un JSONL comprimido, lo registra en HistorialArchivado y lo
+    borra de la tabla. El archivo se escribe y se cierra antes de borrar; el borrado y el registro
+    van en una transacción y solo alcanzan a las filas exportadas (por rango de history_id).
+    Devuelve el HistorialArchivado creado, o None si el mes ya no tenía filas.
+    """
+    filas = historico.objects.filter(
+        history_date__gte=_inicio(mes), history_date__lt=_inicio(_siguiente_mes(mes))
+    ).order_by('history_id')
+    campo_objeto = historico.instance_type._meta.pk.attname
+    campos = [f.attname for f in historico._meta.concrete_fields]
+
+    etiqueta = historico._meta.label
+    relativa = Path(historico._meta.app_label) / historico._meta.model_name / f"{mes:%Y-%m}_{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+    ruta = directorio_archivo() / relativa
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    sha = hashlib.sha256()
+    total = 0
+    history_ids = [None, None]  # [mínimo, máximo]
+    objetos = [None, None]
+    with gzip.open(ruta, 'wt', encoding='utf-8') as salida:
+        for fila in filas.values(*campos).iterator(chunk_size=TAMANO_BLOQUE):
+            linea = json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            salida.write(linea)
+            sha.update(linea.encode())
+            total += 1
+            for rango, valor in ((history_ids, fila['history_id']), (objetos, fila[campo_objeto])):
+                rango[0] = valor if rango[0] is None else min(rango[0], valor)
+                rango[1] = valor if rango[1] is None else max(rango[1], valor)
+    if not total:
+        ruta.unlink()
+        return None
+
+    with transaction.atomic():
+        registro = HistorialArchivado.objects.create(
+            modelo=etiqueta, mes=mes, archivo=str(relativa), filas=total, sha256=sha.hexdigest(),
+            history_id_min=history_ids[0], history_id_max=history_ids[1],
+            objeto_id_min=objetos[0], objeto_id_max=objetos[1],
+        )
+        borradas, _ = filas.filter(history_id__lte=registro.history_id_max).delete()
+        if borradas != total:
+            # Alguien insertó historial de un mes pasado mientras se exportaba; no se borra a ciegas.
+            ruta.unlink()
+            raise RuntimeError(f"{etiqueta} {mes:%Y-%m}: se exportaron {total} filas pero se iban a borrar {borradas}.")
+    return registro
+
+def vacuum(historico):
+    """VACUUM ANALYZE de la tabla histórica para recuperar el espacio y el índice tras archivar."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM (ANALYZE) {connection.ops.quote_name(historico._meta.db_table)}')
+
+def verificar_archivo(registro):
+    """Comprueba que el archivo exista y conserve el sha256 con que se registró."""
+    sha = hashlib.sha256()
+    with gzip.open(directorio_archivo() / registro.archivo, 'rt', encoding='utf-8') as entrada:
+        for linea in entrada:
+            sha.update(linea.encode())
+    if sha.hexdigest() != registro.sha256:
+        raise ValueError(f"El archivo {registro.archivo} no coincide con su sha256 registrado.")
+
+def leer_archivo(registro):
+    """Genera las filas (dict) de un archivo de historial."""
+    with gzip.open(directorio_archivo() / registro.archivo, 'rt', encoding='utf-8') as entrada:
+        for linea in entrada:
+            yield json.loads(linea)
+
+def _insertar_faltantes(historico, lote):
+    """Inserta las filas de `lote` que no están en la tabla histórica; devuelve cuántas insertó."""
+    existentes = set(
+        historico.objects.filter(pk__in=[fila.pk for fila in lote]).values_list('pk', flat=True)
+    )
+    nuevas = [fila for fila in lote if fila.pk not in existentes]
+    historico.objects.bulk_create(nuevas, ignore_conflicts=True)
+    return len(nuevas)
+
+def restaurar_historial(historico, objeto_id=None, mes=None):
+    """
+    Vuelve a insertar en la tabla histórica las filas archivadas (de un objeto y/o un mes).
+    El índice HistorialArchivado acota qué archivos leer; las filas conservan su history_id
+    original, así que restaurar dos veces no duplica nada. Devuelve la cantidad de filas
+    insertadas (las que ya estaban en la tabla no cuentan).
+    """
+    registros = HistorialArchivado.objects.filter(modelo=historico._meta.label)
+    if mes is not None:
+        registros = registros.filter(mes=mes)
+    if objeto_id is not None:
+        registros = registros.filter(objeto_id_min__lte=objeto_id, objeto_id_max__gte=objeto_id)
+
+    campo_objeto = historico.instance_type._meta.pk.attname
+    campos = {f.attname: f for f in historico._meta.concrete_fields}
+    restauradas = 0
+    for registro in registros.order_by('mes', 'id'):
+        verificar_archivo(registro)
+        lote = []
+        for fila in leer_archivo(registro):
+            if objeto_id is not None and fila[campo_objeto] != objeto_id:
+                continue
+            lote.append(historico(**{k: campos[k].to_python(v) for k, v in fila.items() if k in campos}))
+            if len(lote) >= TAMANO_BLOQUE:
+                restauradas += _insertar_faltantes(historico, lote)
+                lote = []
+        if lote:
+            restauradas += _insertar_faltantes(historico, lote)
+    return restauradas
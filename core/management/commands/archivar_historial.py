@@ -0,0 +1,43 @@
+# core/management/commands/archivar_historial.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.historial import MODELOS_POR_DEFECTO, archivar_mes, meses_por_archivar, modelo_historico, vacuum
+
+class Command(BaseCommand):
+    help = (
+        "Archiva por mes el historial (simple_history) más antiguo que la retención: lo exporta a "
+        "JSONL comprimido en HISTORIAL_ARCHIVO_DIR, lo registra en HistorialArchivado y lo borra de la tabla."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=12, help="Meses de historial que se conservan en la base (por defecto 12).")
+        parser.add_argument('--modelo', action='append', help="Modelo cuyo historial se archiva, p. ej. gestion.Asegurado. Se puede repetir.")
+        parser.add_argument('--simular', action='store_true', help="Solo lista los meses que se archivarían.")
+        parser.add_argument('--vacuum', action='store_true', help="Ejecuta VACUUM ANALYZE sobre cada tabla archivada.")
+
+    def handle(self, *args, **options):
+        if options['meses'] < 1:
+            raise CommandError("--meses debe ser al menos 1.")
+        hoy = date.today()
+        indice = hoy.year * 12 + hoy.month - 1 - options['meses']
+        corte = date(indice // 12, indice % 12 + 1, 1)
+
+        for etiqueta in options['modelo'] or MODELOS_POR_DEFECTO:
+            try:
+                historico = modelo_historico(etiqueta)
+            except (LookupError, AttributeError):
+                raise CommandError(f"'{etiqueta}' no es un modelo con historial.")
+            meses = meses_por_archivar(historico, corte)
+            if options['simular']:
+                self.stdout.write(f"{historico._meta.label}: {', '.join(f'{m:%Y-%m}' for m in meses) or 'nada que archivar'}")
+                continue
+            for mes in meses:
+                registro = archivar_mes(historico, mes)
+                if registro:
+                    self.stdout.write(f"{registro.modelo} {mes:%Y-%m}: {registro.filas} filas -> {registro.archivo}")
+            if meses and options['vacuum']:
+                vacuum(historico)
+        self.stdout.write(self.style.SUCCESS(f"Historial anterior a {corte:%Y-%m} archivado."))
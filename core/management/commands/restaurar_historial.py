@@ -0,0 +1,28 @@
+# core/management/commands/restaurar_historial.py
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.historial import modelo_historico, restaurar_historial
+
+class Command(BaseCommand):
+    help = "Restaura en la base el historial archivado de un objeto y/o un mes (para auditorías)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', help="Modelo con historial, p. ej. gestion.Asegurado.")
+        parser.add_argument('--objeto', type=int, help="ID del objeto cuyo historial se restaura.")
+        parser.add_argument('--mes', type=lambda v: datetime.strptime(v, '%Y-%m').date(), help="Mes archivado (AAAA-MM).")
+
+    def handle(self, *args, **options):
+        if options['objeto'] is None and options['mes'] is None:
+            raise CommandError("Indique --objeto, --mes o ambos.")
+        try:
+            historico = modelo_historico(options['modelo'])
+        except (LookupError, AttributeError):
+            raise CommandError(f"'{options['modelo']}' no es un modelo con historial.")
+        try:
+            restauradas = restaurar_historial(historico, objeto_id=options['objeto'], mes=options['mes'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"{restauradas} filas de historial restauradas (las que ya estaban en la base se omiten)."))
@@ -0,0 +1,14 @@
+# core/middleware.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .permisos import perfil_de
+
+class PerfilPermisosMiddleware:
+    """Expone request.perfil (core.permisos.PerfilPermisos), calculado solo si alguien lo usa."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.perfil = SimpleLazyObject(lambda: perfil_de(request.user))
+        return self.get_response(request)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_rol_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(help_text='Por ejemplo gestion.HistoricalAsegurado', max_length=100, verbose_name='Modelo Histórico')),
+                ('mes', models.DateField(help_text='Primer día del mes de history_date.', verbose_name='Mes')),
+                ('archivo', models.CharField(help_text='Ruta relativa a HISTORIAL_ARCHIVO_DIR.', max_length=255, verbose_name='Archivo')),
+                ('filas', models.PositiveIntegerField(verbose_name='Filas')),
+                ('sha256', models.CharField(max_length=64)),
+                ('history_id_min', models.BigIntegerField()),
+                ('history_id_max', models.BigIntegerField()),
+                ('objeto_id_min', models.BigIntegerField(verbose_name='ID de Objeto Mínimo')),
+                ('objeto_id_max', models.BigIntegerField(verbose_name='ID de Objeto Máximo')),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Archivo')),
+            ],
+            options={
+                'verbose_name': 'Historial Archivado',
+                'verbose_name_plural': 'Historiales Archivados',
+                'indexes': [models.Index(fields=['modelo', 'mes'], name='core_histor_modelo_2fe434_idx')],
+            },
+        ),
+    ]
@@ -38,4 +38,27 @@ class Usuario(AbstractUser):
     )
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+# Índice de los archivos de historial archivado (ver core/historial.py)
+# Cada fila es un mes de un modelo histórico exportado a JSONL comprimido y borrado de la base.
+class HistorialArchivado(models.Model):
+    modelo = models.CharField("Modelo Histórico", max_length=100, help_text="Por ejemplo gestion.HistoricalAsegurado")
+    mes = models.DateField("Mes", help_text="Primer día del mes de history_date.")
+    archivo = models.CharField("Archivo", max_length=255, help_text="Ruta relativa a HISTORIAL_ARCHIVO_DIR.")
+    filas = models.PositiveIntegerField("Filas")
+    sha256 = models.CharField(max_length=64)
+    history_id_min = models.BigIntegerField()
+    history_id_max = models.BigIntegerField()
+    objeto_id_min = models.BigIntegerField("ID de Objeto Mínimo")
+    objeto_id_max = models.BigIntegerField("ID de Objeto Máximo")
+    fecha_archivo = models.DateTimeField("Fecha de Archivo", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Historial Archivado"
+        verbose_name_plural = "Historiales Archivados"
+        indexes = [models.Index(fields=['modelo', 'mes'])]
+
+    def __str__(self):
+        return f"{self.modelo} {self.mes:%Y-%m} ({self.filas} filas)"
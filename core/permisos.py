@@ -0,0 +1,44 @@
+# core/permisos.py
+
+class PerfilPermisos:
+    """
+    Capacidades de un usuario según su rol, calculadas una sola vez por request.
+    Reemplaza las comparaciones repetidas sobre user.rol.nombre_rol en vistas y plantillas.
+    """
+    __slots__ = ('rol_nombre', 'es_superusuario', 'es_supervisor', 'es_operaciones', 'es_convenios', 'es_staff')
+
+    def __init__(self, user):
+        rol_nombre = ''
+        if user.is_authenticated and getattr(user, 'rol', None):
+            rol_nombre = user.rol.nombre_rol.lower()
+        self.rol_nombre = rol_nombre
+        self.es_superusuario = user.is_authenticated and user.is_superuser
+        self.es_staff = user.is_authenticated and user.is_staff
+        self.es_supervisor = 'supervisor' in rol_nombre
+        self.es_operaciones = 'operaciones' in rol_nombre
+        self.es_convenios = 'convenios' in rol_nombre
+
+    @property
+    def puede_autorizar(self):
+        """Supervisores y superusuarios: bandeja de autorizaciones."""
+        return self.es_superusuario or self.es_supervisor
+
+    @property
+    def acceso_operaciones(self):
+        """Flujo de operaciones (Operador o Supervisor)."""
+        return self.es_superusuario or self.es_operaciones or self.es_supervisor
+
+    @property
+    def acceso_mapa(self):
+        return self.es_superusuario or self.es_convenios or self.es_operaciones or self.es_supervisor
+
+def perfil_de(user):
+    """Perfil de permisos del usuario, memorizado en la propia instancia (una por request)."""
+    perfil = getattr(user, '_perfil_permisos', None)
+    if perfil is None:
+        perfil = PerfilPermisos(user)
+        try:
+            user._perfil_permisos = perfil
+        except AttributeError:
+            pass
+    return perfil
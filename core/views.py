@@ -6,6 +6,8 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 
+from .permisos import perfil_de
+
 def login_view(request):
     """
     Gestiona el inicio de sesión de todos los usuarios.
@@ -40,16 +42,14 @@ def login_redirect(request):
     if user.is_superuser:
         return redirect('admin:index')
     
-    if hasattr(user, 'rol') and user.rol:
-        rol_nombre = user.rol.nombre_rol.lower()
-        
-        if rol_nombre == 'operaciones' or 'supervisor' in rol_nombre:
-            return redirect('validar_asegurabilidad')
-        
-        # --- LÓGICA ACTUALIZADA ---
-        # Si el rol es Convenios y es staff, va al panel de admin.
-        if 'convenios' in rol_nombre and user.is_staff:
-            return redirect('admin:index')
+    perfil = perfil_de(user)
+    if perfil.rol_nombre == 'operaciones' or perfil.es_supervisor:
+        return redirect('validar_asegurabilidad')
+
+    # --- LÓGICA ACTUALIZADA ---
+    # Si el rol es Convenios y es staff, va al panel de admin.
+    if perfil.es_convenios and user.is_staff:
+        return redirect('admin:index')
     
     if user.is_staff:
         return redirect('admin:index')
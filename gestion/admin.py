@@ -1,15 +1,27 @@
 # gestion/admin.py
 
-from django.contrib import admin
+import os
+
+import tablib
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
 
+from core.exportacion import TAMANO_BLOQUE, ExportacionStreamingMixin
+
 from .models import (
     Proveedor, PuntoAtencion, Cliente, Asegurado, Contrato,
     CategoriaServicio, SubServicio, Plan, DetallePlan, BaremoProveedor,
-    CoberturaCategoriaPlan, ContactoProveedor, CuentaBancariaProveedor,
+    CoberturaCategoriaPlan, ContactoProveedor, CuentaBancariaProveedor, PrecioBaremo, TasaBCV,
 )
+from .importacion import columnas_resource, importar_asegurados
+from .sincronizacion import sincronizar_nomina
+from .utils import normalizar_cedula
 
 # --- Recurso para Import/Export de Asegurados ---
 class AseguradoResource(resources.ModelResource):
@@ -41,6 +53,11 @@ class AseguradoResource(resources.ModelResource):
         skip_unchanged = True
         report_skipped = True
 
+    def before_import_row(self, row, **kwargs):
+        # Se busca el asegurado por la cédula ya normalizada, igual a como se guarda.
+        if 'CEDULA BENEFICIARIO' in row:
+            row['CEDULA BENEFICIARIO'] = normalizar_cedula(row['CEDULA BENEFICIARIO'])
+
 # --- Inlines para una gestión más sencilla ---
 class PuntoAtencionInline(admin.TabularInline):
     model = PuntoAtencion
@@ -80,7 +97,7 @@ class CuentaBancariaProveedorInline(admin.TabularInline):
 class PuntoAtencionInline(admin.TabularInline):
     model = PuntoAtencion
     extra = 1
-    fields = ('nombre_sede', 'estado', 'ciudad', 'municipio','direccion', 'telefonos', 'activo')
+    fields = ('nombre_sede', 'estado', 'ciudad', 'municipio','direccion', 'telefonos', 'latitud', 'longitud', 'activo')
 
 class BaremoProveedorInline(admin.TabularInline):
     model = BaremoProveedor
@@ -144,10 +161,67 @@ class ContratoAdmin(admin.ModelAdmin):
     list_filter = ('activo', 'plan', 'cliente')
     inlines = [AseguradoInline]
     autocomplete_fields = ['cliente', 'plan']
+    actions = ['sincronizar_nomina_action']
+
+    # Movimientos mostrados por sección en el reporte de sincronización.
+    LIMITE_REPORTE = 200
+
+    @admin.action(description='Sincronizar nómina del contrato')
+    def sincronizar_nomina_action(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Seleccione un único contrato para sincronizar su nómina.", messages.WARNING)
+            return None
+        return redirect('admin:gestion_contrato_sincronizar_nomina', queryset.get().pk)
+
+    def get_urls(self):
+        urls = [
+            path('<int:contrato_id>/sincronizar-nomina/', self.admin_site.admin_view(self.sincronizar_nomina_view), name='gestion_contrato_sincronizar_nomina'),
+        ]
+        return urls + super().get_urls()
+
+    def sincronizar_nomina_view(self, request, contrato_id):
+        """Carga la nómina mensual del cliente y aplica (o simula) solo los movimientos."""
+        contrato = self.get_object(request, contrato_id)
+        if contrato is None or not self.has_change_permission(request, contrato):
+            return redirect('admin:gestion_contrato_changelist')
+
+        reporte = None
+        if request.method == 'POST':
+            archivo = request.FILES.get('archivo')
+            formato = os.path.splitext(archivo.name)[1].lower().lstrip('.') if archivo else ''
+            if formato not in ('csv', 'xlsx'):
+                messages.error(request, "Debe seleccionar un archivo CSV o XLSX.")
+                return redirect('admin:gestion_contrato_sincronizar_nomina', contrato.pk)
+            contenido = archivo.read()
+            if formato == 'csv':
+                contenido = contenido.decode('utf-8-sig')
+            dataset = tablib.Dataset().load(contenido, format=formato)
+            reporte = sincronizar_nomina(
+                contrato, dataset, columnas_resource(AseguradoResource()),
+                usuario=request.user, aplicar=not request.POST.get('simular'),
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Sincronizar nómina - {contrato.numero_contrato}',
+            'opts': self.model._meta,
+            'contrato': contrato,
+            'reporte': reporte,
+            'limite': self.LIMITE_REPORTE,
+        }
+        return TemplateResponse(request, 'admin/gestion/contrato/sincronizar_nomina.html', context)
 
 @admin.register(Asegurado)
-class AseguradoAdmin(ImportExportModelAdmin):
+class AseguradoAdmin(ExportacionStreamingMixin, ImportExportModelAdmin):
     resource_class = AseguradoResource
+    change_list_template = 'admin/gestion/asegurado/change_list.html'
+    exportacion_nombre = 'asegurados'
+    # Mismas columnas que AseguradoResource (el archivo se puede volver a importar) más cliente y plan.
+    exportacion_encabezados = (
+        'CONTRATO', 'CLIENTE', 'PLAN', 'ID CI BEN', 'CEDULA BENEFICIARIO', 'NOMBRE Y APELLIDO BEN',
+        'FECHA NACIMIENTO', 'SEXO', 'PARENTESCO', 'TELEFONO CELULAR', 'CORREO ELECTRONICO',
+        'ESTADO', 'CIUDAD', 'ESTADO ASEGURADO', 'fecha_baja',
+    )
     list_display = ('nombre_completo', 'cedula', 'contrato', 'parentesco', 'estado_individual', 'fecha_baja')
     search_fields = ('nombre_completo', 'cedula', 'contrato__numero_contrato')
     list_filter = ('estado_individual', 'parentesco', 'contrato__plan')
@@ -159,19 +233,97 @@ class AseguradoAdmin(ImportExportModelAdmin):
         ('Estado de Cobertura', {'fields': ('estado_individual', 'fecha_baja')}),
     )
 
+    def filas_exportacion(self, queryset):
+        queryset = queryset.select_related('contrato__cliente', 'contrato__plan')
+        for a in queryset.iterator(chunk_size=TAMANO_BLOQUE):
+            yield [
+                a.contrato.numero_contrato, a.contrato.cliente.razon_social, a.contrato.plan.nombre_plan,
+                a.tipo_documento, a.cedula, a.nombre_completo, a.fecha_nacimiento, a.sexo, a.parentesco,
+                a.telefono_celular, a.correo_electronico, a.estado_residencia, a.ciudad_residencia,
+                a.estado_individual, a.fecha_baja or '',
+            ]
+
+    def get_urls(self):
+        urls = [
+            path('importacion-masiva/', self.admin_site.admin_view(self.importacion_masiva_view), name='gestion_asegurado_importacion_masiva'),
+        ]
+        return urls + super().get_urls()
+
+    def importacion_masiva_view(self, request):
+        """
+        Importación de nóminas grandes con las mismas columnas que AseguradoResource. El avance
+        se envía en streaming mientras se procesa, así la petición no queda esperando en silencio.
+        """
+        if not self.has_import_permission(request):
+            return redirect('admin:gestion_asegurado_changelist')
+
+        if request.method == 'POST':
+            archivo = request.FILES.get('archivo')
+            formato = os.path.splitext(archivo.name)[1].lower().lstrip('.') if archivo else ''
+            if formato not in ('csv', 'xlsx'):
+                messages.error(request, "Debe seleccionar un archivo CSV o XLSX.")
+                return redirect('admin:gestion_asegurado_importacion_masiva')
+            contenido = archivo.read()
+            if formato == 'csv':
+                contenido = contenido.decode('utf-8-sig')
+            dataset = tablib.Dataset().load(contenido, format=formato)
+            columnas = columnas_resource(self.resource_class())
+
+            def avance():
+                for paso in importar_asegurados(dataset, columnas, usuario=request.user):
+                    if paso['etapa'] != 'fin':
+                        yield f"{paso['etapa'].capitalize()}: {paso['procesadas']} de {paso['total']} filas\n"
+                        continue
+                    if paso['errores']:
+                        yield "No se importó ningún registro. Corrija los siguientes errores:\n"
+                        yield from (f"  {error}\n" for error in paso['errores'])
+                    else:
+                        yield (
+                            f"Importación finalizada: {paso['nuevos']} nuevos, {paso['actualizados']} actualizados, "
+                            f"{paso['sin_cambios']} sin cambios.\n"
+                        )
+
+            return StreamingHttpResponse(avance(), content_type='text/plain; charset=utf-8')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importación masiva de asegurados',
+            'opts': self.model._meta,
+            'columnas': list(columnas_resource(self.resource_class())),
+        }
+        return TemplateResponse(request, 'admin/gestion/asegurado/importacion_masiva.html', context)
+
 @admin.register(PuntoAtencion)
 class PuntoAtencionAdmin(admin.ModelAdmin):
-    list_display = ('nombre_sede', 'proveedor', 'direccion', 'activo')
+    list_display = ('nombre_sede', 'proveedor', 'direccion', 'latitud', 'longitud', 'activo')
     search_fields = ['nombre_sede', 'proveedor__razon_social']
     list_filter = ('activo', 'proveedor')
 
+class PrecioBaremoInline(admin.TabularInline):
+    model = PrecioBaremo
+    extra = 0
+    fields = ('precio', 'vigente_desde', 'vigente_hasta')
+    readonly_fields = fields
+    ordering = ('-vigente_desde',)
+    can_delete = False
+    verbose_name_plural = "Historial de precios (editar el precio del baremo abre una versión desde hoy)"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(BaremoProveedor)
 class BaremoProveedorAdmin(admin.ModelAdmin):
     list_display = ('proveedor', 'sub_servicio', 'precio', 'activo')
+    inlines = [PrecioBaremoInline]
     search_fields = ['proveedor__razon_social', 'sub_servicio__descripcion', 'sub_servicio__codigo']
     list_filter = ('activo', 'proveedor')
 
 @admin.register(CoberturaCategoriaPlan)
 class CoberturaCategoriaPlanAdmin(admin.ModelAdmin):
     list_display = ('plan', 'categoria', 'es_ilimitada', 'cantidad_maxima', 'limite_mensual')
-    list_filter = ('plan', 'categoria')
\ No newline at end of file
+    list_filter = ('plan', 'categoria')
+
+@admin.register(TasaBCV)
+class TasaBCVAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'tasa')
+    date_hierarchy = 'fecha'
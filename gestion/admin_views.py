@@ -3,14 +3,10 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
 from django.http import JsonResponse
-from .models import PuntoAtencion
-import unicodedata
-
-def normalize_text(text):
-    if not text:
-        return ""
-    return ''.join(c for c in unicodedata.normalize('NFD', text)
-                   if unicodedata.category(c) != 'Mn').lower()
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .geografia import etag_geografia, obtener_geografia
+from .mapa import etag_mapa_estados, respuesta_mapa_estados
 
 @staff_member_required
 def mapa_proveedores_view(request):
@@ -24,9 +20,22 @@ def mapa_proveedores_view(request):
     return render(request, 'admin/mapa_proveedores.html', context)
 
 @staff_member_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_geografia)
 def proveedores_activos_api(request):
-    """API que devuelve los estados con proveedores activos, normalizados."""
-    puntos_activos = PuntoAtencion.objects.filter(activo=True, proveedor__activo=True)
-    estados = list(set(normalize_text(e) for e in puntos_activos.values_list('estado', flat=True) if e))
-    data = {'estados': estados}
-    return JsonResponse(data)
\ No newline at end of file
+    """
+    API con la geografía de los proveedores activos: estados normalizados, ciudades por estado y
+    el detalle estado -> ciudad -> municipio con la cantidad de puntos. Sale de la caché y
+    responde 304 si el navegador ya tiene la versión vigente.
+    """
+    return JsonResponse(obtener_geografia()[1])
+
+@staff_member_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_mapa_estados)
+def mapa_estados_api(request):
+    """
+    Todo lo que dibuja el mapa en una sola respuesta: la geometría simplificada de los estados con
+    proveedores activos y sus puntos (ver gestion.mapa.obtener_mapa_estados). Precomprimida y con ETag.
+    """
+    return respuesta_mapa_estados(request)
@@ -0,0 +1,84 @@
+# gestion/busqueda.py
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Asegurado
+from .utils import normalize_text, normalizar_cedula
+
+# Máximo de asegurados devueltos por búsqueda; el operador refina con más letras o con los filtros.
+LIMITE_RESULTADOS = 50
+
+# Largo mínimo para buscar dentro de la cédula o por nombre: con menos caracteres pg_trgm no
+# tiene trigramas que buscar en el índice y recorre la nómina entera.
+MIN_CARACTERES = 3
+
+def condicion_busqueda(query):
+    """
+    Condición (Q) que selecciona los asegurados que coinciden con `query`, o None si la búsqueda
+    está vacía o es un nombre de menos de MIN_CARACTERES. Se comparte entre el listado con ranking
+    y el conteo de facetas.
+    """
+    termino = normalize_text(query).strip()
+    if not termino:
+        return None
+    cedula = normalizar_cedula(termino)
+    if cedula.isdigit():
+        if len(cedula) < MIN_CARACTERES:
+            return Q(cedula__startswith=cedula)
+        return Q(cedula__contains=cedula)
+    if len(termino) < MIN_CARACTERES:
+        return None
+    return _todas_las_palabras(termino) | Q(nombre_normalizado__trigram_word_similar=termino)
+
+def _todas_las_palabras(termino):
+    condicion = Q()
+    for palabra in termino.split():
+        condicion &= Q(nombre_normalizado__contains=palabra)
+    return condicion
+
+def buscar_asegurados(query, queryset=None, limite=LIMITE_RESULTADOS):
+    """
+    Busca asegurados por cédula o por nombre, sin distinguir acentos ni mayúsculas.
+
+    - Cédula: con menos de MIN_CARACTERES dígitos, solo por prefijo (índice varchar_pattern_ops),
+      ordenado por cédula; con más, también parcial (índice de trigramas), primero la exacta y
+      luego las que empiezan por el término.
+    - Nombre (desde MIN_CARACTERES letras): todas las palabras contenidas ('jose perez' encuentra
+      a 'José Antonio Pérez'), más coincidencias difusas por trigramas para errores de tipeo.
+
+    Los índices de Asegurado.Meta.indexes ubican las coincidencias sin recorrer la nómina, pero el
+    ranking ordena todas las que encuentra antes de tomar las primeras `limite`: un término poco
+    selectivo (un prefijo de cédula corto, un nombre muy común) cuesta lo que sus coincidencias.
+    """
+    if queryset is None:
+        queryset = Asegurado.objects.all()
+    condicion = condicion_busqueda(query)
+    if condicion is None:
+        return queryset.none()
+    termino = normalize_text(query).strip()
+
+    cedula = normalizar_cedula(termino)
+    if cedula.isdigit():
+        if len(cedula) < MIN_CARACTERES:
+            return queryset.filter(condicion).order_by('cedula')[:limite]
+        resultados = queryset.filter(condicion).annotate(
+            relevancia=Case(
+                When(cedula=cedula, then=Value(0)),
+                When(cedula__startswith=cedula, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+        ).order_by('relevancia', 'cedula')
+        return resultados[:limite]
+
+    resultados = queryset.filter(condicion).annotate(
+        relevancia=Case(
+            When(nombre_normalizado__startswith=termino, then=Value(0)),
+            When(_todas_las_palabras(termino), then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ),
+        similitud=TrigramWordSimilarity(termino, 'nombre_normalizado'),
+    ).order_by('relevancia', '-similitud', 'nombre_normalizado')
+    return resultados[:limite]
@@ -0,0 +1,43 @@
+# gestion/catalogo.py
+
+from django.core.cache import cache
+
+from .models import Proveedor, PuntoAtencion
+from .utils import version_de
+
+CLAVE_CATALOGO = 'catalogo_sedes'
+
+def _calcular():
+    """
+    Proveedores activos con sus puntos de atención activos, en listas compactas para el
+    formulario de la OS: {'proveedores': [[id, razon_social, [[punto_id, nombre_sede], ...]], ...]}.
+    Dos queries, ordenadas por nombre.
+    """
+    puntos = {}
+    for punto_id, proveedor_id, nombre_sede in (
+        PuntoAtencion.objects.filter(activo=True, proveedor__activo=True)
+        .order_by('nombre_sede').values_list('id', 'proveedor_id', 'nombre_sede')
+    ):
+        puntos.setdefault(proveedor_id, []).append([punto_id, nombre_sede])
+    proveedores = Proveedor.objects.filter(activo=True).order_by('razon_social').values_list('id', 'razon_social')
+    return {'proveedores': [[pk, nombre, puntos.get(pk, [])] for pk, nombre in proveedores]}
+
+def obtener_catalogo_sedes():
+    """
+    Devuelve (version, datos) del catálogo de sedes. Queda en caché hasta que cambie un
+    PuntoAtencion o un Proveedor (ver gestion/signals.py). `version` es el hash de los datos, igual en
+    todos los procesos; sirve de ETag y va en la URL.
+    """
+    catalogo = cache.get(CLAVE_CATALOGO)
+    if catalogo is None:
+        datos = _calcular()
+        catalogo = (version_de(datos), datos)
+        cache.set(CLAVE_CATALOGO, catalogo, timeout=None)
+    return catalogo
+
+def etag_catalogo_sedes(request, *args, **kwargs):
+    """etag_func para django.views.decorators.http.condition."""
+    return obtener_catalogo_sedes()[0]
+
+def invalidar_catalogo_sedes():
+    cache.delete(CLAVE_CATALOGO)
@@ -0,0 +1,138 @@
+# gestion/cercania.py
+
+import heapq
+import math
+
+from .models import BaremoProveedor, PuntoAtencion
+from .utils import CargaPorVersion, normalize_text
+
+RADIO_TIERRA_KM = 6371.0
+
+# Máximo de puntos que devuelve una búsqueda de cercanía.
+LIMITE_CERCANOS = 20
+
+def vector_de(latitud, longitud):
+    """Coordenadas en la esfera unitaria: la distancia euclidiana crece igual que la distancia real."""
+    lat, lng = math.radians(latitud), math.radians(longitud)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+def _km(cuerda2):
+    """Distancia sobre la superficie a partir del cuadrado de la cuerda entre dos vectores unitarios."""
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(cuerda2) / 2))
+
+def _distancia2(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+def _centroide(vectores):
+    x, y, z = (sum(c) for c in zip(*vectores))
+    norma = math.sqrt(x * x + y * y + z * z) or 1.0
+    return (x / norma, y / norma, z / norma)
+
+class IndiceCercania:
+    """
+    KD-tree en memoria de los puntos de atención activos con coordenadas, con lo que ofrece cada
+    proveedor (sub-servicios de su baremo activo) y el centro de los puntos de cada ciudad y estado,
+    que sirve de ubicación aproximada del asegurado. Es inmutable: cuando algo cambia se construye otro.
+    """
+
+    def __init__(self, puntos, ofertas):
+        self.puntos = puntos        # [dict]; cada uno con 'vector'
+        self.ofertas = ofertas      # {proveedor_id: frozenset(sub_servicio_id)}
+        self.arbol = self._construir(list(range(len(puntos))), 0)
+        por_ciudad, por_estado = {}, {}
+        for punto in puntos:
+            estado = normalize_text(punto['estado'])
+            por_estado.setdefault(estado, []).append(punto['vector'])
+            por_ciudad.setdefault((estado, normalize_text(punto['ciudad'])), []).append(punto['vector'])
+        self.centros_ciudad = {clave: _centroide(v) for clave, v in por_ciudad.items()}
+        self.centros_estado = {clave: _centroide(v) for clave, v in por_estado.items()}
+
+    def _construir(self, indices, eje):
+        # Nodo: (índice del punto, eje, hijo izquierdo, hijo derecho)
+        if not indices:
+            return None
+        indices.sort(key=lambda i: self.puntos[i]['vector'][eje])
+        medio = len(indices) // 2
+        siguiente = (eje + 1) % 3
+        return (
+            indices[medio], eje,
+            self._construir(indices[:medio], siguiente),
+            self._construir(indices[medio + 1:], siguiente),
+        )
+
+    def ubicar(self, estado, ciudad=''):
+        """Vector aproximado de una ciudad (o, si no hay puntos en ella, de su estado). None si no se conoce."""
+        estado = normalize_text(estado)
+        centro = self.centros_ciudad.get((estado, normalize_text(ciudad)))
+        if centro is not None:
+            return centro, 'ciudad'
+        centro = self.centros_estado.get(estado)
+        return (centro, 'estado') if centro is not None else (None, None)
+
+    def cercanos(self, origen, k=5, sub_servicios=()):
+        """
+        Los `k` puntos más cercanos a `origen` (vector) cuyo proveedor ofrece todos los
+        `sub_servicios`, del más cercano al más lejano, con su 'distancia_km'.
+        """
+        requeridos = frozenset(sub_servicios)
+        mejores = []  # heap de (-distancia2, índice): el peor de los k queda arriba
+        pendientes = [self.arbol]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo is None:
+                continue
+            indice, eje, izquierdo, derecho = nodo
+            punto = self.puntos[indice]
+            distancia2 = _distancia2(origen, punto['vector'])
+            if requeridos <= self.ofertas.get(punto['proveedor_id'], frozenset()):
+                if len(mejores) < k:
+                    heapq.heappush(mejores, (-distancia2, indice))
+                elif distancia2 < -mejores[0][0]:
+                    heapq.heapreplace(mejores, (-distancia2, indice))
+            diferencia = origen[eje] - punto['vector'][eje]
+            cercano, lejano = (izquierdo, derecho) if diferencia < 0 else (derecho, izquierdo)
+            # El lado lejano solo se visita si el plano de corte está más cerca que el peor de los k.
+            if len(mejores) < k or diferencia * diferencia < -mejores[0][0]:
+                pendientes.append(lejano)
+            pendientes.append(cercano)
+        resultado = []
+        for distancia2, indice in sorted(mejores, reverse=True):
+            punto = {clave: valor for clave, valor in self.puntos[indice].items() if clave != 'vector'}
+            punto['distancia_km'] = round(_km(-distancia2), 1)
+            resultado.append(punto)
+        return resultado
+
+def construir_indice():
+    """Construye el índice con dos queries: puntos con coordenadas y baremos activos."""
+    puntos = [
+        {
+            'id': p['id'], 'nombre_sede': p['nombre_sede'],
+            'proveedor_id': p['proveedor_id'], 'proveedor': p['proveedor__razon_social'],
+            'estado': p['estado'], 'ciudad': p['ciudad'], 'direccion': p['direccion'],
+            'latitud': float(p['latitud']), 'longitud': float(p['longitud']),
+            'vector': vector_de(float(p['latitud']), float(p['longitud'])),
+        }
+        for p in PuntoAtencion.objects.filter(
+            activo=True, proveedor__activo=True, latitud__isnull=False, longitud__isnull=False,
+        ).values(
+            'id', 'nombre_sede', 'proveedor_id', 'proveedor__razon_social',
+            'estado', 'ciudad', 'direccion', 'latitud', 'longitud',
+        )
+    ]
+    ofertas = {}
+    for proveedor_id, sub_servicio_id in BaremoProveedor.objects.filter(activo=True).values_list('proveedor_id', 'sub_servicio_id'):
+        ofertas.setdefault(proveedor_id, set()).add(sub_servicio_id)
+    return IndiceCercania(puntos, {p: frozenset(s) for p, s in ofertas.items()})
+
+# Índice de este proceso; se reconstruye cuando se publica una versión nueva.
+_indice = CargaPorVersion('cercania:version', construir_indice)
+
+def obtener_indice():
+    """
+    El índice de cercanía de este proceso. Se reconstruye cuando cambia la versión publicada
+    en la caché compartida (ver invalidar_indice_cercania y gestion/signals.py).
+    """
+    return _indice.obtener()
+
+def invalidar_indice_cercania():
+    _indice.invalidar()
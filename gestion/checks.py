@@ -0,0 +1,17 @@
+# gestion/checks.py
+
+from django.core.checks import Warning, register
+
+from .mapa import MANIFIESTO, archivo_estados
+
+@register()
+def geojson_estados_generado(app_configs, **kwargs):
+    """Avisa si falta el GeoJSON simplificado: los mapas de proveedores se mostrarían sin las formas."""
+    if archivo_estados() is not None:
+        return []
+    return [Warning(
+        f"No hay GeoJSON de estados generado (static/geo/{MANIFIESTO}); los mapas de proveedores se "
+        "mostrarán sin las formas de los estados.",
+        hint="Ejecute 'python manage.py simplificar_geojson' al preparar el despliegue, antes de collectstatic.",
+        id='gestion.W001',
+    )]
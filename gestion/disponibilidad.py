@@ -0,0 +1,83 @@
+# gestion/disponibilidad.py
+
+from django.db import transaction
+
+from .models import BaremoProveedor, DetallePlan, DisponibilidadPlanProveedor, Plan, Proveedor
+
+# Columnas que identifican una fila del índice.
+CAMPOS = ('plan_id', 'proveedor_id', 'sub_servicio_id', 'baremo_id')
+
+def _aplicar(existentes, deseadas):
+    """
+    Deja en `existentes` (queryset acotado del índice) exactamente las filas `deseadas`
+    (set de tuplas CAMPOS): borra las que sobran y crea las que faltan, sin tocar el resto.
+    Devuelve (creadas, borradas).
+    """
+    actuales = {tuple(fila[:-1]): fila[-1] for fila in existentes.values_list(*CAMPOS, 'id')}
+    sobrantes = [pk for clave, pk in actuales.items() if clave not in deseadas]
+    if sobrantes:
+        DisponibilidadPlanProveedor.objects.filter(id__in=sobrantes).delete()
+    nuevas = [DisponibilidadPlanProveedor(**dict(zip(CAMPOS, clave))) for clave in deseadas - actuales.keys()]
+    DisponibilidadPlanProveedor.objects.bulk_create(nuevas, ignore_conflicts=True)
+    return len(nuevas), len(sobrantes)
+
+def sincronizar_baremo(baremo_id):
+    """Recalcula las filas de un baremo (alta, cambio de activo/proveedor/sub-servicio o baja)."""
+    baremo = BaremoProveedor.objects.filter(pk=baremo_id, activo=True).values('proveedor_id', 'sub_servicio_id').first()
+    deseadas = set()
+    if baremo:
+        planes = DetallePlan.objects.filter(sub_servicio_id=baremo['sub_servicio_id']).values_list('plan_id', flat=True)
+        deseadas = {(plan_id, baremo['proveedor_id'], baremo['sub_servicio_id'], baremo_id) for plan_id in planes}
+    return _aplicar(DisponibilidadPlanProveedor.objects.filter(baremo_id=baremo_id), deseadas)
+
+def sincronizar_detalle_plan(plan_id, sub_servicio_id):
+    """
+    Recalcula las filas de un sub-servicio de un plan (se agregó o quitó del plan) y descarta las
+    de sub-servicios que el plan ya no incluye (un DetallePlan al que se le cambió el sub-servicio).
+    """
+    DisponibilidadPlanProveedor.objects.filter(plan_id=plan_id).exclude(
+        sub_servicio_id__in=DetallePlan.objects.filter(plan_id=plan_id).values('sub_servicio_id')
+    ).delete()
+    deseadas = set()
+    if DetallePlan.objects.filter(plan_id=plan_id, sub_servicio_id=sub_servicio_id).exists():
+        deseadas = {
+            (plan_id, proveedor_id, sub_servicio_id, baremo_id)
+            for baremo_id, proveedor_id in BaremoProveedor.objects.filter(
+                sub_servicio_id=sub_servicio_id, activo=True,
+            ).values_list('id', 'proveedor_id')
+        }
+    return _aplicar(DisponibilidadPlanProveedor.objects.filter(plan_id=plan_id, sub_servicio_id=sub_servicio_id), deseadas)
+
+def reconstruir_disponibilidad(plan_ids=None):
+    """
+    Recalcula el índice completo (o el de `plan_ids`) plan por plan, con dos queries de lectura
+    por plan. Para cargas masivas de baremos o planes, que no disparan señales.
+    Devuelve {plan_id: (creadas, borradas)}.
+    """
+    planes = Plan.objects.order_by('id').values_list('id', flat=True)
+    if plan_ids is not None:
+        planes = planes.filter(id__in=plan_ids)
+    resultado = {}
+    for plan_id in planes:
+        with transaction.atomic():
+            deseadas = {
+                (plan_id, proveedor_id, sub_servicio_id, baremo_id)
+                for baremo_id, proveedor_id, sub_servicio_id in BaremoProveedor.objects.filter(
+                    activo=True,
+                    sub_servicio_id__in=DetallePlan.objects.filter(plan_id=plan_id).values('sub_servicio_id'),
+                ).values_list('id', 'proveedor_id', 'sub_servicio_id')
+            }
+            resultado[plan_id] = _aplicar(DisponibilidadPlanProveedor.objects.filter(plan_id=plan_id), deseadas)
+    return resultado
+
+def baremos_disponibles(plan_id, proveedor_id):
+    """Baremos activos del proveedor cubiertos por el plan, con sub-servicio y categoría."""
+    return BaremoProveedor.objects.filter(
+        disponibilidad__plan_id=plan_id, disponibilidad__proveedor_id=proveedor_id,
+    ).select_related('sub_servicio__categoria')
+
+def proveedores_que_cubren(plan_id, sub_servicio_id):
+    """Proveedores activos con baremo activo para un sub-servicio cubierto por el plan."""
+    return Proveedor.objects.filter(
+        activo=True, disponibilidad__plan_id=plan_id, disponibilidad__sub_servicio_id=sub_servicio_id,
+    )
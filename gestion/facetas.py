@@ -0,0 +1,59 @@
+# gestion/facetas.py
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Asegurado, Contrato
+
+CLAVE_FACETAS = 'facetas_contrato'
+
+# Coincidencias que se cuentan como máximo en la validación; con más, los filtros van sin conteos.
+MAX_CONTEO_FACETAS = 2000
+
+# Faceta -> campo del contrato (visto desde Asegurado en los conteos)
+CAMPOS_FACETAS = {
+    'clientes': 'cliente__razon_social',
+    'aseguradoras': 'aseguradora',
+    'entes': 'ente',
+}
+
+def obtener_facetas():
+    """
+    Listas ordenadas de clientes, aseguradoras y entes de los contratos, para los filtros
+    de la validación. Se calculan con una sola query y quedan en caché hasta que cambie
+    un Contrato o un Cliente (ver gestion/signals.py).
+    """
+    facetas = cache.get(CLAVE_FACETAS)
+    if facetas is None:
+        valores = {nombre: set() for nombre in CAMPOS_FACETAS}
+        combinaciones = Contrato.objects.values_list(*CAMPOS_FACETAS.values()).distinct().order_by()
+        for combinacion in combinaciones:
+            for nombre, valor in zip(CAMPOS_FACETAS, combinacion):
+                if valor:
+                    valores[nombre].add(valor)
+        facetas = {nombre: sorted(conjunto) for nombre, conjunto in valores.items()}
+        cache.set(CLAVE_FACETAS, facetas, timeout=None)
+    return facetas
+
+def invalidar_facetas():
+    cache.delete(CLAVE_FACETAS)
+
+def conteo_facetas(asegurados, limite=None):
+    """
+    Cuenta los asegurados de `asegurados` por cliente, aseguradora y ente con una sola
+    query agrupada. Devuelve {'clientes': {valor: total}, 'aseguradoras': {...}, 'entes': {...}}.
+    Con `limite` se cuentan a lo sumo limite + 1 asegurados y, si los hay, devuelve None: una
+    búsqueda tan amplia se muestra sin conteos en lugar de agrupar media nómina.
+    """
+    if limite is not None:
+        asegurados = Asegurado.objects.filter(pk__in=asegurados.order_by().values('pk')[:limite + 1])
+    conteos = {nombre: {} for nombre in CAMPOS_FACETAS}
+    contados = 0
+    campos = [f'contrato__{campo}' for campo in CAMPOS_FACETAS.values()]
+    for *combinacion, total in asegurados.order_by().values_list(*campos).annotate(total=Count('id')):
+        contados += total
+        for nombre, valor in zip(CAMPOS_FACETAS, combinacion):
+            conteos[nombre][valor] = conteos[nombre].get(valor, 0) + total
+    if limite is not None and contados > limite:
+        return None
+    return conteos
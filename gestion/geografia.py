@@ -0,0 +1,65 @@
+# gestion/geografia.py
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import PuntoAtencion
+from .utils import normalize_text, version_de
+
+CLAVE_GEOGRAFIA = 'geografia_proveedores'
+
+def _calcular():
+    """
+    Árbol estado -> ciudad -> municipio con la cantidad de puntos de atención activos (de
+    proveedores activos), a partir de una sola query agrupada. Los nombres se agrupan por su
+    forma normalizada ('Mérida' y 'merida' son el mismo estado) y se muestra la primera escritura.
+    """
+    filas = (
+        PuntoAtencion.objects.filter(activo=True, proveedor__activo=True)
+        .order_by().values('estado', 'ciudad', 'municipio')
+        .annotate(puntos=Count('id'))
+    )
+    estados = {}
+    for fila in filas:
+        if not fila['estado']:
+            continue
+        estado = estados.setdefault(normalize_text(fila['estado']), {'nombre': fila['estado'], 'puntos': 0, 'ciudades': {}})
+        ciudad = estado['ciudades'].setdefault(normalize_text(fila['ciudad']), {'nombre': fila['ciudad'], 'puntos': 0, 'municipios': {}})
+        municipio = ciudad['municipios'].setdefault(normalize_text(fila['municipio']), {'nombre': fila['municipio'], 'puntos': 0})
+        for nodo in (estado, ciudad, municipio):
+            nodo['puntos'] += fila['puntos']
+
+    detalle = []
+    for clave, estado in sorted(estados.items()):
+        ciudades = []
+        for ciudad in sorted(estado['ciudades'].values(), key=lambda c: normalize_text(c['nombre'])):
+            municipios = sorted(ciudad['municipios'].values(), key=lambda m: normalize_text(m['nombre']))
+            ciudades.append({'nombre': ciudad['nombre'], 'puntos': ciudad['puntos'], 'municipios': municipios})
+        detalle.append({'clave': clave, 'nombre': estado['nombre'], 'puntos': estado['puntos'], 'ciudades': ciudades})
+
+    return {
+        # 'estados' (normalizados) y 'ciudades' mantienen el formato que ya usan los mapas.
+        'estados': [estado['clave'] for estado in detalle],
+        'ciudades': {estado['clave']: [c['nombre'] for c in estado['ciudades']] for estado in detalle},
+        'detalle': detalle,
+    }
+
+def obtener_geografia():
+    """
+    Devuelve (version, datos) de la geografía de proveedores. Queda en caché hasta que cambie un
+    PuntoAtencion o un Proveedor (ver gestion/signals.py); `version` es un hash de los datos y
+    sirve de ETag.
+    """
+    geografia = cache.get(CLAVE_GEOGRAFIA)
+    if geografia is None:
+        datos = _calcular()
+        geografia = (version_de(datos), datos)
+        cache.set(CLAVE_GEOGRAFIA, geografia, timeout=None)
+    return geografia
+
+def etag_geografia(request, *args, **kwargs):
+    """etag_func para django.views.decorators.http.condition."""
+    return obtener_geografia()[0]
+
+def invalidar_geografia():
+    cache.delete(CLAVE_GEOGRAFIA)
@@ -0,0 +1,156 @@
+# gestion/importacion.py
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from .models import Asegurado, Contrato
+from .utils import normalize_text, normalizar_cedula
+
+# Filas escritas por cada INSERT/UPDATE masivo (y por cada lote de historial).
+TAMANO_LOTE = 2000
+
+# Cada cuántas filas leídas se informa el avance de la validación.
+INTERVALO_AVANCE = 5000
+
+def columnas_resource(resource):
+    """
+    Traduce los campos de un ModelResource de import-export a {columna del archivo: atributo},
+    para que la importación masiva acepte exactamente las mismas planillas que la importación normal.
+    """
+    return {
+        campo.column_name: campo.attribute
+        for campo in resource.fields.values()
+        if campo.attribute and campo.attribute != 'id'
+    }
+
+def _limpiar(campo, valor):
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        valor = campo.get_default() if campo.has_default() else (None if campo.null else '')
+    elif isinstance(valor, str):
+        valor = valor.strip()
+    return campo.clean(valor, None)
+
+def columnas_faltantes(dataset, columnas):
+    faltantes = []
+    for columna, atributo in columnas.items():
+        campo = Asegurado._meta.get_field(atributo)
+        obligatoria = atributo in ('contrato', 'cedula') or not (campo.blank or campo.has_default())
+        if obligatoria and columna not in dataset.headers:
+            faltantes.append(columna)
+    return faltantes
+
+def leer_filas(dataset, columnas):
+    """
+    Convierte las filas del dataset en (numero_fila, numero_contrato, cedula, valores, errores),
+    con los valores ya limpiados por los campos del modelo. No consulta la base de datos.
+    """
+    campos = {
+        columna: Asegurado._meta.get_field(atributo)
+        for columna, atributo in columnas.items()
+        if atributo != 'contrato' and columna in dataset.headers
+    }
+    columna_contrato = next(c for c, a in columnas.items() if a == 'contrato')
+    for numero, fila in enumerate(dataset.dict, start=2):  # la fila 1 son los encabezados
+        errores = []
+        valores = {}
+        for columna, campo in campos.items():
+            try:
+                valores[campo.attname] = _limpiar(campo, fila.get(columna))
+            except ValidationError as e:
+                errores.append(f"{columna}: {' '.join(e.messages)}")
+        cedula = normalizar_cedula(valores.get('cedula') or '')
+        if 'cedula' in valores and not cedula:
+            errores.append("La cédula no es válida.")
+        valores['cedula'] = cedula
+        numero_contrato = str(fila.get(columna_contrato) or '').strip()
+        yield numero, numero_contrato, cedula, valores, errores
+
+def importar_asegurados(dataset, columnas, usuario=None, tamano_lote=TAMANO_LOTE):
+    """
+    Importa (crea o actualiza) asegurados desde un tablib.Dataset en modo masivo.
+
+    - Los contratos del archivo se resuelven con una sola query.
+    - Los asegurados existentes de esos contratos se cargan una vez y se comparan en memoria
+      por (contrato, cédula); las filas sin cambios no se escriben.
+    - Las altas y modificaciones se escriben con bulk_create/bulk_update en lotes de
+      `tamano_lote`, junto con sus registros de historial, en una única transacción.
+
+    Si alguna fila tiene errores no se escribe nada. Es un generador: produce diccionarios de
+    avance {'etapa', 'procesadas', 'total'} y, al final, uno con etapa 'fin' y el resumen
+    (nuevos, actualizados, sin_cambios, errores).
+    """
+    faltantes = columnas_faltantes(dataset, columnas)
+    if faltantes:
+        yield {'etapa': 'fin', 'nuevos': 0, 'actualizados': 0, 'sin_cambios': 0,
+               'errores': [f"Faltan las columnas: {', '.join(faltantes)}."]}
+        return
+
+    total = len(dataset)
+    filas = []
+    errores = []
+    for fila in leer_filas(dataset, columnas):
+        filas.append(fila)
+        if fila[4]:
+            errores.extend(f"Fila {fila[0]}: {error}" for error in fila[4])
+        if len(filas) % INTERVALO_AVANCE == 0:
+            yield {'etapa': 'lectura', 'procesadas': len(filas), 'total': total}
+
+    contratos = dict(
+        Contrato.objects.filter(numero_contrato__in={f[1] for f in filas if f[1]}).values_list('numero_contrato', 'id')
+    )
+    for numero, numero_contrato, _, _, _ in filas:
+        if numero_contrato not in contratos:
+            errores.append(f"Fila {numero}: el contrato '{numero_contrato}' no existe.")
+    yield {'etapa': 'lectura', 'procesadas': total, 'total': total}
+
+    if errores:
+        yield {'etapa': 'fin', 'nuevos': 0, 'actualizados': 0, 'sin_cambios': 0, 'errores': errores}
+        return
+
+    # Las cédulas del archivo vienen normalizadas; las guardadas se comparan de la misma forma.
+    existentes = {}
+    for a in Asegurado.objects.filter(contrato_id__in=set(contratos.values())).iterator(chunk_size=tamano_lote):
+        clave = (a.contrato_id, normalizar_cedula(a.cedula))
+        if clave not in existentes or a.cedula == clave[1]:
+            existentes[clave] = a
+
+    nuevos = {}
+    modificados = {}
+    campos_modificados = set()
+    for _, numero_contrato, cedula, valores, _ in filas:
+        clave = (contratos[numero_contrato], cedula)
+        valores['nombre_normalizado'] = normalize_text(valores.get('nombre_completo', ''))
+        asegurado = existentes.get(clave)
+        if asegurado is None:
+            # Si la cédula se repite en el archivo, prevalece la última fila (como en la importación normal).
+            nuevo = Asegurado(contrato_id=clave[0], **valores)
+            nuevo.huella_nomina = nuevo.calcular_huella()
+            nuevos[clave] = nuevo
+            continue
+        cambios = [campo for campo, valor in valores.items() if getattr(asegurado, campo) != valor]
+        if cambios:
+            for campo in cambios:
+                setattr(asegurado, campo, valores[campo])
+            asegurado.huella_nomina = asegurado.calcular_huella()
+            campos_modificados.update(cambios + ['huella_nomina'])
+            modificados[clave] = asegurado
+    sin_cambios = len(existentes.keys() & {(contratos[f[1]], f[2]) for f in filas}) - len(modificados)
+
+    por_escribir = len(nuevos) + len(modificados)
+    escritas = 0
+    with transaction.atomic():
+        nuevos = list(nuevos.values())
+        for inicio in range(0, len(nuevos), tamano_lote):
+            lote = nuevos[inicio:inicio + tamano_lote]
+            bulk_create_with_history(lote, Asegurado, batch_size=tamano_lote, default_user=usuario)
+            escritas += len(lote)
+            yield {'etapa': 'escritura', 'procesadas': escritas, 'total': por_escribir}
+        modificados = list(modificados.values())
+        for inicio in range(0, len(modificados), tamano_lote):
+            lote = modificados[inicio:inicio + tamano_lote]
+            bulk_update_with_history(lote, Asegurado, sorted(campos_modificados), batch_size=tamano_lote, default_user=usuario)
+            escritas += len(lote)
+            yield {'etapa': 'escritura', 'procesadas': escritas, 'total': por_escribir}
+
+    yield {'etapa': 'fin', 'nuevos': len(nuevos), 'actualizados': len(modificados), 'sin_cambios': sin_cambios, 'errores': []}
@@ -0,0 +1,12 @@
+# gestion/management/commands/actualizar_precios_baremo.py
+
+from django.core.management.base import BaseCommand
+
+from gestion.precios import actualizar_precios_actuales
+
+class Command(BaseCommand):
+    help = "Pone en cada baremo el precio que rige hoy según su lista de precios. Programar a diario."
+
+    def handle(self, *args, **options):
+        total = actualizar_precios_actuales()
+        self.stdout.write(self.style.SUCCESS(f"{total} baremos actualizados al precio vigente."))
@@ -0,0 +1,61 @@
+# gestion/management/commands/cargar_tasas_bcv.py
+
+import os
+from decimal import Decimal, InvalidOperation
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.tasas import cargar_tasas
+from gestion.utils import leer_decimal, leer_fecha
+
+class Command(BaseCommand):
+    help = (
+        "Carga la tasa oficial del BCV (VES por USD) desde un CSV o XLSX con una fila por fecha. "
+        "Las fechas que ya existen se actualizan; los días sin fila toman la tasa del día anterior publicado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--columna-fecha', default='FECHA', help="Encabezado de la columna de fecha (por defecto FECHA).")
+        parser.add_argument('--columna-tasa', default='TASA', help="Encabezado de la columna de tasa (por defecto TASA).")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = os.path.splitext(ruta)[1].lower().lstrip('.')
+        if formato not in ('csv', 'xlsx'):
+            raise CommandError("El archivo debe ser CSV o XLSX.")
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        if formato == 'csv':
+            contenido = contenido.decode('utf-8-sig')
+        dataset = tablib.Dataset().load(contenido, format=formato)
+
+        columna_fecha, columna_tasa = options['columna_fecha'], options['columna_tasa']
+        faltantes = [c for c in (columna_fecha, columna_tasa) if c not in (dataset.headers or ())]
+        if faltantes:
+            raise CommandError(f"Faltan las columnas: {', '.join(faltantes)}.")
+
+        tasas = {}
+        errores = []
+        for numero, fila in enumerate(dataset.dict, start=2):  # la fila 1 son los encabezados
+            try:
+                fecha, tasa = leer_fecha(fila.get(columna_fecha)), leer_decimal(fila.get(columna_tasa))
+            except (InvalidOperation, ValueError) as e:
+                errores.append(f"Fila {numero}: {e if isinstance(e, ValueError) else 'tasa no válida'}")
+                continue
+            if fecha is None and tasa is None:
+                continue  # filas en blanco al final de la planilla
+            if fecha is None or not tasa or tasa < 0:
+                errores.append(f"Fila {numero}: se necesita una fecha y una tasa positiva.")
+                continue
+            tasas[fecha] = tasa.quantize(Decimal('0.0001'))
+        if errores:
+            for error in errores:
+                self.stderr.write(error)
+            raise CommandError("El archivo tiene errores; no se cargó ninguna tasa.")
+
+        nuevas, actualizadas = cargar_tasas(tasas)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(tasas)} tasas leídas: {nuevas} nuevas, {actualizadas} actualizadas, {len(tasas) - nuevas - actualizadas} sin cambios."
+        ))
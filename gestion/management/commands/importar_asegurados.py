@@ -0,0 +1,40 @@
+# gestion/management/commands/importar_asegurados.py
+
+import os
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.admin import AseguradoResource
+from gestion.importacion import TAMANO_LOTE, columnas_resource, importar_asegurados
+
+class Command(BaseCommand):
+    help = "Importa en modo masivo una nómina de asegurados (CSV o XLSX con las columnas de AseguradoResource)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas por cada escritura masiva.")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = os.path.splitext(ruta)[1].lower().lstrip('.')
+        if formato not in ('csv', 'xlsx'):
+            raise CommandError("El archivo debe ser CSV o XLSX.")
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        if formato == 'csv':
+            contenido = contenido.decode('utf-8-sig')
+        dataset = tablib.Dataset().load(contenido, format=formato)
+
+        for paso in importar_asegurados(dataset, columnas_resource(AseguradoResource()), tamano_lote=options['lote']):
+            if paso['etapa'] != 'fin':
+                self.stdout.write(f"{paso['etapa'].capitalize()}: {paso['procesadas']} de {paso['total']} filas")
+            elif paso['errores']:
+                for error in paso['errores']:
+                    self.stderr.write(error)
+                raise CommandError("No se importó ningún registro.")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Importación finalizada: {paso['nuevos']} nuevos, {paso['actualizados']} actualizados, "
+                    f"{paso['sin_cambios']} sin cambios."
+                ))
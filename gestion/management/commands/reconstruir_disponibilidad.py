@@ -0,0 +1,22 @@
+# gestion/management/commands/reconstruir_disponibilidad.py
+
+from django.core.management.base import BaseCommand
+
+from gestion.disponibilidad import reconstruir_disponibilidad
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la disponibilidad plan × proveedor (baremos cubiertos por cada plan). "
+        "Necesario tras cargas masivas de baremos o detalles de plan, que no disparan señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', type=int, action='append', dest='planes', help="ID de plan; se puede repetir. Por defecto, todos.")
+
+    def handle(self, *args, **options):
+        resultado = reconstruir_disponibilidad(options['planes'])
+        creadas = sum(c for c, _ in resultado.values())
+        borradas = sum(b for _, b in resultado.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Disponibilidad recalculada para {len(resultado)} planes: {creadas} filas nuevas, {borradas} eliminadas."
+        ))
@@ -0,0 +1,40 @@
+# gestion/management/commands/revalorizar_baremo.py
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion.models import BaremoProveedor
+from gestion.precios import revalorizar
+
+class Command(BaseCommand):
+    help = "Revaloriza en bloque los precios de baremo (p. ej. +10 % a un proveedor) a partir de una fecha."
+
+    def add_arguments(self, parser):
+        parser.add_argument('porcentaje', help="Variación en porcentaje: 10 sube 10 %, -5 baja 5 %.")
+        parser.add_argument('--proveedor', type=int, action='append', dest='proveedores', help="ID de proveedor; se puede repetir.")
+        parser.add_argument('--sub-servicio', type=int, action='append', dest='sub_servicios', help="ID de sub-servicio; se puede repetir.")
+        parser.add_argument('--desde', type=date.fromisoformat, help="Fecha desde la que rige (AAAA-MM-DD). Por defecto, hoy.")
+        parser.add_argument('--todos', action='store_true', help="Revalorizar todos los baremos activos si no se filtra por proveedor ni sub-servicio.")
+
+    def handle(self, *args, **options):
+        try:
+            porcentaje = Decimal(options['porcentaje'])
+        except InvalidOperation:
+            raise CommandError("El porcentaje debe ser un número.")
+        if porcentaje <= -100:
+            raise CommandError("El porcentaje debe ser mayor que -100.")
+        if not (options['proveedores'] or options['sub_servicios'] or options['todos']):
+            raise CommandError("Indique --proveedor, --sub-servicio o --todos.")
+
+        baremos = BaremoProveedor.objects.filter(activo=True)
+        if options['proveedores']:
+            baremos = baremos.filter(proveedor_id__in=options['proveedores'])
+        if options['sub_servicios']:
+            baremos = baremos.filter(sub_servicio_id__in=options['sub_servicios'])
+        desde = options['desde'] or timezone.localdate()
+
+        total = revalorizar(baremos, porcentaje, desde)
+        self.stdout.write(self.style.SUCCESS(f"{total} precios revalorizados {porcentaje:+}% desde {desde:%d/%m/%Y}."))
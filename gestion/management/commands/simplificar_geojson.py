@@ -0,0 +1,62 @@
+# gestion/management/commands/simplificar_geojson.py
+
+import json
+import urllib.request
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.mapa import (
+    ORIGEN_ESTADOS, directorio_geo, escribir_version, guardar_manifiesto, leer_manifiesto, simplificar_geojson,
+)
+
+class Command(BaseCommand):
+    help = (
+        "Genera en static/geo/ versiones simplificadas (y precomprimidas) del GeoJSON de estados "
+        "para los mapas de proveedores. Se corre una vez al preparar el despliegue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--origen', default=ORIGEN_ESTADOS, help="Ruta o URL del GeoJSON a resolución completa.")
+        parser.add_argument(
+            '--tolerancia', type=float, action='append',
+            help="Tolerancia de simplificación en grados; se puede repetir. Por defecto 0.005 y 0.02.",
+        )
+        parser.add_argument('--decimales', type=int, default=4, help="Decimales de las coordenadas (4 ≈ 11 m).")
+        parser.add_argument('--por-defecto', type=float, help="Tolerancia que usan los mapas. Por defecto, la primera.")
+
+    def handle(self, *args, **options):
+        tolerancias = options['tolerancia'] or [0.005, 0.02]
+        por_defecto = options['por_defecto'] if options['por_defecto'] is not None else tolerancias[0]
+        if por_defecto not in tolerancias:
+            raise CommandError("--por-defecto debe ser una de las tolerancias generadas.")
+
+        origen = options['origen']
+        try:
+            if origen.startswith(('http://', 'https://')):
+                with urllib.request.urlopen(origen, timeout=60) as respuesta:
+                    crudo = respuesta.read()
+            else:
+                crudo = Path(origen).read_bytes()
+            geojson = json.loads(crudo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer el GeoJSON de {origen}: {e}")
+
+        anteriores = set(leer_manifiesto().get('estados', {}).get('archivos', {}).values())
+        archivos = {}
+        for tolerancia in tolerancias:
+            simplificado = simplificar_geojson(geojson, tolerancia, options['decimales'])
+            archivos[f"{tolerancia:g}"] = relativa = escribir_version(simplificado, 'estados', tolerancia)
+            tamano = (directorio_geo().parent / relativa).stat().st_size
+            comprimido = (directorio_geo().parent / f"{relativa}.gz").stat().st_size
+            self.stdout.write(
+                f"Tolerancia {tolerancia:g}: {relativa} ({tamano / 1024:.0f} KB, {comprimido / 1024:.0f} KB comprimido)"
+            )
+
+        guardar_manifiesto({'estados': {'por_defecto': f"{por_defecto:g}", 'archivos': archivos}})
+        for relativa in anteriores - set(archivos.values()):
+            for ruta in (directorio_geo().parent / relativa, directorio_geo().parent / f"{relativa}.gz"):
+                ruta.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"GeoJSON original: {len(crudo) / 1024:.0f} KB. Manifiesto actualizado en static/geo/."
+        ))
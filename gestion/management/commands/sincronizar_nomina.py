@@ -0,0 +1,63 @@
+# gestion/management/commands/sincronizar_nomina.py
+
+import csv
+import os
+from datetime import date
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.admin import AseguradoResource
+from gestion.importacion import columnas_resource
+from gestion.models import Contrato
+from gestion.sincronizacion import sincronizar_nomina
+
+class Command(BaseCommand):
+    help = "Aplica sobre un contrato la nómina completa enviada por el cliente (solo altas, cambios y bajas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('numero_contrato')
+        parser.add_argument('archivo', help="CSV o XLSX con las columnas de AseguradoResource.")
+        parser.add_argument('--fecha-corte', type=date.fromisoformat, help="Fecha de baja para quienes ya no vienen en la nómina (AAAA-MM-DD). Por defecto, hoy.")
+        parser.add_argument('--simular', action='store_true', help="Calcula el reporte sin aplicar cambios.")
+        parser.add_argument('--reporte', help="Ruta del CSV donde guardar el detalle de movimientos.")
+
+    def handle(self, *args, **options):
+        try:
+            contrato = Contrato.objects.get(numero_contrato=options['numero_contrato'])
+        except Contrato.DoesNotExist:
+            raise CommandError(f"No existe el contrato '{options['numero_contrato']}'.")
+
+        ruta = options['archivo']
+        formato = os.path.splitext(ruta)[1].lower().lstrip('.')
+        if formato not in ('csv', 'xlsx'):
+            raise CommandError("El archivo debe ser CSV o XLSX.")
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        if formato == 'csv':
+            contenido = contenido.decode('utf-8-sig')
+        dataset = tablib.Dataset().load(contenido, format=formato)
+
+        reporte = sincronizar_nomina(
+            contrato, dataset, columnas_resource(AseguradoResource()),
+            fecha_corte=options['fecha_corte'], aplicar=not options['simular'],
+        )
+        if reporte.errores:
+            for error in reporte.errores:
+                self.stderr.write(error)
+            raise CommandError("La nómina tiene errores; no se aplicó ningún cambio.")
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['MOVIMIENTO', 'CEDULA', 'NOMBRE', 'DETALLE'])
+                writer.writerows(reporte.filas())
+
+        resumen = (
+            f"{len(reporte.altas)} altas, {len(reporte.cambios)} cambios, {len(reporte.bajas)} bajas, "
+            f"{reporte.sin_cambios} sin cambios."
+        )
+        if reporte.aplicado:
+            self.stdout.write(self.style.SUCCESS(f"Nómina de {contrato.numero_contrato} sincronizada: {resumen}"))
+        else:
+            self.stdout.write(f"Simulación para {contrato.numero_contrato}: {resumen}")
@@ -0,0 +1,185 @@
+# gestion/mapa.py
+
+import gzip
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .geografia import obtener_geografia
+from .utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# GeoJSON original (resolución completa) de los estados de Venezuela. Solo lo lee el comando
+# simplificar_geojson al preparar el despliegue; los mapas nunca lo piden.
+ORIGEN_ESTADOS = 'https://raw.githubusercontent.com/juanpabloaj/maps-data/master/venezuela/estados.geojson'
+
+# Carpeta (relativa a static/) donde simplificar_geojson deja los archivos generados.
+CARPETA_GEO = 'geo'
+MANIFIESTO = 'manifest.json'
+
+def directorio_geo():
+    return Path(settings.STATICFILES_DIRS[0]) / CARPETA_GEO
+
+def _distancia(punto, inicio, fin):
+    """Distancia de `punto` al segmento inicio-fin (en grados; basta para comparar con la tolerancia)."""
+    (x, y), (x1, y1), (x2, y2) = punto, inicio, fin
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+def simplificar_linea(puntos, tolerancia):
+    """Douglas-Peucker iterativo: conserva los vértices que se apartan más de `tolerancia` de la línea."""
+    if len(puntos) < 3:
+        return list(puntos)
+    conservar = [False] * len(puntos)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(puntos) - 1)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        maximo, indice = 0.0, None
+        for i in range(inicio + 1, fin):
+            distancia = _distancia(puntos[i], puntos[inicio], puntos[fin])
+            if distancia > maximo:
+                maximo, indice = distancia, i
+        if indice is not None and maximo > tolerancia:
+            conservar[indice] = True
+            pendientes.extend(((inicio, indice), (indice, fin)))
+    return [p for p, c in zip(puntos, conservar) if c]
+
+def _simplificar_anillo(anillo, tolerancia, decimales):
+    anillo = [[round(x, decimales), round(y, decimales)] for x, y, *_ in anillo]
+    simplificado = simplificar_linea(anillo, tolerancia)
+    # Un anillo necesita al menos 4 puntos (el último repite el primero).
+    return simplificado if len(simplificado) >= 4 else None
+
+def _simplificar_poligono(anillos, tolerancia, decimales):
+    """Simplifica el contorno y los huecos; los huecos que colapsan se descartan, el contorno no."""
+    exterior = _simplificar_anillo(anillos[0], tolerancia, decimales)
+    if exterior is None:
+        exterior = _simplificar_anillo(anillos[0], 0, decimales)
+        if exterior is None:
+            return None
+    huecos = [h for h in (_simplificar_anillo(a, tolerancia, decimales) for a in anillos[1:]) if h]
+    return [exterior, *huecos]
+
+def simplificar_geojson(geojson, tolerancia, decimales, propiedades=('name',)):
+    """
+    Copia simplificada de un FeatureCollection de polígonos: Douglas-Peucker por anillo con
+    `tolerancia` (en grados), coordenadas redondeadas a `decimales` y solo las `propiedades` indicadas.
+    """
+    features = []
+    for feature in geojson['features']:
+        geometria = feature['geometry']
+        poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+        poligonos = [p for p in (_simplificar_poligono(p, tolerancia, decimales) for p in poligonos) if p]
+        if not poligonos:
+            continue
+        features.append({
+            'type': 'Feature',
+            'properties': {k: v for k, v in feature.get('properties', {}).items() if k in propiedades},
+            'geometry': (
+                {'type': 'Polygon', 'coordinates': poligonos[0]} if len(poligonos) == 1
+                else {'type': 'MultiPolygon', 'coordinates': poligonos}
+            ),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def escribir_version(geojson, nombre, tolerancia):
+    """
+    Escribe `geojson` como static/geo/<nombre>.<tolerancia>.<hash>.geojson junto a su .gz
+    (para servidores que sirven la versión precomprimida). Devuelve la ruta relativa a static/.
+    """
+    contenido = json.dumps(geojson, ensure_ascii=False, separators=(',', ':')).encode()
+    huella = hashlib.sha256(contenido).hexdigest()[:12]
+    relativa = f"{CARPETA_GEO}/{nombre}.{tolerancia:g}.{huella}.geojson"
+    ruta = Path(settings.STATICFILES_DIRS[0]) / relativa
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_bytes(contenido)
+    with gzip.GzipFile(ruta.with_name(ruta.name + '.gz'), 'wb', compresslevel=9, mtime=0) as salida:
+        salida.write(contenido)
+    return relativa
+
+def leer_manifiesto():
+    ruta = directorio_geo() / MANIFIESTO
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text(encoding='utf-8'))
+
+def guardar_manifiesto(manifiesto):
+    directorio_geo().mkdir(parents=True, exist_ok=True)
+    (directorio_geo() / MANIFIESTO).write_text(json.dumps(manifiesto, indent=2, ensure_ascii=False), encoding='utf-8')
+
+def archivo_estados(tolerancia=None):
+    """
+    Ruta (relativa a static/) del GeoJSON de estados simplificado de `tolerancia`, o el marcado
+    por defecto en el manifiesto. None si todavía no se corrió simplificar_geojson.
+    """
+    versiones = leer_manifiesto().get('estados', {})
+    clave = f"{tolerancia:g}" if tolerancia is not None else versiones.get('por_defecto')
+    return versiones.get('archivos', {}).get(clave)
+
+CLAVE_MAPA = 'mapa_estados'
+
+def _calcular_mapa(geografia, archivo):
+    """
+    Un solo FeatureCollection con los estados que tienen proveedores activos: la geometría
+    simplificada y, en las propiedades, la cantidad de puntos y el detalle por ciudad. Sin archivo
+    generado se devuelve sin geometría ('geometria': False) y el mapa muestra solo el listado.
+    """
+    detalle = {estado['clave']: estado for estado in geografia['detalle']}
+    features = []
+    if archivo is not None:
+        geojson = json.loads((Path(settings.STATICFILES_DIRS[0]) / archivo).read_text(encoding='utf-8'))
+        for feature in geojson['features']:
+            estado = detalle.get(normalize_text(feature['properties'].get('name')))
+            if estado is not None:
+                features.append({
+                    'type': 'Feature',
+                    'properties': {'name': estado['nombre'], 'puntos': estado['puntos'], 'ciudades': estado['ciudades']},
+                    'geometry': feature['geometry'],
+                })
+    else:
+        logger.warning(
+            "No se generó el GeoJSON de estados (static/geo/%s): los mapas se muestran sin las formas "
+            "de los estados. Ejecute 'python manage.py simplificar_geojson' al preparar el despliegue.", MANIFIESTO,
+        )
+    return {'type': 'FeatureCollection', 'geometria': archivo is not None, 'features': features, 'detalle': geografia['detalle']}
+
+def obtener_mapa_estados():
+    """
+    Devuelve (version, json, json_gzip) del mapa de estados para los mapas de proveedores. Se arma
+    una vez por versión de la geografía y del GeoJSON simplificado y queda en caché ya serializado y
+    comprimido; `version` es el hash del contenido y sirve de ETag.
+    """
+    version_geografia, geografia = obtener_geografia()
+    archivo = archivo_estados()
+    clave = f"{CLAVE_MAPA}:{version_geografia}:{archivo}"
+    mapa = cache.get(clave)
+    if mapa is None:
+        contenido = json.dumps(_calcular_mapa(geografia, archivo), ensure_ascii=False, separators=(',', ':')).encode()
+        mapa = (hashlib.sha256(contenido).hexdigest()[:16], contenido, gzip.compress(contenido, compresslevel=9, mtime=0))
+        cache.set(clave, mapa, timeout=None)
+    return mapa
+
+def etag_mapa_estados(request, *args, **kwargs):
+    """etag_func para django.views.decorators.http.condition."""
+    return obtener_mapa_estados()[0]
+
+def respuesta_mapa_estados(request):
+    """Respuesta JSON del mapa de estados, precomprimida si el navegador acepta gzip."""
+    _, contenido, comprimido = obtener_mapa_estados()
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        respuesta = HttpResponse(comprimido, content_type='application/json')
+        respuesta['Content-Encoding'] = 'gzip'
+    else:
+        respuesta = HttpResponse(contenido, content_type='application/json')
+    respuesta['Vary'] = 'Accept-Encoding'
+    return respuesta
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from gestion.utils import normalize_text
+
+
+def poblar_nombre_normalizado(apps, schema_editor):
+    Asegurado = apps.get_model('gestion', 'Asegurado')
+    lote = []
+    for asegurado in Asegurado.objects.only('id', 'nombre_completo').iterator(chunk_size=5000):
+        asegurado.nombre_normalizado = normalize_text(asegurado.nombre_completo)
+        lote.append(asegurado)
+        if len(lote) >= 5000:
+            Asegurado.objects.bulk_update(lote, ['nombre_normalizado'])
+            lote = []
+    if lote:
+        Asegurado.objects.bulk_update(lote, ['nombre_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0002_puntoatencion_municipio'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='asegurado',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='historicalasegurado',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(poblar_nombre_normalizado, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='asegurado',
+            index=models.Index(fields=['cedula'], name='asegurado_cedula_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='asegurado',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['cedula'], name='asegurado_cedula_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='asegurado',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nombre_normalizado'], name='asegurado_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
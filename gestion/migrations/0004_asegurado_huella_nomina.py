@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+from gestion.utils import huella_nomina
+
+# Copia de Asegurado.CAMPOS_NOMINA al momento de esta migración.
+CAMPOS_NOMINA = (
+    'tipo_documento', 'nombre_completo', 'fecha_nacimiento', 'sexo', 'parentesco',
+    'telefono_celular', 'correo_electronico', 'estado_residencia', 'ciudad_residencia',
+    'estado_individual', 'fecha_baja',
+)
+
+
+def poblar_huella_nomina(apps, schema_editor):
+    Asegurado = apps.get_model('gestion', 'Asegurado')
+    lote = []
+    for asegurado in Asegurado.objects.only('id', *CAMPOS_NOMINA).iterator(chunk_size=5000):
+        asegurado.huella_nomina = huella_nomina(getattr(asegurado, campo) for campo in CAMPOS_NOMINA)
+        lote.append(asegurado)
+        if len(lote) >= 5000:
+            Asegurado.objects.bulk_update(lote, ['huella_nomina'])
+            lote = []
+    if lote:
+        Asegurado.objects.bulk_update(lote, ['huella_nomina'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_asegurado_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asegurado',
+            name='huella_nomina',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='historicalasegurado',
+            name='huella_nomina',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.RunPython(poblar_huella_nomina, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_disponibilidad(apps, schema_editor):
+    BaremoProveedor = apps.get_model('gestion', 'BaremoProveedor')
+    DetallePlan = apps.get_model('gestion', 'DetallePlan')
+    DisponibilidadPlanProveedor = apps.get_model('gestion', 'DisponibilidadPlanProveedor')
+    planes_por_subservicio = {}
+    for plan_id, sub_servicio_id in DetallePlan.objects.values_list('plan_id', 'sub_servicio_id'):
+        planes_por_subservicio.setdefault(sub_servicio_id, []).append(plan_id)
+    lote = []
+    for baremo_id, proveedor_id, sub_servicio_id in BaremoProveedor.objects.filter(activo=True).values_list(
+        'id', 'proveedor_id', 'sub_servicio_id'
+    ).iterator(chunk_size=5000):
+        for plan_id in planes_por_subservicio.get(sub_servicio_id, ()):
+            lote.append(DisponibilidadPlanProveedor(
+                plan_id=plan_id, proveedor_id=proveedor_id, sub_servicio_id=sub_servicio_id, baremo_id=baremo_id,
+            ))
+        if len(lote) >= 5000:
+            DisponibilidadPlanProveedor.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        DisponibilidadPlanProveedor.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0005_puntoatencion_coordenadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisponibilidadPlanProveedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('baremo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='gestion.baremoproveedor')),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='gestion.plan')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='gestion.proveedor')),
+                ('sub_servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='gestion.subservicio')),
+            ],
+            options={
+                'verbose_name': 'Disponibilidad Plan/Proveedor',
+                'verbose_name_plural': 'Disponibilidad Plan/Proveedor',
+                'indexes': [models.Index(fields=['plan', 'proveedor'], name='disponibilidad_plan_prov_idx'), models.Index(fields=['plan', 'sub_servicio'], name='disponibilidad_plan_sub_idx')],
+                'unique_together': {('plan', 'baremo')},
+            },
+        ),
+        migrations.RunPython(poblar_disponibilidad, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from datetime import date
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia de gestion.precios.INICIO_VIGENCIA: el precio actual rige para todo el historial previo.
+INICIO_VIGENCIA = date(2000, 1, 1)
+
+
+def poblar_precios(apps, schema_editor):
+    BaremoProveedor = apps.get_model('gestion', 'BaremoProveedor')
+    PrecioBaremo = apps.get_model('gestion', 'PrecioBaremo')
+    lote = []
+    for baremo_id, precio in BaremoProveedor.objects.values_list('id', 'precio').iterator(chunk_size=5000):
+        lote.append(PrecioBaremo(baremo_id=baremo_id, precio=precio, vigente_desde=INICIO_VIGENCIA))
+        if len(lote) >= 5000:
+            PrecioBaremo.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        PrecioBaremo.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_disponibilidad_plan_proveedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioBaremo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Precio (USD)')),
+                ('vigente_desde', models.DateField(verbose_name='Vigente desde')),
+                ('vigente_hasta', models.DateField(blank=True, null=True, verbose_name='Vigente hasta')),
+                ('baremo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios', to='gestion.baremoproveedor')),
+            ],
+            options={
+                'verbose_name': 'Precio de Baremo',
+                'verbose_name_plural': 'Precios de Baremo',
+                'constraints': [models.CheckConstraint(condition=models.Q(('vigente_hasta__isnull', True), ('vigente_hasta__gt', models.F('vigente_desde')), _connector='OR'), name='precio_baremo_vigencia_valida')],
+                'unique_together': {('baremo', 'vigente_desde')},
+            },
+        ),
+        migrations.RunPython(poblar_precios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_precio_baremo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TasaBCV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('tasa', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='Tasa (VES por USD)')),
+            ],
+            options={
+                'verbose_name': 'Tasa BCV',
+                'verbose_name_plural': 'Tasas BCV',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_tasa_bcv'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='puntoatencion',
+            name='municipio',
+            field=models.CharField(max_length=100, verbose_name='Municipio'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+from django.db import migrations
+
+from gestion.utils import normalizar_cedula
+
+
+def normalizar_cedulas(apps, schema_editor):
+    """
+    Guarda las cédulas existentes en la forma normalizada con que se importan y se buscan
+    ('V-12.345.678' -> '12345678'). Si en el mismo contrato ya existe la cédula normalizada,
+    la fila se deja como está para no violar (contrato, cedula).
+    """
+    Asegurado = apps.get_model('gestion', 'Asegurado')
+    tomadas = set(Asegurado.objects.values_list('contrato_id', 'cedula'))
+    lote = []
+    for asegurado in Asegurado.objects.only('id', 'contrato_id', 'cedula').iterator(chunk_size=5000):
+        cedula = normalizar_cedula(asegurado.cedula)
+        if cedula == asegurado.cedula or (asegurado.contrato_id, cedula) in tomadas:
+            continue
+        tomadas.add((asegurado.contrato_id, cedula))
+        asegurado.cedula = cedula
+        lote.append(asegurado)
+        if len(lote) >= 5000:
+            Asegurado.objects.bulk_update(lote, ['cedula'])
+            lote = []
+    if lote:
+        Asegurado.objects.bulk_update(lote, ['cedula'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_alter_puntoatencion_municipio'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_cedulas, migrations.RunPython.noop),
+    ]
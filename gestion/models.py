@@ -1,9 +1,11 @@
 # gestion/models.py
 
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.utils import timezone
 from datetime import date
-from simple_history.models import HistoricalRecords
+from core.auditoria import HistorialDiferido
+from .utils import huella_nomina, normalize_text, normalizar_cedula
 
 # --- Modelos de Proveedores ---
 class Proveedor(models.Model):
@@ -18,7 +20,7 @@ class Proveedor(models.Model):
         
     tipo_negociacion = models.CharField("Tipo de Negociación", max_length=10, choices=TipoNegociacion.choices, default=TipoNegociacion.CONVENIO)
     activo = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = HistorialDiferido()
     
     class Meta:
         verbose_name_plural = "Proveedores"
@@ -61,6 +63,8 @@ class PuntoAtencion(models.Model):
     municipio = models.CharField("Municipio", max_length=100)
     direccion = models.TextField("Dirección de la Sede")
     telefonos = models.CharField("Teléfonos de Contacto", max_length=150)
+    latitud = models.DecimalField("Latitud", max_digits=9, decimal_places=6, null=True, blank=True)
+    longitud = models.DecimalField("Longitud", max_digits=9, decimal_places=6, null=True, blank=True)
     activo = models.BooleanField(default=True)
     
     class Meta:
@@ -118,7 +122,7 @@ class Plan(models.Model):
     )
     descripcion = models.TextField("Descripción General", blank=True)
     activo = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = HistorialDiferido()
     class Meta:
         verbose_name_plural = "Planes"
     def __str__(self): return self.nombre_plan
@@ -157,6 +161,70 @@ class BaremoProveedor(models.Model):
         unique_together = ('proveedor', 'sub_servicio')
     def __str__(self): return f"{self.proveedor.razon_social} | {self.sub_servicio.descripcion}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        baremo = super().from_db(db, field_names, values)
+        # Precio tal como se leyó: gestion/signals.py abre una versión nueva solo si se editó.
+        baremo._precio_original = baremo.__dict__.get('precio')
+        return baremo
+
+class PrecioBaremo(models.Model):
+    """
+    Lista de precios con vigencia de un baremo: `precio` rige desde `vigente_desde` (inclusive)
+    hasta `vigente_hasta` (exclusive; vacío = vigente). BaremoProveedor.precio es el de hoy.
+    Se registra con gestion/precios.py, que cierra la versión anterior.
+    """
+    baremo = models.ForeignKey(BaremoProveedor, on_delete=models.CASCADE, related_name="precios")
+    precio = models.DecimalField("Precio (USD)", max_digits=12, decimal_places=2)
+    vigente_desde = models.DateField("Vigente desde")
+    vigente_hasta = models.DateField("Vigente hasta", null=True, blank=True)
+    class Meta:
+        verbose_name = "Precio de Baremo"
+        verbose_name_plural = "Precios de Baremo"
+        # "Precio del baremo en la fecha D": el índice único (baremo, vigente_desde) la resuelve.
+        unique_together = ('baremo', 'vigente_desde')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(vigente_hasta__isnull=True) | models.Q(vigente_hasta__gt=models.F('vigente_desde')),
+                name='precio_baremo_vigencia_valida',
+            ),
+        ]
+    def __str__(self): return f"{self.baremo} | {self.precio} desde {self.vigente_desde}"
+
+class DisponibilidadPlanProveedor(models.Model):
+    """
+    Índice precalculado de qué baremos activos de cada proveedor cubre cada plan (sub-servicio
+    en DetallePlan). Lo mantiene gestion/disponibilidad.py; no se edita a mano.
+    """
+    plan = models.ForeignKey(Plan, on_delete=models.CASCADE, related_name="disponibilidad")
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name="disponibilidad")
+    sub_servicio = models.ForeignKey(SubServicio, on_delete=models.CASCADE, related_name="disponibilidad")
+    baremo = models.ForeignKey(BaremoProveedor, on_delete=models.CASCADE, related_name="disponibilidad")
+    class Meta:
+        verbose_name = "Disponibilidad Plan/Proveedor"
+        verbose_name_plural = "Disponibilidad Plan/Proveedor"
+        unique_together = ('plan', 'baremo')
+        indexes = [
+            # Servicios de un proveedor para un plan, y proveedores que cubren un sub-servicio de un plan.
+            models.Index(fields=['plan', 'proveedor'], name='disponibilidad_plan_prov_idx'),
+            models.Index(fields=['plan', 'sub_servicio'], name='disponibilidad_plan_sub_idx'),
+        ]
+    def __str__(self): return f"{self.plan_id} | {self.baremo_id}"
+
+# --- TIPO DE CAMBIO ---
+class TasaBCV(models.Model):
+    """
+    Tasa oficial del BCV (bolívares por dólar) publicada para cada fecha. Los días sin publicación
+    rige la última anterior. Se carga con el comando cargar_tasas_bcv y se consulta con gestion/tasas.py.
+    """
+    fecha = models.DateField("Fecha", unique=True)
+    tasa = models.DecimalField("Tasa (VES por USD)", max_digits=10, decimal_places=4)
+    class Meta:
+        verbose_name = "Tasa BCV"
+        verbose_name_plural = "Tasas BCV"
+        ordering = ['-fecha']
+    def __str__(self): return f"{self.fecha:%d/%m/%Y}: {self.tasa}"
+
 # --- ESTRUCTURA DE CONTRATOS Y ASEGURADOS ---
 class Contrato(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name="contratos")
@@ -180,7 +248,7 @@ class Contrato(models.Model):
     fecha_inicio_vigencia = models.DateField("Fecha Inicio Vigencia")
     fecha_fin_vigencia = models.DateField("Fecha Fin Vigencia")
     activo = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = HistorialDiferido()
     class Meta:
         verbose_name_plural = "Contratos"
     def __str__(self): return f"{self.numero_contrato} - {self.cliente.razon_social}"
@@ -218,8 +286,36 @@ class Asegurado(models.Model):
         DE_BAJA = 'DE_BAJA', 'De Baja'
     estado_individual = models.CharField("Estado Individual", max_length=10, choices=EstadoAsegurado.choices, default=EstadoAsegurado.ACTIVO)
     fecha_baja = models.DateField("Fecha de Baja", blank=True, null=True)
-    history = HistoricalRecords()
-    
+    # Nombre sin acentos y en minúsculas; lo mantiene save() y lo usa el buscador (gestion/busqueda.py)
+    nombre_normalizado = models.CharField(max_length=100, blank=True, editable=False)
+    # Huella de los CAMPOS_NOMINA; la sincronización mensual (gestion/sincronizacion.py) compara
+    # solo huellas para detectar qué asegurados cambiaron.
+    huella_nomina = models.CharField(max_length=32, blank=True, editable=False)
+    history = HistorialDiferido()
+
+    # Datos que llegan en la nómina del cliente, en el orden en que se calcula la huella.
+    CAMPOS_NOMINA = (
+        'tipo_documento', 'nombre_completo', 'fecha_nacimiento', 'sexo', 'parentesco',
+        'telefono_celular', 'correo_electronico', 'estado_residencia', 'ciudad_residencia',
+        'estado_individual', 'fecha_baja',
+    )
+
+    def calcular_huella(self):
+        return huella_nomina(getattr(self, campo) for campo in self.CAMPOS_NOMINA)
+
+    def save(self, *args, **kwargs):
+        self.cedula = normalizar_cedula(self.cedula)
+        self.nombre_normalizado = normalize_text(self.nombre_completo)
+        self.huella_nomina = self.calcular_huella()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        asegurado = super().from_db(db, field_names, values)
+        # Contrato leído: si cambia, operaciones/signals.py recalcula la siniestralidad de ambos.
+        asegurado._contrato_id_original = asegurado.__dict__.get('contrato_id')
+        return asegurado
+
     @property
     def edad(self):
         today = date.today()
@@ -237,5 +333,11 @@ class Asegurado(models.Model):
     class Meta:
         verbose_name_plural = "Asegurados"
         unique_together = ('contrato', 'cedula')
+        indexes = [
+            # Prefijo de cédula (LIKE 'x%') y búsquedas parciales/difusas por trigramas.
+            models.Index(fields=['cedula'], name='asegurado_cedula_prefijo_idx', opclasses=['varchar_pattern_ops']),
+            GinIndex(fields=['cedula'], name='asegurado_cedula_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['nombre_normalizado'], name='asegurado_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     def __str__(self):
         return f"{self.nombre_completo} ({self.cedula})"
\ No newline at end of file
@@ -0,0 +1,120 @@
+# gestion/precios.py
+
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import BaremoProveedor, PrecioBaremo
+
+# Inicio de la primera versión de cada precio existente al crear las listas (ver migración 0007).
+INICIO_VIGENCIA = date(2000, 1, 1)
+
+def _vigentes_en(fecha):
+    """Condición de las versiones que rigen en `fecha`."""
+    return Q(vigente_desde__lte=fecha) & (Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gt=fecha))
+
+def precios_en_lote(lineas):
+    """
+    Precio de cada (baremo_id, fecha) de `lineas` con una sola query, aunque sean miles:
+    se leen las versiones de esos baremos y la de cada fecha se ubica por bisección.
+    Devuelve {(baremo_id, fecha): precio}, con None si el baremo no tenía precio en esa fecha.
+    """
+    lineas = set(lineas)
+    if not lineas:
+        return {}
+    versiones = {}  # {baremo_id: ([vigente_desde], [(vigente_hasta, precio)])}
+    for baremo_id, desde, hasta, precio in PrecioBaremo.objects.filter(
+        baremo_id__in={baremo_id for baremo_id, _ in lineas},
+        vigente_desde__lte=max(fecha for _, fecha in lineas),
+    ).order_by('baremo_id', 'vigente_desde').values_list('baremo_id', 'vigente_desde', 'vigente_hasta', 'precio'):
+        inicios, datos = versiones.setdefault(baremo_id, ([], []))
+        inicios.append(desde)
+        datos.append((hasta, precio))
+
+    precios = {}
+    for baremo_id, fecha in lineas:
+        inicios, datos = versiones.get(baremo_id, ((), ()))
+        i = bisect_right(inicios, fecha) - 1
+        precio = None
+        if i >= 0:
+            hasta, precio = datos[i]
+            if hasta is not None and fecha >= hasta:
+                precio = None
+        precios[(baremo_id, fecha)] = precio
+    return precios
+
+def precio_vigente(baremo_id, fecha=None):
+    """Precio de un baremo en `fecha` (hoy por defecto), o None."""
+    fecha = fecha or timezone.localdate()
+    return precios_en_lote([(baremo_id, fecha)])[(baremo_id, fecha)]
+
+def actualizar_precios_actuales(baremos=None, hoy=None):
+    """
+    Copia a BaremoProveedor.precio el precio que rige hoy, en un solo UPDATE. Se corre a diario
+    (comando actualizar_precios_baremo) para que entren en vigor los precios programados.
+    Devuelve la cantidad de baremos actualizados.
+    """
+    hoy = hoy or timezone.localdate()
+    actual = PrecioBaremo.objects.filter(_vigentes_en(hoy), baremo_id=OuterRef('pk')).values('precio')[:1]
+    baremos = BaremoProveedor.objects.all() if baremos is None else baremos
+    return baremos.annotate(actual=Subquery(actual)).filter(actual__isnull=False).exclude(
+        precio=F('actual')
+    ).update(precio=Subquery(actual))
+
+@transaction.atomic
+def registrar_precio(baremo_id, precio, desde=None):
+    """
+    Programa `precio` para un baremo desde `desde` (hoy por defecto). La versión que regía en
+    esa fecha termina ahí; la nueva rige hasta la siguiente versión ya programada, si la hay.
+    """
+    hoy = timezone.localdate()
+    desde = desde or hoy
+    BaremoProveedor.objects.select_for_update().filter(pk=baremo_id).first()
+    siguiente = PrecioBaremo.objects.filter(baremo_id=baremo_id, vigente_desde__gt=desde).order_by('vigente_desde').first()
+    PrecioBaremo.objects.filter(_vigentes_en(desde), baremo_id=baremo_id, vigente_desde__lt=desde).update(vigente_hasta=desde)
+    PrecioBaremo.objects.update_or_create(
+        baremo_id=baremo_id, vigente_desde=desde,
+        defaults={'precio': precio, 'vigente_hasta': siguiente.vigente_desde if siguiente else None},
+    )
+    if desde <= hoy:
+        actualizar_precios_actuales(BaremoProveedor.objects.filter(pk=baremo_id), hoy)
+
+@transaction.atomic
+def revalorizar(baremos, porcentaje, desde):
+    """
+    Aumenta (o reduce, con `porcentaje` negativo) en bloque el precio que rige en `desde` para los
+    baremos del queryset `baremos`, p. ej. +10 % a todo un proveedor. Son tres sentencias sin importar
+    cuántos baremos: se actualizan las versiones que empiezan justo en `desde`, se insertan (INSERT
+    ... SELECT) las nuevas versiones de las que empezaron antes y se cierran estas últimas.
+    Las versiones programadas para después de `desde` no se tocan. Devuelve la cantidad de precios nuevos.
+    """
+    factor = Decimal(1) + Decimal(str(porcentaje)) / 100
+    nuevo_precio = Round(F('precio') * Value(factor), 2, output_field=DecimalField(max_digits=12, decimal_places=2))
+    vigentes = PrecioBaremo.objects.filter(_vigentes_en(desde), baremo__in=baremos)
+
+    reemplazadas = vigentes.filter(vigente_desde=desde).update(precio=nuevo_precio)
+
+    anteriores = vigentes.filter(vigente_desde__lt=desde)
+    # Cada columna del SELECT lleva un alias y el orden de las columnas del INSERT se toma de la
+    # query compilada: no todas las versiones de Django ordenan igual campos y expresiones.
+    columnas = {'nuevo_baremo': 'baremo_id', 'nuevo_precio': 'precio', 'nuevo_desde': 'vigente_desde', 'nuevo_hasta': 'vigente_hasta'}
+    seleccion = anteriores.order_by().annotate(
+        nuevo_baremo=F('baremo_id'), nuevo_precio=nuevo_precio, nuevo_desde=Value(desde), nuevo_hasta=F('vigente_hasta'),
+    ).values_list(*columnas)
+    compilador = seleccion.query.get_compiler(connection=connection)
+    sql, params = compilador.as_sql()
+    destino = ', '.join(columnas[alias] for _, _, alias in compilador.select)
+    tabla = connection.ops.quote_name(PrecioBaremo._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {tabla} ({destino}) {sql}', params)
+        insertadas = cursor.rowcount
+    anteriores.update(vigente_hasta=desde)
+
+    if desde <= timezone.localdate():
+        actualizar_precios_actuales(baremos)
+    return reemplazadas + insertadas
@@ -0,0 +1,68 @@
+# gestion/reglas_plan.py
+
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import CoberturaCategoriaPlan, DetallePlan
+from .utils import publicar_version, version_publicada
+
+ReglaCategoria = namedtuple('ReglaCategoria', 'categoria_id categoria_nombre es_ilimitada cantidad_maxima limite_mensual')
+
+class ReglasPlan:
+    """
+    Representación compilada de un Plan: sub-servicios cubiertos y reglas por categoría.
+    Es inmutable; cuando el plan cambia se compila una nueva (ver invalidar_reglas_plan).
+    """
+    __slots__ = ('plan_id', 'subservicios', 'coberturas')
+
+    def __init__(self, plan_id, subservicios, coberturas):
+        self.plan_id = plan_id
+        self.subservicios = frozenset(subservicios)
+        self.coberturas = coberturas  # {categoria_id: ReglaCategoria}, en el orden de carga del plan
+
+    def cubre_subservicio(self, sub_servicio_id):
+        return sub_servicio_id in self.subservicios
+
+    def cobertura(self, categoria_id):
+        return self.coberturas.get(categoria_id)
+
+# Compilaciones de este proceso: {plan_id: (version, ReglasPlan)}
+_compiladas = {}
+
+_CLAVE_VERSION_GLOBAL = 'reglas_plan:version'
+
+def _clave_version(plan_id):
+    return f'reglas_plan:{plan_id}:version'
+
+def compilar_reglas_plan(plan_id):
+    subservicios = DetallePlan.objects.filter(plan_id=plan_id).values_list('sub_servicio_id', flat=True)
+    coberturas = {
+        c.categoria_id: ReglaCategoria(c.categoria_id, c.categoria.nombre, c.es_ilimitada, c.cantidad_maxima, c.limite_mensual)
+        for c in CoberturaCategoriaPlan.objects.filter(plan_id=plan_id).select_related('categoria').order_by('id')
+    }
+    return ReglasPlan(plan_id, subservicios, coberturas)
+
+def obtener_reglas_plan(plan_id):
+    """
+    Devuelve las ReglasPlan del plan. Se sirven desde memoria del proceso mientras la versión
+    publicada en la caché compartida no cambie; si cambió, se buscan en la caché compartida y
+    solo en último caso se compilan desde la base de datos (2 queries).
+    """
+    version = (version_publicada(_CLAVE_VERSION_GLOBAL), version_publicada(_clave_version(plan_id)))
+    compilada = _compiladas.get(plan_id)
+    if compilada and compilada[0] == version:
+        return compilada[1]
+
+    clave = f'reglas_plan:{plan_id}:{version[0]}:{version[1]}'
+    reglas = cache.get(clave)
+    if reglas is None:
+        reglas = compilar_reglas_plan(plan_id)
+        cache.set(clave, reglas, timeout=None)
+    _compiladas[plan_id] = (version, reglas)
+    return reglas
+
+def invalidar_reglas_plan(plan_id=None):
+    """Publica una nueva versión de las reglas de un plan (o de todos si plan_id es None)."""
+    clave = _CLAVE_VERSION_GLOBAL if plan_id is None else _clave_version(plan_id)
+    publicar_version(clave)
@@ -0,0 +1,74 @@
+# gestion/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogo import invalidar_catalogo_sedes
+from .cercania import invalidar_indice_cercania
+from .disponibilidad import sincronizar_baremo, sincronizar_detalle_plan
+from .facetas import invalidar_facetas
+from .geografia import invalidar_geografia
+from .models import (
+    BaremoProveedor, CategoriaServicio, Cliente, CoberturaCategoriaPlan, Contrato, DetallePlan, Plan, PrecioBaremo,
+    Proveedor, PuntoAtencion, TasaBCV,
+)
+from .precios import INICIO_VIGENCIA, registrar_precio
+from .reglas_plan import invalidar_reglas_plan
+from .tasas import invalidar_tasas
+
+@receiver([post_save, post_delete], sender=Plan)
+def plan_modificado(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidar_reglas_plan(instance.pk))
+
+@receiver([post_save, post_delete], sender=DetallePlan)
+@receiver([post_save, post_delete], sender=CoberturaCategoriaPlan)
+def regla_plan_modificada(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidar_reglas_plan(instance.plan_id))
+
+@receiver([post_save, post_delete], sender=DetallePlan)
+def detalle_plan_modificado(sender, instance, **kwargs):
+    sincronizar_detalle_plan(instance.plan_id, instance.sub_servicio_id)
+
+@receiver([post_save, post_delete], sender=CategoriaServicio)
+def categoria_modificada(sender, instance, **kwargs):
+    # Los nombres de categoría forman parte de las reglas compiladas de todos los planes.
+    transaction.on_commit(invalidar_reglas_plan)
+
+@receiver([post_save, post_delete], sender=Contrato)
+@receiver([post_save, post_delete], sender=Cliente)
+def contrato_modificado(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_facetas)
+
+@receiver([post_save, post_delete], sender=PuntoAtencion)
+@receiver([post_save, post_delete], sender=Proveedor)
+def red_proveedores_modificada(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_geografia)
+    transaction.on_commit(invalidar_catalogo_sedes)
+    transaction.on_commit(invalidar_indice_cercania)
+
+@receiver([post_save, post_delete], sender=BaremoProveedor)
+def baremo_modificado(sender, instance, **kwargs):
+    # La disponibilidad es una tabla: se actualiza en la misma transacción que el baremo.
+    sincronizar_baremo(instance.pk)
+    # El índice de cercanía filtra los puntos por los sub-servicios del baremo.
+    transaction.on_commit(invalidar_indice_cercania)
+
+@receiver(post_save, sender=BaremoProveedor)
+def precio_baremo_editado(sender, instance, created, raw=False, **kwargs):
+    # El primer precio de un baremo rige desde INICIO_VIGENCIA; editarlo después abre una versión
+    # desde hoy y las OS anteriores conservan el suyo. Se compara con el precio leído de la base
+    # (no con el vigente), así guardar el baremo sin tocar el precio no pisa las versiones programadas.
+    if raw:
+        return
+    if created:
+        PrecioBaremo.objects.create(baremo=instance, precio=instance.precio, vigente_desde=INICIO_VIGENCIA)
+    else:
+        original = getattr(instance, '_precio_original', None)
+        if original is not None and instance.precio != original:
+            registrar_precio(instance.pk, instance.precio)
+    instance._precio_original = instance.precio
+
+@receiver([post_save, post_delete], sender=TasaBCV)
+def tasa_bcv_modificada(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_tasas)
@@ -0,0 +1,152 @@
+# gestion/sincronizacion.py
+
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from .importacion import TAMANO_LOTE, leer_filas
+from .models import Asegurado
+from .utils import huella_nomina, normalize_text, normalizar_cedula
+
+# Columnas que la nómina mensual puede omitir: estar en la nómina significa estar activo.
+CAMPOS_OPCIONALES = ('estado_individual', 'fecha_baja')
+
+class ReporteSincronizacion:
+    """Resultado de sincronizar la nómina de un contrato. Solo contiene el delta, no la nómina completa."""
+
+    def __init__(self, contrato):
+        self.contrato = contrato
+        self.altas = []      # [(cedula, nombre)]
+        self.cambios = []    # [(cedula, nombre, {campo: (antes, despues)})]
+        self.bajas = []      # [(cedula, nombre)]
+        self.sin_cambios = 0
+        self.errores = []
+        self.aplicado = False
+
+    @property
+    def total_movimientos(self):
+        return len(self.altas) + len(self.cambios) + len(self.bajas)
+
+    def filas(self):
+        """Filas (movimiento, cedula, nombre, detalle) para exportar el reporte."""
+        for cedula, nombre in self.altas:
+            yield 'ALTA', cedula, nombre, ''
+        for cedula, nombre, detalle in self.cambios:
+            yield 'CAMBIO', cedula, nombre, '; '.join(f"{campo}: {antes or '-'} -> {despues or '-'}" for campo, (antes, despues) in detalle.items())
+        for cedula, nombre in self.bajas:
+            yield 'BAJA', cedula, nombre, ''
+
+def _leer_nomina(contrato, dataset, columnas, reporte):
+    faltantes = [
+        columna for columna, atributo in columnas.items()
+        if atributo in Asegurado.CAMPOS_NOMINA + ('cedula',)
+        and atributo not in CAMPOS_OPCIONALES
+        and columna not in dataset.headers
+    ]
+    if faltantes:
+        reporte.errores.append(f"Faltan las columnas: {', '.join(faltantes)}.")
+        return {}
+
+    entrantes = {}
+    for numero, numero_contrato, cedula, valores, errores in leer_filas(dataset, columnas):
+        if numero_contrato and numero_contrato != contrato.numero_contrato:
+            errores.append(f"pertenece al contrato '{numero_contrato}', no a '{contrato.numero_contrato}'.")
+        reporte.errores.extend(f"Fila {numero}: {error}" for error in errores)
+        for campo in CAMPOS_OPCIONALES:
+            if campo not in valores:
+                valores[campo] = Asegurado._meta.get_field(campo).get_default()
+        entrantes[cedula] = valores  # si la cédula se repite, prevalece la última fila
+    return entrantes
+
+def sincronizar_nomina(contrato, dataset, columnas, usuario=None, fecha_corte=None, aplicar=True, tamano_lote=TAMANO_LOTE):
+    """
+    Aplica la nómina completa que envía el cliente sobre los asegurados actuales del contrato.
+
+    Se comparan huellas (Asegurado.huella_nomina) por cédula, así que de la base solo se leen
+    pares (cédula, huella) y se cargan completos únicamente los asegurados que cambian o salen:
+    - altas: cédulas nuevas en la nómina (bulk_create);
+    - cambios: cédulas cuya huella difiere; se actualizan solo los campos modificados;
+    - bajas: asegurados vigentes que ya no vienen en la nómina; pasan a DE_BAJA con
+      fecha_baja = `fecha_corte` (hoy por defecto).
+
+    Con aplicar=False solo calcula el reporte. Si la nómina tiene errores no se aplica nada.
+    """
+    reporte = ReporteSincronizacion(contrato)
+    fecha_corte = fecha_corte or timezone.now().date()
+    entrantes = _leer_nomina(contrato, dataset, columnas, reporte)
+    if reporte.errores:
+        return reporte
+
+    # Las cédulas de la nómina vienen normalizadas; las guardadas se comparan de la misma forma,
+    # o un asegurado guardado con otro formato saldría a la vez como alta y como baja.
+    actuales = {}  # {cedula: (huella, estado, pk)}
+    ids = {}       # {cedula: [pk]} por si una cédula quedó guardada en más de un formato
+    for pk, cedula, huella, estado in contrato.asegurados.values_list('pk', 'cedula', 'huella_nomina', 'estado_individual'):
+        clave = normalizar_cedula(cedula)
+        if clave not in actuales or cedula == clave:
+            actuales[clave] = (huella, estado, pk)
+        ids.setdefault(clave, []).append(pk)
+    huellas = {
+        cedula: huella_nomina(valores.get(campo) for campo in Asegurado.CAMPOS_NOMINA)
+        for cedula, valores in entrantes.items()
+    }
+    cedulas_altas = [cedula for cedula in entrantes if cedula not in actuales]
+    cedulas_cambios = [cedula for cedula in entrantes if cedula in actuales and actuales[cedula][0] != huellas[cedula]]
+    cedulas_bajas = [
+        cedula for cedula, (_, estado, _) in actuales.items()
+        if cedula not in entrantes and estado != Asegurado.EstadoAsegurado.DE_BAJA
+    ]
+    reporte.sin_cambios = len(entrantes) - len(cedulas_altas) - len(cedulas_cambios)
+
+    altas = []
+    for cedula in cedulas_altas:
+        valores = entrantes[cedula]
+        asegurado = Asegurado(contrato=contrato, **valores)
+        asegurado.nombre_normalizado = normalize_text(asegurado.nombre_completo)
+        asegurado.huella_nomina = huellas[cedula]
+        altas.append(asegurado)
+        reporte.altas.append((cedula, asegurado.nombre_completo))
+
+    modificados = []
+    campos_modificados = set()
+    for asegurado in contrato.asegurados.filter(pk__in=[actuales[c][2] for c in cedulas_cambios]).iterator(chunk_size=tamano_lote):
+        cedula = normalizar_cedula(asegurado.cedula)
+        valores = entrantes[cedula]
+        detalle = {}
+        for campo in Asegurado.CAMPOS_NOMINA:
+            if getattr(asegurado, campo) != valores.get(campo):
+                detalle[campo] = (getattr(asegurado, campo), valores.get(campo))
+                setattr(asegurado, campo, valores.get(campo))
+        asegurado.nombre_normalizado = normalize_text(asegurado.nombre_completo)
+        asegurado.huella_nomina = huellas[cedula]
+        campos_modificados.update(detalle)
+        modificados.append(asegurado)
+        reporte.cambios.append((asegurado.cedula, asegurado.nombre_completo, detalle))
+
+    dados_de_baja = []
+    for asegurado in contrato.asegurados.filter(pk__in=[pk for c in cedulas_bajas for pk in ids[c]]).exclude(
+        estado_individual=Asegurado.EstadoAsegurado.DE_BAJA
+    ).iterator(chunk_size=tamano_lote):
+        asegurado.estado_individual = Asegurado.EstadoAsegurado.DE_BAJA
+        asegurado.fecha_baja = fecha_corte
+        asegurado.huella_nomina = asegurado.calcular_huella()
+        dados_de_baja.append(asegurado)
+        reporte.bajas.append((asegurado.cedula, asegurado.nombre_completo))
+
+    if not aplicar:
+        return reporte
+
+    with transaction.atomic():
+        if altas:
+            bulk_create_with_history(altas, Asegurado, batch_size=tamano_lote, default_user=usuario,
+                                     default_change_reason="Sincronización de nómina: alta")
+        if modificados:
+            campos = sorted(campos_modificados | {'nombre_normalizado', 'huella_nomina'})
+            bulk_update_with_history(modificados, Asegurado, campos, batch_size=tamano_lote, default_user=usuario,
+                                     default_change_reason="Sincronización de nómina: cambio")
+        if dados_de_baja:
+            bulk_update_with_history(dados_de_baja, Asegurado, ['estado_individual', 'fecha_baja', 'huella_nomina'],
+                                     batch_size=tamano_lote, default_user=usuario,
+                                     default_change_reason="Sincronización de nómina: baja")
+    reporte.aplicado = True
+    return reporte
@@ -0,0 +1,104 @@
+# gestion/tasas.py
+
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import TasaBCV
+from .utils import CargaPorVersion
+
+CENTAVO = Decimal('0.01')
+
+def convertir_monto(monto, tasa, a='USD'):
+    """`monto` en VES -> USD (a='USD') o en USD -> VES (a='VES'), al céntimo. None si falta el monto o la tasa."""
+    if monto is None or not tasa:
+        return None
+    return ((monto / tasa) if a == 'USD' else (monto * tasa)).quantize(CENTAVO)
+
+class SerieTasas:
+    """
+    Tasas BCV ordenadas por fecha, en memoria. La tasa de una fecha es la última publicada en
+    o antes de ella (fines de semana y feriados toman la del día hábil anterior).
+    """
+
+    def __init__(self, filas):
+        self.fechas = [fecha for fecha, _ in filas]
+        self.tasas = [tasa for _, tasa in filas]
+
+    def tasa_en(self, fecha):
+        """Tasa vigente en `fecha`, o None si es anterior a la primera cargada (o no hay fecha)."""
+        if fecha is None:
+            return None
+        i = bisect_right(self.fechas, fecha) - 1
+        return self.tasas[i] if i >= 0 else None
+
+    def tasas_en(self, fechas):
+        """Tasas de muchas fechas: {fecha: tasa}. Cada fecha distinta se ubica una sola vez."""
+        return {fecha: self.tasa_en(fecha) for fecha in set(fechas)}
+
+    def convertir(self, montos, fechas, a='USD'):
+        """
+        Convierte en una pasada `montos` (VES si a='USD', USD si a='VES') con la tasa de la
+        fecha correspondiente de `fechas`. Devuelve la lista de montos convertidos, redondeados
+        al céntimo; None donde falta el monto o no hay tasa para la fecha.
+        """
+        if a not in ('USD', 'VES'):
+            raise ValueError("La moneda destino debe ser 'USD' o 'VES'.")
+        fechas = list(fechas)
+        tasas = self.tasas_en(fechas)
+        return [convertir_monto(monto, tasas[fecha], a) for monto, fecha in zip(montos, fechas)]
+
+def _cargar_serie():
+    return SerieTasas(list(TasaBCV.objects.order_by('fecha').values_list('fecha', 'tasa')))
+
+# Serie de este proceso; se recarga cuando se publica una versión nueva.
+_serie = CargaPorVersion('tasas_bcv:version', _cargar_serie)
+
+def obtener_serie():
+    """
+    La serie de tasas de este proceso (una query al cargarla). Se recarga cuando cambia la versión
+    publicada en la caché compartida (ver invalidar_tasas y gestion/signals.py).
+    """
+    return _serie.obtener()
+
+def tasa_en(fecha):
+    return obtener_serie().tasa_en(fecha)
+
+def a_usd(montos_ves, fechas):
+    """Montos en VES -> USD con la tasa de cada fecha (ver SerieTasas.convertir)."""
+    return obtener_serie().convertir(montos_ves, fechas, a='USD')
+
+def a_ves(montos_usd, fechas):
+    """Montos en USD -> VES con la tasa de cada fecha (ver SerieTasas.convertir)."""
+    return obtener_serie().convertir(montos_usd, fechas, a='VES')
+
+def tasa_de(campo_fecha):
+    """
+    Expresión con la tasa vigente en la fecha del campo `campo_fecha`, para convertir en la misma
+    query que lista las filas: qs.annotate(tasa=tasa_de('fecha_emision_factura')).
+    """
+    return Subquery(TasaBCV.objects.filter(fecha__lte=OuterRef(campo_fecha)).order_by('-fecha').values('tasa')[:1])
+
+@transaction.atomic
+def cargar_tasas(tasas, tamano_lote=1000):
+    """
+    Guarda {fecha: tasa} con INSERT ... ON CONFLICT en lotes: las fechas nuevas se crean y las
+    existentes toman la tasa del archivo. Devuelve (nuevas, actualizadas); las que no cambian no cuentan.
+    """
+    if not tasas:
+        return 0, 0
+    existentes = dict(TasaBCV.objects.filter(fecha__in=list(tasas)).values_list('fecha', 'tasa'))
+    cambios = [TasaBCV(fecha=fecha, tasa=tasa) for fecha, tasa in sorted(tasas.items()) if existentes.get(fecha) != tasa]
+    TasaBCV.objects.bulk_create(
+        cambios, batch_size=tamano_lote,
+        update_conflicts=True, unique_fields=['fecha'], update_fields=['tasa'],
+    )
+    # bulk_create no dispara señales: se publica una nueva versión de la serie al confirmar.
+    transaction.on_commit(invalidar_tasas)
+    nuevas = sum(1 for t in cambios if t.fecha not in existentes)
+    return nuevas, len(cambios) - nuevas
+
+def invalidar_tasas():
+    _serie.invalidar()
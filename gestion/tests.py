@@ -1,3 +1,80 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import BaremoProveedor, CategoriaServicio, PrecioBaremo, Proveedor, SubServicio
+from .precios import INICIO_VIGENCIA, precio_vigente, precios_en_lote, registrar_precio, revalorizar
+
+
+class PreciosBaremoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hoy = timezone.localdate()
+        categoria = CategoriaServicio.objects.create(nombre='Laboratorio')
+        proveedor = Proveedor.objects.create(rif='J-1', razon_social='Clínica Uno', direccion_fiscal='Caracas')
+        cls.baremos = [
+            BaremoProveedor.objects.create(
+                proveedor=proveedor, precio=precio,
+                sub_servicio=SubServicio.objects.create(categoria=categoria, codigo=codigo, descripcion=codigo),
+            )
+            for codigo, precio in (('L01', 10), ('L02', 20))
+        ]
+        cls.baremo = cls.baremos[0]
+
+    def versiones(self, baremo):
+        return list(
+            PrecioBaremo.objects.filter(baremo=baremo).order_by('vigente_desde')
+            .values_list('precio', 'vigente_desde', 'vigente_hasta')
+        )
+
+    def test_precio_en_los_limites_de_vigencia(self):
+        desde = self.hoy - timedelta(days=10)
+        registrar_precio(self.baremo.pk, 15, desde)
+        consultas = [desde - timedelta(days=1), desde, INICIO_VIGENCIA - timedelta(days=1)]
+        precios = precios_en_lote((self.baremo.pk, fecha) for fecha in consultas)
+        # vigente_hasta es exclusivo: ese día ya rige la versión siguiente.
+        self.assertEqual([precios[(self.baremo.pk, fecha)] for fecha in consultas], [10, 15, None])
+        self.baremo.refresh_from_db()
+        self.assertEqual(self.baremo.precio, 15)
+
+    def test_registrar_precio_antes_de_uno_programado(self):
+        registrar_precio(self.baremo.pk, 30, self.hoy + timedelta(days=30))
+        registrar_precio(self.baremo.pk, 20, self.hoy + timedelta(days=10))
+        self.assertEqual(self.versiones(self.baremo), [
+            (10, INICIO_VIGENCIA, self.hoy + timedelta(days=10)),
+            (20, self.hoy + timedelta(days=10), self.hoy + timedelta(days=30)),
+            (30, self.hoy + timedelta(days=30), None),
+        ])
+        self.assertEqual(precio_vigente(self.baremo.pk), 10)
+        self.assertEqual(precio_vigente(self.baremo.pk, self.hoy + timedelta(days=29)), 20)
+        self.baremo.refresh_from_db()
+        self.assertEqual(self.baremo.precio, 10)
+
+    def test_revalorizar_inserta_versiones_y_respeta_las_programadas(self):
+        futuro = self.hoy + timedelta(days=30)
+        registrar_precio(self.baremo.pk, 50, futuro)
+        otro = self.baremos[1]
+        registrar_precio(otro.pk, 25, self.hoy)  # ya tiene una versión que empieza hoy: se reemplaza
+
+        self.assertEqual(revalorizar(BaremoProveedor.objects.all(), 10, self.hoy), 2)
+        self.assertEqual(self.versiones(self.baremo), [
+            (10, INICIO_VIGENCIA, self.hoy),
+            (Decimal('11.00'), self.hoy, futuro),
+            (50, futuro, None),
+        ])
+        self.assertEqual(self.versiones(otro), [(20, INICIO_VIGENCIA, self.hoy), (Decimal('27.50'), self.hoy, None)])
+        self.assertEqual(
+            list(BaremoProveedor.objects.order_by('pk').values_list('precio', flat=True)),
+            [Decimal('11.00'), Decimal('27.50')],
+        )
 
-# Create your tests here.
+    def test_guardar_sin_cambiar_el_precio_no_crea_versiones(self):
+        registrar_precio(self.baremo.pk, 40, date(2000, 6, 1))
+        BaremoProveedor.objects.filter(pk=self.baremo.pk).update(precio=10)  # aún sin actualizar_precios_baremo
+        baremo = BaremoProveedor.objects.get(pk=self.baremo.pk)
+        baremo.activo = False
+        baremo.save()
+        self.assertEqual(self.versiones(baremo), [(10, INICIO_VIGENCIA, date(2000, 6, 1)), (40, date(2000, 6, 1), None)])
@@ -6,4 +6,5 @@ from . import admin_views
 urlpatterns = [
     path('mapa-proveedores/', admin_views.mapa_proveedores_view, name='mapa_proveedores'),
     path('api/proveedores-activos/', admin_views.proveedores_activos_api, name='proveedores_activos_api'),
+    path('api/mapa-estados/', admin_views.mapa_estados_api, name='mapa_estados_api'),
 ]
\ No newline at end of file
@@ -0,0 +1,108 @@
+# gestion/utils.py
+
+import hashlib
+import json
+import unicodedata
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+def normalize_text(text):
+    """Quita acentos y pasa a minúsculas para comparar textos ('José' -> 'jose')."""
+    if not text:
+        return ""
+    return ''.join(c for c in unicodedata.normalize('NFD', text)
+                   if unicodedata.category(c) != 'Mn').lower()
+
+def normalizar_cedula(valor):
+    """Limpia una cédula escrita a mano o exportada de Excel ('V-12.345.678' -> '12345678')."""
+    cedula = str(valor or '').strip().upper()
+    if cedula.endswith('.0'):
+        cedula = cedula[:-2]
+    for separador in (' ', '.', '-', ','):
+        cedula = cedula.replace(separador, '')
+    if cedula[:1] in ('V', 'E', 'P') and cedula[1:].isdigit():
+        cedula = cedula[1:]
+    return cedula
+
+def huella_nomina(valores):
+    """Hash corto de los datos de nómina de un asegurado; si dos huellas coinciden, los datos también."""
+    texto = '\x1f'.join('' if v is None else str(v) for v in valores)
+    return hashlib.blake2b(texto.encode(), digest_size=16).hexdigest()
+
+def version_de(datos):
+    """
+    Hash corto del contenido de `datos` serializado en JSON. Sirve de ETag: todos los procesos
+    calculan la misma versión para los mismos datos, aunque cada uno tenga su propia caché.
+    """
+    texto = json.dumps(datos, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.blake2b(texto.encode(), digest_size=8).hexdigest()
+
+def version_publicada(clave):
+    """Versión publicada bajo `clave` en la caché compartida; si no hay ninguna, publica la primera."""
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        version = cache.get(clave)
+    return version
+
+def publicar_version(clave):
+    """Publica una versión nueva bajo `clave`: cada proceso recarga lo que dependa de ella."""
+    cache.set(clave, uuid.uuid4().hex, timeout=None)
+
+class CargaPorVersion:
+    """
+    Estructura en memoria de este proceso que se arma con `construir()` y se vuelve a armar
+    cuando cambia la versión publicada bajo `clave` (ver publicar_version).
+    """
+    def __init__(self, clave, construir):
+        self.clave = clave
+        self.construir = construir
+        self._cargada = None  # (version, estructura)
+
+    def obtener(self):
+        version = version_publicada(self.clave)
+        if self._cargada is None or self._cargada[0] != version:
+            self._cargada = (version, self.construir())
+        return self._cargada[1]
+
+    def invalidar(self):
+        publicar_version(self.clave)
+
+def leer_decimal(valor):
+    """
+    Número de una planilla: acepta celdas numéricas y textos como '1234.56' o '1.234,56'.
+    None si viene vacío; decimal.InvalidOperation si no es un número.
+    """
+    if valor is None or isinstance(valor, (int, float, Decimal)):
+        return None if valor is None else Decimal(str(valor))
+    texto = str(valor).strip().replace(' ', '')
+    if not texto:
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return Decimal(texto)
+
+def leer_fecha(valor):
+    """Fecha de una planilla: celdas de fecha o textos DD/MM/AAAA, AAAA-MM-DD o DD-MM-AAAA. None si viene vacía."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date) or valor is None:
+        return valor
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha '{texto}' no reconocida (use DD/MM/AAAA).")
+
+class Echo:
+    """Objeto tipo archivo que devuelve lo escrito; permite usar csv.writer con StreamingHttpResponse."""
+    def write(self, value):
+        return value
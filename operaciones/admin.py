@@ -1,7 +1,21 @@
 # operaciones/admin.py
 
-from django.contrib import admin
-from .models import Siniestro, OrdenDeServicio
+import os
+from decimal import Decimal, InvalidOperation
+
+import tablib
+from django.contrib import admin, messages
+from django.db.models import Prefetch
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from core.exportacion import TAMANO_BLOQUE, ExportacionStreamingMixin
+from gestion.models import Proveedor
+from .conciliacion import COLUMNAS, TOLERANCIA_PORCENTAJE, TOLERANCIA_USD, conciliar_estado_de_cuenta
+from .models import LineaOrdenServicio, Siniestro, OrdenDeServicio, SiniestralidadMensual
+from .siniestralidad import DIMENSIONES, consultar_siniestralidad, marca_siniestralidad, parametros_consulta
 
 @admin.register(Siniestro)
 class SiniestroAdmin(admin.ModelAdmin):
@@ -17,8 +31,19 @@ class SiniestroAdmin(admin.ModelAdmin):
     # Hacemos que los campos de fecha sean de solo lectura una vez creados
     readonly_fields = ('fecha_reporte',)
 
+class LineaOrdenServicioInline(admin.TabularInline):
+    """Renglones de la OS: se fijan al emitirla, por lo que aquí solo se consultan."""
+    model = LineaOrdenServicio
+    extra = 0
+    can_delete = False
+    fields = ('descripcion', 'categoria', 'cantidad', 'precio_unitario', 'subtotal')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(OrdenDeServicio)
-class OrdenDeServicioAdmin(admin.ModelAdmin):
+class OrdenDeServicioAdmin(ExportacionStreamingMixin, admin.ModelAdmin):
     """
     Configuración del panel de administración para el modelo OrdenDeServicio.
     Organizamos los campos en secciones lógicas para facilitar la gestión.
@@ -28,8 +53,16 @@ class OrdenDeServicioAdmin(admin.ModelAdmin):
     search_fields = ('numero_os', 'siniestro__asegurado__nombre_completo', 'siniestro__asegurado__cedula')
     
     # Habilitamos la búsqueda para una carga más fácil
-    autocomplete_fields = ['siniestro', 'punto_atencion', 'servicios_prestados']
+    autocomplete_fields = ['siniestro', 'punto_atencion']
+    inlines = [LineaOrdenServicioInline]
     
+    exportacion_nombre = 'ordenes_de_servicio'
+    exportacion_encabezados = (
+        'NUMERO OS', 'FECHA EMISION', 'ESTADO', 'CEDULA', 'ASEGURADO', 'CONTRATO', 'CLIENTE', 'PLAN',
+        'PROVEEDOR', 'SEDE', 'SERVICIOS', 'MONTO REFERENCIAL (USD)', 'NUMERO FACTURA',
+        'MONTO FACTURA (VES)', 'MONTO FACTURA (USD)', 'TASA BCV',
+    )
+
     # Definimos qué campos no se pueden editar manualmente
     readonly_fields = (
         'numero_os',
@@ -44,7 +77,7 @@ class OrdenDeServicioAdmin(admin.ModelAdmin):
             'fields': ('siniestro', 'numero_os', 'punto_atencion', 'estado_os')
         }),
         ('Servicios y Montos', {
-            'fields': ('servicios_prestados', 'monto_referencial_os')
+            'fields': ('monto_referencial_os',)
         }),
         ('Fechas Clave', {
             'fields': ('fecha_emision', 'fecha_vencimiento_activacion')
@@ -56,4 +89,130 @@ class OrdenDeServicioAdmin(admin.ModelAdmin):
                 'fecha_recepcion_factura', 'monto_factura_ves', 'monto_factura_usd', 'tasa_bcv'
             ),
         }),
-    )
\ No newline at end of file
+    )
+
+    def filas_exportacion(self, queryset):
+        # Las relaciones 1-1 viajan en el mismo SELECT; las líneas se traen en un prefetch por bloque.
+        queryset = queryset.select_related(
+            'siniestro__asegurado__contrato__cliente', 'siniestro__asegurado__contrato__plan',
+            'punto_atencion__proveedor',
+        ).prefetch_related(
+            Prefetch('lineas', queryset=LineaOrdenServicio.objects.order_by('id'))
+        )
+        for orden in queryset.iterator(chunk_size=TAMANO_BLOQUE):
+            asegurado = orden.siniestro.asegurado
+            contrato = asegurado.contrato
+            yield [
+                orden.numero_os, timezone.localtime(orden.fecha_emision).strftime('%d/%m/%Y %H:%M'), orden.get_estado_os_display(),
+                asegurado.cedula, asegurado.nombre_completo, contrato.numero_contrato, contrato.cliente.razon_social,
+                contrato.plan.nombre_plan, orden.punto_atencion.proveedor.razon_social, orden.punto_atencion.nombre_sede,
+                ' | '.join(str(l) if l.cantidad > 1 else l.descripcion for l in orden.lineas.all()),
+                orden.monto_referencial_os, orden.numero_factura or '', orden.monto_factura_ves or '',
+                orden.monto_factura_usd or '', orden.tasa_bcv or '',
+            ]
+
+    # Filas mostradas por sección en el reporte de conciliación.
+    LIMITE_REPORTE = 200
+
+    def get_urls(self):
+        urls = [
+            path('conciliar-facturas/', self.admin_site.admin_view(self.conciliacion_view), name='operaciones_ordendeservicio_conciliacion'),
+        ]
+        return urls + super().get_urls()
+
+    def conciliacion_view(self, request):
+        """Carga el estado de cuenta mensual de un proveedor y concilia (o simula) sus facturas contra las OS."""
+        if not self.has_change_permission(request):
+            return redirect('admin:operaciones_ordendeservicio_changelist')
+
+        reporte = None
+        proveedor_id = request.POST.get('proveedor', '')
+        tolerancia_usd = request.POST.get('tolerancia_usd', str(TOLERANCIA_USD))
+        tolerancia_porcentaje = request.POST.get('tolerancia_porcentaje', str(TOLERANCIA_PORCENTAJE))
+        if request.method == 'POST':
+            archivo = request.FILES.get('archivo')
+            formato = os.path.splitext(archivo.name)[1].lower().lstrip('.') if archivo else ''
+            proveedor = Proveedor.objects.filter(pk=proveedor_id).first() if proveedor_id.isdigit() else None
+            if proveedor is None:
+                messages.error(request, "Debe seleccionar el proveedor del estado de cuenta.")
+                return redirect('admin:operaciones_ordendeservicio_conciliacion')
+            if formato not in ('csv', 'xlsx'):
+                messages.error(request, "Debe seleccionar un archivo CSV o XLSX.")
+                return redirect('admin:operaciones_ordendeservicio_conciliacion')
+            try:
+                tolerancias = Decimal(tolerancia_usd), Decimal(tolerancia_porcentaje)
+            except InvalidOperation:
+                messages.error(request, "Las tolerancias deben ser números.")
+                return redirect('admin:operaciones_ordendeservicio_conciliacion')
+            contenido = archivo.read()
+            if formato == 'csv':
+                contenido = contenido.decode('utf-8-sig')
+            dataset = tablib.Dataset().load(contenido, format=formato)
+            reporte = conciliar_estado_de_cuenta(
+                proveedor, dataset, usuario=request.user, aplicar=not request.POST.get('simular'),
+                tolerancia_usd=tolerancias[0], tolerancia_porcentaje=tolerancias[1],
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Conciliar estado de cuenta de proveedor',
+            'opts': self.model._meta,
+            'proveedores': Proveedor.objects.filter(activo=True).order_by('razon_social').values_list('id', 'razon_social'),
+            'proveedor_id': proveedor_id,
+            'tolerancia_usd': tolerancia_usd,
+            'tolerancia_porcentaje': tolerancia_porcentaje,
+            'columnas': list(COLUMNAS),
+            'reporte': reporte,
+            'limite': self.LIMITE_REPORTE,
+        }
+        return TemplateResponse(request, 'admin/operaciones/ordendeservicio/conciliacion.html', context)
+
+@admin.register(SiniestralidadMensual)
+class SiniestralidadMensualAdmin(admin.ModelAdmin):
+    """Resumen calculado por el comando actualizar_siniestralidad: solo lectura, con su tablero."""
+    list_display = ('mes', 'cliente', 'plan', 'aseguradora', 'ente', 'categoria', 'ordenes', 'servicios', 'monto_usd')
+    list_filter = ('mes', 'aseguradora', 'plan')
+    list_select_related = ('cliente', 'plan', 'categoria')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('tablero/', self.admin_site.admin_view(self.tablero_view), name='operaciones_siniestralidadmensual_tablero'),
+        ]
+        return urls + super().get_urls()
+
+    def tablero_view(self, request):
+        """Siniestralidad agrupada por las dimensiones elegidas, leída solo del resumen."""
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
+        filas, por = [], ['mes']
+        try:
+            parametros = parametros_consulta(request.GET)
+            por = [d for d in parametros['por'].split(',') if d in DIMENSIONES] or por
+            filas = consultar_siniestralidad(**parametros)
+        except ValueError as e:
+            messages.error(request, str(e))
+        columnas = [DIMENSIONES[d][1] for d in por]
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Tablero de siniestralidad',
+            'opts': self.model._meta,
+            'dimensiones': list(DIMENSIONES),
+            'por': por,
+            'desde': request.GET.get('desde', ''),
+            'hasta': request.GET.get('hasta', ''),
+            'filas': [([fila[c] for c in columnas], fila) for fila in filas],
+            'totales': {
+                campo: sum((fila[campo] for fila in filas), 0) for campo in ('ordenes', 'servicios', 'monto_usd')
+            },
+            'actualizado_al': marca_siniestralidad(),
+        }
+        return TemplateResponse(request, 'admin/operaciones/siniestralidadmensual/tablero.html', context)
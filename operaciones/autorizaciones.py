@@ -0,0 +1,115 @@
+# operaciones/autorizaciones.py
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from simple_history.utils import bulk_update_with_history
+
+from gestion.models import Asegurado
+from .consumo import recalcular_consumo
+from .models import LineaOrdenServicio, OrdenDeServicio, SecuenciaOS
+from .notificaciones import ajustar_pendientes
+
+TAMANO_PAGINA = 50
+
+def pagina_pendientes(cursor=None, tamano=TAMANO_PAGINA, antes=None):
+    """
+    Página de OS pendientes de autorización, paginada por keyset sobre (fecha_emision, siniestro_id):
+    cada página cuesta lo mismo sin importar cuántas haya antes. Trae en la misma ida los datos
+    que muestra la bandeja (asegurado, proveedor y servicios).
+    Con `cursor` se avanza a las posteriores a esa posición; con `antes`, se retrocede a las
+    `tamano` inmediatamente anteriores.
+    Devuelve (ordenes, cursor_anterior, cursor_siguiente); cada cursor es None en el extremo.
+    """
+    ordenes = OrdenDeServicio.objects.filter(
+        estado_os=OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
+    ).select_related(
+        'siniestro__asegurado', 'punto_atencion__proveedor'
+    ).prefetch_related(
+        Prefetch('lineas', queryset=LineaOrdenServicio.objects.order_by('id'))
+    )
+
+    posicion = _leer_cursor(antes)
+    if posicion:
+        fecha, siniestro_id = posicion
+        ordenes = list(
+            ordenes.filter(fecha_emision__lte=fecha).exclude(fecha_emision=fecha, siniestro_id__gte=siniestro_id)
+            .order_by('-fecha_emision', '-siniestro_id')[:tamano + 1]
+        )
+        hay_anteriores = len(ordenes) > tamano
+        ordenes = ordenes[:tamano][::-1]
+        # La posición de `antes` venía de una página posterior, así que hay siguientes.
+        hay_siguientes = bool(ordenes)
+    else:
+        posicion = _leer_cursor(cursor)
+        ordenes = ordenes.order_by('fecha_emision', 'siniestro_id')
+        if posicion:
+            fecha, siniestro_id = posicion
+            ordenes = ordenes.filter(fecha_emision__gte=fecha).exclude(fecha_emision=fecha, siniestro_id__lte=siniestro_id)
+        ordenes = list(ordenes[:tamano + 1])
+        hay_siguientes = len(ordenes) > tamano
+        ordenes = ordenes[:tamano]
+        hay_anteriores = bool(posicion and ordenes)
+
+    anterior = _cursor_de(ordenes[0]) if hay_anteriores else None
+    siguiente = _cursor_de(ordenes[-1]) if hay_siguientes else None
+    return ordenes, anterior, siguiente
+
+def _cursor_de(orden):
+    return f"{orden.fecha_emision.isoformat()}_{orden.siniestro_id}"
+
+def _leer_cursor(cursor):
+    try:
+        fecha, siniestro_id = cursor.rsplit('_', 1)
+        fecha = parse_datetime(fecha)
+        return (fecha, int(siniestro_id)) if fecha else None
+    except (AttributeError, ValueError):
+        return None
+
+@transaction.atomic
+def resolver_autorizaciones(os_ids, usuario, aprobar, motivo_rechazo=''):
+    """
+    Aprueba o rechaza en bloque las OS indicadas que sigan pendientes de autorización, en una
+    transacción: un UPDATE por lote y una inserción masiva de su historial. Devuelve las OS resueltas.
+    """
+    ordenes = list(
+        OrdenDeServicio.objects.select_for_update(of=('self',)).select_related('siniestro').filter(
+            pk__in=os_ids, estado_os=OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
+        )
+    )
+    if not ordenes:
+        return []
+
+    ahora = timezone.now()
+    campos = ['estado_os', 'autorizado_por', 'fecha_autorizacion', 'actualizado_en']
+    if aprobar:
+        campos += ['numero_os', 'fecha_vencimiento_activacion']
+    else:
+        campos += ['motivo_rechazo']
+
+    if aprobar:
+        # Un solo bloque de correlativos para todo el lote (una fila bloqueada, una escritura).
+        primero = SecuenciaOS.reservar(SecuenciaOS.serie_de(timezone.localtime(ahora)), len(ordenes))
+
+    for i, orden in enumerate(ordenes):
+        orden.autorizado_por = usuario
+        orden.fecha_autorizacion = ahora
+        orden.actualizado_en = ahora
+        if aprobar:
+            orden.estado_os = OrdenDeServicio.EstadoOS.NOTIFICADA
+            orden.asignar_numero(ahora, primero + i)
+        else:
+            orden.estado_os = OrdenDeServicio.EstadoOS.RECHAZADA
+            orden.motivo_rechazo = motivo_rechazo
+
+    bulk_update_with_history(ordenes, OrdenDeServicio, campos, default_user=usuario, default_date=ahora)
+
+    # bulk_update no dispara señales: actualizamos aquí el libro de consumo y el contador.
+    if not aprobar:
+        asegurado_ids = {orden.siniestro.asegurado_id for orden in ordenes}
+        for asegurado in Asegurado.objects.filter(pk__in=asegurado_ids).select_related('contrato'):
+            recalcular_consumo(asegurado)
+    resueltas = len(ordenes)
+    transaction.on_commit(lambda: ajustar_pendientes(-resueltas))
+    return ordenes
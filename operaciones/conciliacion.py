@@ -0,0 +1,233 @@
+# operaciones/conciliacion.py
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_update_with_history
+
+from gestion.tasas import convertir_monto, obtener_serie
+from gestion.utils import leer_decimal, leer_fecha
+
+from .models import OrdenDeServicio
+
+# Columnas del estado de cuenta del proveedor: {columna del archivo: campo}.
+COLUMNAS = {
+    'NUMERO OS': 'numero_os',
+    'NUMERO FACTURA': 'numero_factura',
+    'NUMERO CONTROL': 'numero_control_factura',
+    'FECHA FACTURA': 'fecha_emision_factura',
+    'MONTO VES': 'monto_factura_ves',
+    'MONTO USD': 'monto_factura_usd',
+    'TASA BCV': 'tasa_bcv',
+}
+COLUMNAS_OBLIGATORIAS = ('NUMERO OS', 'NUMERO FACTURA')
+
+# Solo se concilian OS cuyo servicio ya se prestó; pasan a pendientes por pagar.
+ESTADOS_CONCILIABLES = (OrdenDeServicio.EstadoOS.ACTIVADA,)
+
+# Diferencia aceptada entre el monto facturado (USD) y el referencial de la OS: la mayor de las dos.
+TOLERANCIA_USD = Decimal('1.00')
+TOLERANCIA_PORCENTAJE = Decimal('2')
+
+CAMPOS_FACTURA = (
+    'numero_factura', 'numero_control_factura', 'fecha_emision_factura', 'fecha_recepcion_factura',
+    'monto_factura_ves', 'monto_factura_usd', 'tasa_bcv', 'estado_os', 'actualizado_en',
+)
+
+CENTAVO = Decimal('0.01')
+DIEZMILESIMA = Decimal('0.0001')
+
+class ReporteConciliacion:
+    """Resultado de conciliar un estado de cuenta contra las OS de un proveedor."""
+
+    def __init__(self, proveedor):
+        self.proveedor = proveedor
+        self.conciliadas = []    # [(fila, numero_os, numero_factura, monto_usd, referencial, diferencia)]
+        self.discrepancias = []  # [(fila, numero_os, numero_factura, monto_usd, referencial, motivo)]
+        self.rechazadas = []     # [(fila, numero_os, motivo)]: no se pueden conciliar
+        self.errores = []        # errores del archivo completo (p. ej. columnas faltantes)
+        self.aplicado = False
+
+    @property
+    def total_filas(self):
+        return len(self.conciliadas) + len(self.discrepancias) + len(self.rechazadas)
+
+    def filas(self):
+        """Filas (resultado, fila, numero_os, numero_factura, monto_usd, referencial, detalle) para exportar el reporte."""
+        for fila, numero_os, factura, monto, referencial, diferencia in self.conciliadas:
+            yield 'CONCILIADA', fila, numero_os, factura, monto, referencial, f"Diferencia: {diferencia}"
+        for fila, numero_os, factura, monto, referencial, motivo in self.discrepancias:
+            yield 'DISCREPANCIA', fila, numero_os, factura, monto, referencial, motivo
+        for fila, numero_os, motivo in self.rechazadas:
+            yield 'RECHAZADA', fila, numero_os, '', '', '', motivo
+
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+def leer_estado_de_cuenta(dataset, serie=None):
+    """
+    Convierte las filas del dataset en (numero_fila, valores, errores), con montos y fechas ya
+    interpretados. `valores` trae solo los campos de las columnas presentes en el archivo, más los
+    que se pudieron deducir: si la fila no trae la tasa, se toma de `serie` (gestion.tasas.SerieTasas)
+    para la fecha de la factura, y con ella se completa el monto en USD o en VES que falte. Así un
+    archivo sin, p. ej., NUMERO CONTROL no borra el que ya tenía la OS.
+    No consulta la base de datos.
+    """
+    columnas = {columna: campo for columna, campo in COLUMNAS.items() if columna in (dataset.headers or ())}
+    for numero, fila in enumerate(dataset.dict, start=2):  # la fila 1 son los encabezados
+        valores = {}
+        errores = []
+        for columna, campo in columnas.items():
+            valor = fila.get(columna)
+            try:
+                if campo.startswith(('monto_', 'tasa_')):
+                    valor = leer_decimal(valor)
+                    if valor is not None:
+                        valor = valor.quantize(CENTAVO if campo.startswith('monto_') else DIEZMILESIMA)
+                    valores[campo] = valor
+                elif campo == 'fecha_emision_factura':
+                    valores[campo] = leer_fecha(valor)
+                else:
+                    valores[campo] = _texto(valor)[:50] or None
+            except (InvalidOperation, ValueError) as e:
+                errores.append(f"{columna}: {e if isinstance(e, ValueError) else 'monto no válido'}")
+        if not valores.get('numero_os'):
+            errores.append("falta el número de OS.")
+        if not valores.get('numero_factura'):
+            errores.append("falta el número de factura.")
+        if valores.get('tasa_bcv') is None and serie is not None:
+            tasa = serie.tasa_en(valores.get('fecha_emision_factura'))
+            if tasa is not None:
+                valores['tasa_bcv'] = tasa
+        ves, usd, tasa = valores.get('monto_factura_ves'), valores.get('monto_factura_usd'), valores.get('tasa_bcv')
+        if usd is None:
+            usd = convertir_monto(ves, tasa, a='USD')
+            if usd is not None:
+                valores['monto_factura_usd'] = usd
+        elif ves is None:
+            ves = convertir_monto(usd, tasa, a='VES')
+            if ves is not None:
+                valores['monto_factura_ves'] = ves
+        if valores.get('monto_factura_usd') is None and not errores:
+            errores.append("falta el monto en USD (o el monto en VES con la fecha o la tasa BCV).")
+        yield numero, valores, errores
+
+def conciliar_estado_de_cuenta(proveedor, dataset, usuario=None, aplicar=True, fecha_recepcion=None,
+                               tolerancia_usd=TOLERANCIA_USD, tolerancia_porcentaje=TOLERANCIA_PORCENTAJE):
+    """
+    Concilia el estado de cuenta mensual de un proveedor contra sus OS.
+
+    Cada fila se busca por número de OS entre las OS de las sedes del proveedor (una sola query
+    para todo el archivo). Se concilia si la OS está activada, la factura no está ya registrada en
+    otra OS del proveedor y el monto en USD no se aleja del referencial más que la tolerancia
+    (`tolerancia_usd` o `tolerancia_porcentaje` % del referencial, la mayor). Las que difieren
+    quedan como discrepancias y no se aplican.
+
+    La tasa BCV que no venga en el archivo se toma de la serie cargada (gestion.TasaBCV) para la
+    fecha de la factura. Las conciliadas se escriben en una transacción con un UPDATE por lote y
+    su historial: se registran los datos de la factura, la fecha de recepción (`fecha_recepcion`,
+    hoy por defecto) y la OS pasa a PENDIENTE_PAGO. Con aplicar=False solo se calcula el reporte.
+    """
+    reporte = ReporteConciliacion(proveedor)
+    faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in (dataset.headers or ())]
+    if faltantes:
+        reporte.errores.append(f"Faltan las columnas: {', '.join(faltantes)}.")
+        return reporte
+    if 'MONTO USD' not in dataset.headers and 'MONTO VES' not in dataset.headers:
+        reporte.errores.append("Se necesita la columna MONTO USD o MONTO VES.")
+        return reporte
+
+    filas = []
+    vistas = {}
+    for numero, valores, errores in leer_estado_de_cuenta(dataset, obtener_serie()):
+        numero_os = valores.get('numero_os') or ''
+        if errores:
+            reporte.rechazadas.append((numero, numero_os, ' '.join(errores)))
+        elif numero_os in vistas:
+            reporte.rechazadas.append((numero, numero_os, f"OS repetida en el archivo (ya figura en la fila {vistas[numero_os]})."))
+        else:
+            vistas[numero_os] = numero
+            filas.append((numero, valores))
+
+    ordenes = {
+        orden.numero_os: orden
+        for orden in OrdenDeServicio.objects.filter(
+            punto_atencion__proveedor=proveedor, numero_os__in=vistas,
+        )
+    }
+    facturas_registradas = dict(
+        OrdenDeServicio.objects.filter(
+            punto_atencion__proveedor=proveedor,
+            numero_factura__in={valores['numero_factura'] for _, valores in filas},
+        ).values_list('numero_factura', 'numero_os')
+    )
+    facturas_vistas = {}
+
+    hoy = fecha_recepcion or timezone.localdate()
+    conciliadas = []
+    for numero, valores in filas:
+        numero_os, factura = valores['numero_os'], valores['numero_factura']
+        orden = ordenes.get(numero_os)
+        if orden is None:
+            reporte.rechazadas.append((numero, numero_os, "No existe una OS con ese número para este proveedor."))
+            continue
+        if orden.estado_os not in ESTADOS_CONCILIABLES:
+            reporte.rechazadas.append((numero, numero_os, f"La OS está en estado '{orden.get_estado_os_display()}'."))
+            continue
+        otra_os = facturas_registradas.get(factura)
+        if otra_os and otra_os != numero_os:
+            reporte.rechazadas.append((numero, numero_os, f"La factura {factura} ya está registrada en la OS {otra_os}."))
+            continue
+        if factura in facturas_vistas:
+            reporte.rechazadas.append((numero, numero_os, f"La factura {factura} se repite en el archivo (fila {facturas_vistas[factura]})."))
+            continue
+        facturas_vistas[factura] = numero
+
+        monto, referencial = valores['monto_factura_usd'], orden.monto_referencial_os
+        diferencia = monto - referencial
+        tolerancia = max(tolerancia_usd, (referencial * tolerancia_porcentaje / 100).quantize(CENTAVO))
+        if abs(diferencia) > tolerancia:
+            reporte.discrepancias.append((
+                numero, numero_os, factura, monto, referencial,
+                f"El monto facturado difiere del referencial en {diferencia:+} USD (tolerancia {tolerancia}).",
+            ))
+            continue
+
+        for campo, valor in valores.items():
+            if campo != 'numero_os':
+                setattr(orden, campo, valor)
+        orden.fecha_recepcion_factura = hoy
+        orden.estado_os = OrdenDeServicio.EstadoOS.PENDIENTE_PAGO
+        orden.actualizado_en = timezone.now()
+        conciliadas.append(orden)
+        reporte.conciliadas.append((numero, numero_os, factura, monto, referencial, diferencia))
+    reporte.rechazadas.sort()
+
+    if not aplicar:
+        return reporte
+
+    with transaction.atomic():
+        # Solo las que siguen conciliables: otra carga o un operador pudo cambiarlas mientras tanto.
+        vigentes = set(
+            OrdenDeServicio.objects.select_for_update().filter(
+                pk__in=[orden.pk for orden in conciliadas], estado_os__in=ESTADOS_CONCILIABLES,
+            ).values_list('pk', flat=True)
+        )
+        if len(vigentes) < len(conciliadas):
+            cambiadas = {orden.numero_os for orden in conciliadas if orden.pk not in vigentes}
+            reporte.rechazadas.extend(
+                (numero, numero_os, "La OS cambió de estado durante la conciliación.")
+                for numero, numero_os, *_ in reporte.conciliadas if numero_os in cambiadas
+            )
+            reporte.conciliadas = [c for c in reporte.conciliadas if c[1] not in cambiadas]
+            conciliadas = [orden for orden in conciliadas if orden.pk in vigentes]
+        # ACTIVADA -> PENDIENTE_PAGO no cambia el consumo ni las pendientes de autorización,
+        # por eso no hace falta lo que harían las señales de save().
+        if conciliadas:
+            bulk_update_with_history(
+                conciliadas, OrdenDeServicio, CAMPOS_FACTURA, batch_size=1000, default_user=usuario,
+                default_change_reason="Conciliación de estado de cuenta",
+            )
+    reporte.aplicado = True
+    return reporte
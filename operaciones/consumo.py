@@ -0,0 +1,159 @@
+# operaciones/consumo.py
+
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from gestion.precios import precios_en_lote
+
+from .models import ConsumoCobertura, LineaOrdenServicio, OrdenDeServicio
+
+def _aniversario(fecha, anios):
+    try:
+        return fecha.replace(year=fecha.year + anios)
+    except ValueError:  # 29 de febrero en año no bisiesto
+        return fecha.replace(year=fecha.year + anios, day=28)
+
+def inicio_periodo_contrato(fecha_inicio_vigencia, fecha):
+    """Inicio del año contractual (aniversario de la vigencia) que contiene `fecha`."""
+    inicio = _aniversario(fecha_inicio_vigencia, fecha.year - fecha_inicio_vigencia.year)
+    if inicio > fecha:
+        inicio = _aniversario(fecha_inicio_vigencia, fecha.year - fecha_inicio_vigencia.year - 1)
+    return inicio
+
+def agrupar_consumo(filas, fecha_inicio_vigencia):
+    """
+    Convierte filas (dia, categoria_id, cantidad) en {(categoria_id, inicio_periodo, mes): cantidad}.
+    Compartida con la migración que puebla el libro por primera vez.
+    """
+    acumulado = {}
+    for dia, categoria_id, cantidad in filas:
+        clave = (categoria_id, inicio_periodo_contrato(fecha_inicio_vigencia, dia), dia.replace(day=1))
+        acumulado[clave] = acumulado.get(clave, 0) + cantidad
+    return acumulado
+
+@transaction.atomic
+def recalcular_consumo(asegurado):
+    """
+    Reconstruye las filas del libro de un asegurado a partir de sus OS que consumen cobertura.
+    Es una sola agregación sobre las líneas de las OS del asegurado (no de toda la cartera), que ya
+    traen la categoría y la cantidad, y se ejecuta en la transacción de quien modificó la OS.
+    """
+    filas = LineaOrdenServicio.objects.filter(
+        orden__siniestro__asegurado=asegurado,
+    ).exclude(
+        orden__estado_os__in=OrdenDeServicio.ESTADOS_SIN_CONSUMO
+    ).annotate(
+        dia=TruncDate('orden__fecha_emision'),
+    ).values_list('dia', 'categoria_id').annotate(cantidad=Sum('cantidad')).order_by()
+
+    acumulado = agrupar_consumo(filas, asegurado.contrato.fecha_inicio_vigencia)
+
+    ConsumoCobertura.objects.filter(asegurado=asegurado).exclude(cantidad=0).update(cantidad=0)
+    if acumulado:
+        ConsumoCobertura.objects.bulk_create(
+            [
+                ConsumoCobertura(asegurado=asegurado, categoria_id=categoria_id, inicio_periodo=inicio, mes=mes, cantidad=cantidad)
+                for (categoria_id, inicio, mes), cantidad in acumulado.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['asegurado', 'inicio_periodo', 'categoria', 'mes'],
+            update_fields=['cantidad'],
+        )
+
+@transaction.atomic
+def reservar_cobertura(orden, baremos, reglas, hoy=None, cantidades=None):
+    """
+    Verifica la cobertura de los servicios elegidos y los asigna a la OS en una sola transacción.
+    `cantidades` es {baremo_id: cantidad}; los que no figuren cuentan una vez.
+
+    Antes de contar el consumo se bloquean (SELECT ... FOR UPDATE, en orden de categoría) las filas
+    del libro del asegurado para el mes en curso de cada categoría solicitada. Así dos operadores que
+    emiten a la vez para el mismo asegurado y categoría se turnan, y el segundo ya ve el consumo del
+    primero; emisiones de otros asegurados o categorías no se esperan entre sí.
+
+    Los servicios se cuentan por cantidad (tres consultas con una disponible exceden el límite).
+    Si la cobertura no alcanza, la OS queda pendiente de autorización. Las líneas de la OS se
+    reescriben en bloque con el precio vigente en la fecha de emisión. Devuelve la lista de motivos.
+    """
+    hoy = hoy or timezone.localdate()
+    asegurado = orden.siniestro.asegurado
+    inicio = inicio_periodo_contrato(asegurado.contrato.fecha_inicio_vigencia, hoy)
+    mes = hoy.replace(day=1)
+
+    orden = OrdenDeServicio.objects.select_for_update().get(pk=orden.pk)
+    cantidades = {b.pk: max(1, int((cantidades or {}).get(b.pk, 1))) for b in baremos}
+    solicitados = Counter()
+    for b in baremos:
+        solicitados[b.sub_servicio.categoria_id] += cantidades[b.pk]
+    categorias = sorted(solicitados)
+    ConsumoCobertura.objects.bulk_create(
+        [ConsumoCobertura(asegurado=asegurado, categoria_id=c, inicio_periodo=inicio, mes=mes) for c in categorias],
+        ignore_conflicts=True,
+    )
+    list(ConsumoCobertura.objects.select_for_update().filter(
+        asegurado=asegurado, inicio_periodo=inicio, mes=mes, categoria_id__in=categorias
+    ).order_by('categoria_id').values_list('id', flat=True))
+
+    # Se cuenta sin esta OS: si ya tenía servicios (reenvío del formulario) no se descuentan dos veces.
+    consumos = consumo_por_categoria(asegurado, inicio, hoy)
+    previos = Counter(dict(
+        orden.lineas.values_list('categoria_id').annotate(cantidad=Sum('cantidad')).order_by()
+    )) if orden.consume_cobertura else Counter()
+
+    nombres = {b.sub_servicio.categoria_id: b.sub_servicio.categoria.nombre for b in baremos}
+    motivos = []
+    for categoria_id in categorias:
+        cobertura = reglas.cobertura(categoria_id)
+        if cobertura is None:
+            motivos.append(f"La categoría '{nombres[categoria_id]}' no está cubierta por el plan.")
+            continue
+        anual, mensual = consumos.get(categoria_id, (0, 0))
+        anual -= previos[categoria_id]
+        mensual -= previos[categoria_id] if timezone.localtime(orden.fecha_emision).date() >= mes else 0
+        if not cobertura.es_ilimitada and anual + solicitados[categoria_id] > cobertura.cantidad_maxima:
+            motivos.append(f"Límite anual agotado para {nombres[categoria_id]}.")
+        elif cobertura.limite_mensual > 0 and mensual + solicitados[categoria_id] > cobertura.limite_mensual:
+            motivos.append(f"Límite mensual agotado para {nombres[categoria_id]}.")
+
+    # Precio de lista vigente en la fecha de emisión; editar el baremo después no altera esta OS.
+    fecha = timezone.localtime(orden.fecha_emision).date()
+    precios = precios_en_lote((b.pk, fecha) for b in baremos)
+    lineas = []
+    for b in baremos:
+        precio = precios[(b.pk, fecha)] if precios[(b.pk, fecha)] is not None else b.precio
+        lineas.append(LineaOrdenServicio(
+            orden=orden, baremo=b, categoria_id=b.sub_servicio.categoria_id,
+            descripcion=b.sub_servicio.descripcion[:255], cantidad=cantidades[b.pk],
+            precio_unitario=precio, subtotal=precio * cantidades[b.pk],
+        ))
+    orden.lineas.all().delete()
+    LineaOrdenServicio.objects.bulk_create(lineas)
+    orden.monto_referencial_os = sum((l.subtotal for l in lineas), Decimal('0.00'))
+    consumia = orden.consume_cobertura
+    orden.estado_os = OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION if motivos else OrdenDeServicio.EstadoOS.NOTIFICADA
+    orden.save()
+    # bulk_create no dispara m2m_changed: si el cambio de estado no actualizó el libro (ver
+    # operaciones/signals.py), se actualiza aquí, en la misma transacción.
+    if consumia and orden.consume_cobertura:
+        recalcular_consumo(asegurado)
+    return motivos
+
+def consumo_por_categoria(asegurado, inicio_periodo, hoy):
+    """
+    Devuelve {categoria_id: (consumo_anual, consumo_mensual)} para el año contractual que
+    empieza en `inicio_periodo`, leyendo solo las filas del libro (una por categoría y mes).
+    """
+    inicio_mes = date(hoy.year, hoy.month, 1)
+    filas = ConsumoCobertura.objects.filter(
+        asegurado=asegurado, inicio_periodo=inicio_periodo
+    ).values('categoria_id').annotate(
+        anual=Sum('cantidad'),
+        mensual=Sum('cantidad', filter=Q(mes=inicio_mes)),
+    ).order_by()
+    return {f['categoria_id']: (f['anual'] or 0, f['mensual'] or 0) for f in filas}
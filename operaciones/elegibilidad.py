@@ -0,0 +1,72 @@
+# operaciones/elegibilidad.py
+
+from django.utils import timezone
+
+from gestion.models import Asegurado
+from gestion.utils import normalizar_cedula
+
+# Cédulas consultadas por query en la validación masiva.
+TAMANO_LOTE = 5000
+
+def evaluar_elegibilidad(asegurado, hoy=None):
+    """
+    Aplica las reglas de asegurabilidad a un asegurado (con su contrato ya cargado).
+    Devuelve (es_elegible, mensajes).
+    """
+    hoy = hoy or timezone.now().date()
+    mensajes = []
+    contrato_actual = asegurado.contrato
+    if not (contrato_actual.activo and contrato_actual.fecha_inicio_vigencia <= hoy and contrato_actual.fecha_fin_vigencia >= hoy):
+        mensajes.append(f"El Contrato N° {contrato_actual.numero_contrato} no está activo o se encuentra vencido.")
+    if asegurado.fecha_baja and asegurado.fecha_baja <= hoy:
+        mensajes.append(f"El asegurado fue dado de baja en fecha {asegurado.fecha_baja.strftime('%d/%m/%Y')}.")
+    if asegurado.estado_individual != Asegurado.EstadoAsegurado.ACTIVO:
+        mensajes.append(f"El estado del asegurado es: {asegurado.get_estado_individual_display()}.")
+    return not mensajes, mensajes
+
+def _validar_lote(cedulas, hoy):
+    encontrados = {}
+    asegurados = Asegurado.objects.filter(cedula__in=set(cedulas)).select_related(
+        'contrato', 'contrato__cliente', 'contrato__plan'
+    ).order_by('cedula', 'contrato__numero_contrato')
+    for asegurado in asegurados:
+        es_elegible, mensajes = evaluar_elegibilidad(asegurado, hoy)
+        encontrados.setdefault(asegurado.cedula, []).append({
+            'asegurado_id': asegurado.id,
+            'nombre_completo': asegurado.nombre_completo,
+            'contrato': asegurado.contrato.numero_contrato,
+            'cliente': asegurado.contrato.cliente.razon_social,
+            'plan': asegurado.contrato.plan.nombre_plan,
+            'estado_individual': asegurado.estado_individual,
+            'es_elegible': es_elegible,
+            'mensajes_validacion': mensajes,
+        })
+    for cedula in cedulas:
+        coincidencias = encontrados.get(cedula, [])
+        yield {
+            'cedula': cedula,
+            'encontrado': bool(coincidencias),
+            'es_elegible': any(c['es_elegible'] for c in coincidencias),
+            'coincidencias': coincidencias,
+        }
+
+def validar_cedulas(cedulas, hoy=None, tamano_lote=TAMANO_LOTE):
+    """
+    Valida una lista (o cualquier iterable, p. ej. las filas de un CSV) de cédulas.
+
+    Se consulta la base de datos una vez por cada lote de `tamano_lote` cédulas, así que
+    50.000 cédulas cuestan 10 queries. Genera un resultado por cédula, en el orden recibido;
+    una cédula puede tener varias coincidencias si el asegurado está en más de un contrato.
+    """
+    hoy = hoy or timezone.now().date()
+    lote = []
+    for valor in cedulas:
+        cedula = normalizar_cedula(valor)
+        if not cedula:
+            continue
+        lote.append(cedula)
+        if len(lote) >= tamano_lote:
+            yield from _validar_lote(lote, hoy)
+            lote = []
+    if lote:
+        yield from _validar_lote(lote, hoy)
@@ -0,0 +1,18 @@
+# operaciones/management/commands/actualizar_siniestralidad.py
+
+from django.core.management.base import BaseCommand
+
+from operaciones.siniestralidad import refrescar_siniestralidad
+
+class Command(BaseCommand):
+    help = (
+        "Pone al día el resumen de siniestralidad mensual con las OS modificadas desde la última "
+        "ejecución. Programar cada pocos minutos; la primera vez (o con --completo) lo calcula entero."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help="Recalcula todo el resumen, p. ej. tras cambiar el cliente o plan de un contrato.")
+
+    def handle(self, *args, **options):
+        cortes, filas = refrescar_siniestralidad(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Siniestralidad actualizada: {cortes} cortes mes/contrato recalculados, {filas} filas."))
@@ -0,0 +1,64 @@
+# operaciones/management/commands/conciliar_facturas.py
+
+import csv
+import os
+from datetime import date
+from decimal import Decimal
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.models import Proveedor
+from operaciones.conciliacion import TOLERANCIA_PORCENTAJE, TOLERANCIA_USD, conciliar_estado_de_cuenta
+
+class Command(BaseCommand):
+    help = "Concilia el estado de cuenta de un proveedor contra sus OS y pasa las conciliadas a Pendiente por Pagar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('proveedor', type=int, help="ID del proveedor.")
+        parser.add_argument('archivo', help="CSV o XLSX con las columnas de operaciones.conciliacion.COLUMNAS.")
+        parser.add_argument('--tolerancia-usd', type=Decimal, default=TOLERANCIA_USD)
+        parser.add_argument('--tolerancia-porcentaje', type=Decimal, default=TOLERANCIA_PORCENTAJE)
+        parser.add_argument('--fecha-recepcion', type=date.fromisoformat, help="Fecha de recepción de las facturas (AAAA-MM-DD). Por defecto, hoy.")
+        parser.add_argument('--simular', action='store_true', help="Calcula el reporte sin aplicar cambios.")
+        parser.add_argument('--reporte', help="Ruta del CSV donde guardar el resultado de cada fila.")
+
+    def handle(self, *args, **options):
+        try:
+            proveedor = Proveedor.objects.get(pk=options['proveedor'])
+        except Proveedor.DoesNotExist:
+            raise CommandError(f"No existe el proveedor {options['proveedor']}.")
+
+        ruta = options['archivo']
+        formato = os.path.splitext(ruta)[1].lower().lstrip('.')
+        if formato not in ('csv', 'xlsx'):
+            raise CommandError("El archivo debe ser CSV o XLSX.")
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        if formato == 'csv':
+            contenido = contenido.decode('utf-8-sig')
+        dataset = tablib.Dataset().load(contenido, format=formato)
+
+        reporte = conciliar_estado_de_cuenta(
+            proveedor, dataset, aplicar=not options['simular'], fecha_recepcion=options['fecha_recepcion'],
+            tolerancia_usd=options['tolerancia_usd'], tolerancia_porcentaje=options['tolerancia_porcentaje'],
+        )
+        if reporte.errores:
+            for error in reporte.errores:
+                self.stderr.write(error)
+            raise CommandError("El archivo tiene errores; no se aplicó ningún cambio.")
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['RESULTADO', 'FILA', 'NUMERO OS', 'NUMERO FACTURA', 'MONTO USD', 'REFERENCIAL USD', 'DETALLE'])
+                writer.writerows(reporte.filas())
+
+        resumen = (
+            f"{len(reporte.conciliadas)} conciliadas, {len(reporte.discrepancias)} con discrepancia, "
+            f"{len(reporte.rechazadas)} rechazadas."
+        )
+        if reporte.aplicado:
+            self.stdout.write(self.style.SUCCESS(f"Estado de cuenta de {proveedor.razon_social} conciliado: {resumen}"))
+        else:
+            self.stdout.write(f"Simulación para {proveedor.razon_social}: {resumen}")
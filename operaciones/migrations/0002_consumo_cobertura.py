@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+
+def poblar_consumo(apps, schema_editor):
+    from operaciones.consumo import agrupar_consumo
+
+    OrdenDeServicio = apps.get_model('operaciones', 'OrdenDeServicio')
+    ConsumoCobertura = apps.get_model('operaciones', 'ConsumoCobertura')
+    filas = OrdenDeServicio.objects.filter(
+        servicios_prestados__isnull=False,
+    ).exclude(
+        estado_os__in=['REC', 'SUS'],
+    ).annotate(
+        asegurado_id=F('siniestro__asegurado_id'),
+        inicio_vigencia=F('siniestro__asegurado__contrato__fecha_inicio_vigencia'),
+        dia=TruncDate('fecha_emision'),
+        categoria_id=F('servicios_prestados__sub_servicio__categoria_id'),
+    ).values_list('asegurado_id', 'inicio_vigencia', 'dia', 'categoria_id').annotate(
+        cantidad=Count('servicios_prestados')
+    ).order_by()
+
+    por_asegurado = {}
+    for asegurado_id, inicio_vigencia, dia, categoria_id, cantidad in filas:
+        por_asegurado.setdefault((asegurado_id, inicio_vigencia), []).append((dia, categoria_id, cantidad))
+
+    registros = []
+    for (asegurado_id, inicio_vigencia), filas_asegurado in por_asegurado.items():
+        for (categoria_id, inicio, mes), cantidad in agrupar_consumo(filas_asegurado, inicio_vigencia).items():
+            registros.append(ConsumoCobertura(
+                asegurado_id=asegurado_id, categoria_id=categoria_id,
+                inicio_periodo=inicio, mes=mes, cantidad=cantidad,
+            ))
+    ConsumoCobertura.objects.bulk_create(registros, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_asegurado_busqueda'),
+        ('operaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoCobertura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio_periodo', models.DateField(verbose_name='Inicio del Año Contractual')),
+                ('mes', models.DateField(help_text='Primer día del mes de emisión de las OS.', verbose_name='Mes')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Servicios Consumidos')),
+                ('asegurado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='gestion.asegurado')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.categoriaservicio')),
+            ],
+            options={
+                'verbose_name': 'Consumo de Cobertura',
+                'verbose_name_plural': 'Consumos de Cobertura',
+                'unique_together': {('asegurado', 'inicio_periodo', 'categoria', 'mes')},
+            },
+        ),
+        migrations.RunPython(poblar_consumo, migrations.RunPython.noop),
+    ]
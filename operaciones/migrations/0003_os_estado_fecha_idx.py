@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_asegurado_busqueda'),
+        ('operaciones', '0002_consumo_cobertura'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordendeservicio',
+            index=models.Index(fields=['estado_os', 'fecha_emision', 'siniestro'], name='os_estado_fecha_idx'),
+        ),
+    ]
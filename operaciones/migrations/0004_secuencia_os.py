@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operaciones', '0003_os_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaOS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=7, unique=True, verbose_name='Período')),
+                ('ultimo', models.PositiveBigIntegerField(default=0, verbose_name='Último Correlativo')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de OS',
+                'verbose_name_plural': 'Secuencias de OS',
+            },
+        ),
+    ]
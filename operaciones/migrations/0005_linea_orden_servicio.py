@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def poblar_lineas(apps, schema_editor):
+    """
+    Completa las filas que ya existían en la tabla del M2M: categoría y descripción del sub-servicio,
+    cantidad 1 y el precio que regía en la fecha de emisión de la OS (o el del baremo si no había).
+    Usa los modelos históricos y recorre la tabla por lotes de pk; dentro de cada lote las líneas
+    con los mismos valores se actualizan con un solo UPDATE.
+    """
+    from bisect import bisect_right
+
+    from django.utils import timezone
+
+    LineaOrdenServicio = apps.get_model('operaciones', 'LineaOrdenServicio')
+    PrecioBaremo = apps.get_model('gestion', 'PrecioBaremo')
+    ultimo = 0
+    while True:
+        lineas = list(
+            LineaOrdenServicio.objects.filter(pk__gt=ultimo).order_by('pk').values_list(
+                'pk', 'baremo_id', 'orden__fecha_emision', 'baremo__precio',
+                'baremo__sub_servicio__categoria_id', 'baremo__sub_servicio__descripcion',
+            )[:5000]
+        )
+        if not lineas:
+            break
+        ultimo = lineas[-1][0]
+
+        versiones = {}  # {baremo_id: ([vigente_desde], [(vigente_hasta, precio)])}
+        for baremo_id, desde, hasta, precio in PrecioBaremo.objects.filter(
+            baremo_id__in={linea[1] for linea in lineas},
+        ).order_by('baremo_id', 'vigente_desde').values_list('baremo_id', 'vigente_desde', 'vigente_hasta', 'precio'):
+            inicios, datos = versiones.setdefault(baremo_id, ([], []))
+            inicios.append(desde)
+            datos.append((hasta, precio))
+
+        grupos = {}  # {(categoria_id, descripcion, precio): [pk]}
+        for pk, baremo_id, emision, precio_baremo, categoria_id, descripcion in lineas:
+            fecha = timezone.localtime(emision).date()
+            inicios, datos = versiones.get(baremo_id, ((), ()))
+            i = bisect_right(inicios, fecha) - 1
+            precio = None
+            if i >= 0:
+                hasta, precio = datos[i]
+                if hasta is not None and fecha >= hasta:
+                    precio = None
+            clave = (categoria_id, descripcion[:255], precio if precio is not None else precio_baremo)
+            grupos.setdefault(clave, []).append(pk)
+        for (categoria_id, descripcion, precio), pks in grupos.items():
+            LineaOrdenServicio.objects.filter(pk__in=pks).update(
+                categoria_id=categoria_id, descripcion=descripcion, precio_unitario=precio, subtotal=precio,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_precio_baremo'),
+        ('operaciones', '0004_secuencia_os'),
+    ]
+
+    operations = [
+        # La tabla del M2M pasa a ser el modelo intermedio sin recrearse: en la base no cambia nada.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='LineaOrdenServicio',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('orden', models.ForeignKey(db_column='ordendeservicio_id', on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='operaciones.ordendeservicio')),
+                        ('baremo', models.ForeignKey(db_column='baremoproveedor_id', on_delete=django.db.models.deletion.PROTECT, related_name='lineas_os', to='gestion.baremoproveedor')),
+                    ],
+                    options={
+                        'verbose_name': 'Línea de OS',
+                        'verbose_name_plural': 'Líneas de OS',
+                        'db_table': 'operaciones_ordendeservicio_servicios_prestados',
+                        'unique_together': {('orden', 'baremo')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='ordendeservicio',
+                    name='servicios_prestados',
+                    field=models.ManyToManyField(through='operaciones.LineaOrdenServicio', to='gestion.baremoproveedor'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lineaordenservicio',
+            name='categoria',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='lineas_os', to='gestion.categoriaservicio'),
+        ),
+        migrations.AddField(
+            model_name='lineaordenservicio',
+            name='descripcion',
+            field=models.CharField(default='', max_length=255, verbose_name='Servicio'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='lineaordenservicio',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1, verbose_name='Cantidad'),
+        ),
+        migrations.AddField(
+            model_name='lineaordenservicio',
+            name='precio_unitario',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Precio Unitario (USD)'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='lineaordenservicio',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Subtotal (USD)'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(poblar_lineas, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lineaordenservicio',
+            name='categoria',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lineas_os', to='gestion.categoriaservicio'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_tasa_bcv'),
+        ('operaciones', '0005_linea_orden_servicio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True, verbose_name='Resumen')),
+                ('marca', models.DateTimeField(blank=True, null=True, verbose_name='Al día hasta')),
+            ],
+            options={
+                'verbose_name': 'Marca de Resumen',
+                'verbose_name_plural': 'Marcas de Resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='SiniestralidadMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de emisión de las OS.', verbose_name='Mes')),
+                ('aseguradora', models.CharField(blank=True, max_length=100, verbose_name='Aseguradora')),
+                ('ente', models.CharField(blank=True, max_length=100, verbose_name='Ente')),
+                ('ordenes', models.PositiveIntegerField(default=0, verbose_name='Órdenes de Servicio')),
+                ('servicios', models.PositiveIntegerField(default=0, verbose_name='Servicios')),
+                ('monto_usd', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto (USD)')),
+            ],
+            options={
+                'verbose_name': 'Siniestralidad Mensual',
+                'verbose_name_plural': 'Siniestralidad Mensual',
+            },
+        ),
+        migrations.AddField(
+            model_name='historicalordendeservicio',
+            name='actualizado_en',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Última Modificación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ordendeservicio',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Modificación'),
+        ),
+        migrations.AddIndex(
+            model_name='ordendeservicio',
+            index=models.Index(fields=['actualizado_en'], name='os_actualizado_idx'),
+        ),
+        migrations.AddField(
+            model_name='siniestralidadmensual',
+            name='categoria',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.categoriaservicio'),
+        ),
+        migrations.AddField(
+            model_name='siniestralidadmensual',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.cliente'),
+        ),
+        migrations.AddField(
+            model_name='siniestralidadmensual',
+            name='contrato',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.contrato'),
+        ),
+        migrations.AddField(
+            model_name='siniestralidadmensual',
+            name='plan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.plan'),
+        ),
+        migrations.AddIndex(
+            model_name='siniestralidadmensual',
+            index=models.Index(fields=['mes'], name='siniestralidad_mes_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='siniestralidadmensual',
+            unique_together={('mes', 'contrato', 'categoria')},
+        ),
+    ]
@@ -1,10 +1,11 @@
 # operaciones/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
-from simple_history.models import HistoricalRecords
+from core.auditoria import HistorialDiferido
+from gestion.tasas import convertir_monto, tasa_en
 
 class Siniestro(models.Model):
     asegurado = models.ForeignKey('gestion.Asegurado', on_delete=models.PROTECT, related_name="siniestros")
@@ -15,16 +16,23 @@ class Siniestro(models.Model):
         CERRADO = 'CERRADO', 'Cerrado con OS'
         IMPROCEDENTE = 'IMPROCEDENTE', 'Improcedente'
     estado = models.CharField("Estado del Siniestro", max_length=20, choices=EstadoSiniestro.choices, default=EstadoSiniestro.ABIERTO)
-    history = HistoricalRecords()
+    history = HistorialDiferido()
     class Meta:
         verbose_name_plural = "Siniestros"
     def __str__(self): return f"Siniestro de {self.asegurado.nombre_completo}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Asegurado leído: si cambia, la siniestralidad de su OS pasa a otro contrato (operaciones/signals.py)
+        instance._asegurado_id_original = instance.__dict__.get('asegurado_id')
+        return instance
+
 class OrdenDeServicio(models.Model):
     siniestro = models.OneToOneField(Siniestro, on_delete=models.CASCADE, primary_key=True)
     numero_os = models.CharField("Número de OS", max_length=50, unique=True, editable=False, blank=True)
     punto_atencion = models.ForeignKey('gestion.PuntoAtencion', on_delete=models.PROTECT)
-    servicios_prestados = models.ManyToManyField('gestion.BaremoProveedor')
+    servicios_prestados = models.ManyToManyField('gestion.BaremoProveedor', through='LineaOrdenServicio')
     monto_referencial_os = models.DecimalField("Monto Referencial OS (USD)", max_digits=12, decimal_places=2, default=0.00)
     fecha_emision = models.DateTimeField("Fecha de Emisión", default=timezone.now, editable=False)
     fecha_vencimiento_activacion = models.DateField("Vencimiento para Activación", editable=False, null=True, blank=True)
@@ -64,21 +72,197 @@ class OrdenDeServicio(models.Model):
     monto_factura_ves = models.DecimalField("Monto Factura (VES)", max_digits=12, decimal_places=2, null=True, blank=True)
     monto_factura_usd = models.DecimalField("Monto Factura (USD)", max_digits=12, decimal_places=2, null=True, blank=True)
     tasa_bcv = models.DecimalField("Tasa BCV", max_digits=10, decimal_places=4, null=True, blank=True)
+
+    # Marca de agua de los resúmenes de siniestralidad (operaciones/siniestralidad.py). Las
+    # escrituras masivas (bulk_update) deben asignarla a mano: auto_now solo actúa en save().
+    actualizado_en = models.DateTimeField("Última Modificación", auto_now=True)
     
-    history = HistoricalRecords()
+    history = HistorialDiferido()
 
-    def save(self, *args, **kwargs):
+    # Estados que NO cuentan como consumo de la cobertura del plan.
+    ESTADOS_SIN_CONSUMO = (EstadoOS.RECHAZADA, EstadoOS.SUSPENDIDA)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardamos el estado leído para detectar transiciones en las señales (operaciones/signals.py)
+        instance._estado_os_original = instance.__dict__.get('estado_os')
+        instance._fecha_emision_original = instance.__dict__.get('fecha_emision')
+        return instance
+
+    @property
+    def consume_cobertura(self):
+        return self.estado_os not in self.ESTADOS_SIN_CONSUMO
+
+    def asignar_numero(self, ahora=None, correlativo=None):
+        """
+        Asigna el número provisional (SOL-, único por siniestro) o, al notificarse, el definitivo
+        AAAA-MM-correlativo y su vencimiento. El correlativo sale de SecuenciaOS; en operaciones
+        masivas se reserva un bloque una sola vez y se pasa aquí cada número.
+        """
         if not self.numero_os:
-            self.numero_os = f"SOL-{self.siniestro.id}"
+            self.numero_os = f"SOL-{self.siniestro_id}"
 
         if self.estado_os == self.EstadoOS.NOTIFICADA and self.numero_os.startswith("SOL-"):
-            self.numero_os = f"{timezone.now().year}-{timezone.now().month}-{self.siniestro.id}"
+            ahora = timezone.localtime(ahora or timezone.now())
+            if correlativo is None:
+                correlativo = SecuenciaOS.reservar(SecuenciaOS.serie_de(ahora))
+            self.numero_os = f"{SecuenciaOS.serie_de(ahora)}-{correlativo}"
             self.fecha_vencimiento_activacion = self.fecha_emision.date() + timedelta(days=15)
-        
+
+    def completar_factura(self):
+        """
+        Si la factura tiene fecha y no se indicó la tasa, toma la del BCV de esa fecha (de la serie
+        en memoria, sin consultar la base) y con ella completa el monto en USD o en VES que falte.
+        """
+        if not self.fecha_emision_factura:
+            return
+        if self.tasa_bcv is None:
+            self.tasa_bcv = tasa_en(self.fecha_emision_factura)
+        if self.monto_factura_usd is None:
+            self.monto_factura_usd = convertir_monto(self.monto_factura_ves, self.tasa_bcv, a='USD')
+        elif self.monto_factura_ves is None:
+            self.monto_factura_ves = convertir_monto(self.monto_factura_usd, self.tasa_bcv, a='VES')
+
+    def save(self, *args, **kwargs):
+        self.asignar_numero()
+        self.completar_factura()
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Orden de Servicio"
         verbose_name_plural = "Órdenes de Servicio"
+        indexes = [
+            # Bandeja de autorizaciones: filtro por estado y paginación keyset por fecha.
+            models.Index(fields=['estado_os', 'fecha_emision', 'siniestro'], name='os_estado_fecha_idx'),
+            # OS modificadas desde la última actualización de los resúmenes.
+            models.Index(fields=['actualizado_en'], name='os_actualizado_idx'),
+        ]
+    def __str__(self):
+        return f"Solicitud de OS para {self.siniestro.asegurado.nombre_completo}"
+
+class LineaOrdenServicio(models.Model):
+    """
+    Renglón de una OS: el servicio con su cantidad, precio unitario, categoría y subtotal tal como
+    estaban al emitirla. Es la tabla intermedia de servicios_prestados (la misma tabla del M2M
+    original); se escribe en bloque desde consumo.reservar_cobertura y no se modifica después.
+    """
+    orden = models.ForeignKey(OrdenDeServicio, on_delete=models.CASCADE, related_name="lineas", db_column='ordendeservicio_id')
+    baremo = models.ForeignKey('gestion.BaremoProveedor', on_delete=models.PROTECT, related_name="lineas_os", db_column='baremoproveedor_id')
+    categoria = models.ForeignKey('gestion.CategoriaServicio', on_delete=models.PROTECT, related_name="lineas_os")
+    descripcion = models.CharField("Servicio", max_length=255)
+    cantidad = models.PositiveIntegerField("Cantidad", default=1)
+    precio_unitario = models.DecimalField("Precio Unitario (USD)", max_digits=12, decimal_places=2)
+    subtotal = models.DecimalField("Subtotal (USD)", max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'operaciones_ordendeservicio_servicios_prestados'
+        verbose_name = "Línea de OS"
+        verbose_name_plural = "Líneas de OS"
+        unique_together = ('orden', 'baremo')
+    def __str__(self): return f"{self.descripcion} x{self.cantidad}"
+
+class SecuenciaOS(models.Model):
+    """
+    Último correlativo usado por período (AAAA-MM) en los números definitivos de OS.
+    Reservar bloquea la fila del período hasta el fin de la transacción, así que dos
+    aprobaciones simultáneas nunca reciben el mismo número.
+    """
+    serie = models.CharField("Período", max_length=7, unique=True)
+    ultimo = models.PositiveBigIntegerField("Último Correlativo", default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de OS"
+        verbose_name_plural = "Secuencias de OS"
+
+    def __str__(self):
+        return f"{self.serie}: {self.ultimo}"
+
+    @staticmethod
+    def serie_de(fecha):
+        return f"{fecha:%Y-%m}"
+
+    @classmethod
+    def reservar(cls, serie, cantidad=1):
+        """Reserva `cantidad` correlativos consecutivos de la serie y devuelve el primero."""
+        with transaction.atomic(savepoint=False):
+            secuencia = cls.objects.select_for_update().filter(serie=serie).first()
+            if secuencia is None:
+                cls.objects.bulk_create([cls(serie=serie, ultimo=cls._ultimo_existente(serie))], ignore_conflicts=True)
+                secuencia = cls.objects.select_for_update().get(serie=serie)
+            primero = secuencia.ultimo + 1
+            secuencia.ultimo += cantidad
+            secuencia.save(update_fields=['ultimo'])
+        return primero
+
+    @staticmethod
+    def _ultimo_existente(serie):
+        # Punto de partida de un período nuevo: el mayor sufijo ya usado con ese prefijo, incluido
+        # el formato anterior sin cero a la izquierda en el mes ('2025-1-123').
+        anio, mes = serie.split('-')
+        prefijos = {f"{anio}-{mes}-", f"{anio}-{int(mes)}-"}
+        condicion = models.Q()
+        for prefijo in prefijos:
+            condicion |= models.Q(numero_os__startswith=prefijo)
+        ultimo = 0
+        for numero in OrdenDeServicio.objects.filter(condicion).values_list('numero_os', flat=True):
+            sufijo = numero.rsplit('-', 1)[1]
+            if sufijo.isdigit():
+                ultimo = max(ultimo, int(sufijo))
+        return ultimo
+
+class ConsumoCobertura(models.Model):
+    """
+    Libro de consumo materializado: servicios consumidos por asegurado, categoría,
+    año contractual y mes. Lo mantiene operaciones/consumo.py dentro de la misma
+    transacción en la que cambian las OS, para no re-agregar el historial en cada consulta.
+    """
+    asegurado = models.ForeignKey('gestion.Asegurado', on_delete=models.CASCADE, related_name="consumos")
+    categoria = models.ForeignKey('gestion.CategoriaServicio', on_delete=models.CASCADE, related_name="+")
+    inicio_periodo = models.DateField("Inicio del Año Contractual")
+    mes = models.DateField("Mes", help_text="Primer día del mes de emisión de las OS.")
+    cantidad = models.PositiveIntegerField("Servicios Consumidos", default=0)
+
+    class Meta:
+        verbose_name = "Consumo de Cobertura"
+        verbose_name_plural = "Consumos de Cobertura"
+        unique_together = ('asegurado', 'inicio_periodo', 'categoria', 'mes')
+    def __str__(self):
+        return f"{self.asegurado_id} - {self.categoria_id} - {self.mes:%m/%Y}: {self.cantidad}"
+
+class SiniestralidadMensual(models.Model):
+    """
+    Resumen de siniestralidad por mes de emisión, contrato y categoría, con las dimensiones del
+    contrato (cliente, plan, aseguradora, ente) copiadas para agrupar sin joins. Solo cuenta OS
+    que consumen cobertura; `ordenes` son las OS con servicios de la categoría, así que una OS con
+    varias categorías suma en cada una. Lo mantiene operaciones/siniestralidad.py; no se edita a mano.
+    """
+    mes = models.DateField("Mes", help_text="Primer día del mes de emisión de las OS.")
+    contrato = models.ForeignKey('gestion.Contrato', on_delete=models.CASCADE, related_name="+")
+    categoria = models.ForeignKey('gestion.CategoriaServicio', on_delete=models.CASCADE, related_name="+")
+    cliente = models.ForeignKey('gestion.Cliente', on_delete=models.CASCADE, related_name="+")
+    plan = models.ForeignKey('gestion.Plan', on_delete=models.CASCADE, related_name="+")
+    aseguradora = models.CharField("Aseguradora", max_length=100, blank=True)
+    ente = models.CharField("Ente", max_length=100, blank=True)
+    ordenes = models.PositiveIntegerField("Órdenes de Servicio", default=0)
+    servicios = models.PositiveIntegerField("Servicios", default=0)
+    monto_usd = models.DecimalField("Monto (USD)", max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Siniestralidad Mensual"
+        verbose_name_plural = "Siniestralidad Mensual"
+        unique_together = ('mes', 'contrato', 'categoria')
+        indexes = [models.Index(fields=['mes'], name='siniestralidad_mes_idx')]
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.contrato_id} - {self.categoria_id}: {self.ordenes}"
+
+class MarcaResumen(models.Model):
+    """Hasta qué momento (actualizado_en de las OS) está al día cada resumen incremental."""
+    nombre = models.CharField("Resumen", max_length=50, unique=True)
+    marca = models.DateTimeField("Al día hasta", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Marca de Resumen"
+        verbose_name_plural = "Marcas de Resumen"
     def __str__(self):
-        return f"Solicitud de OS para {self.siniestro.asegurado.nombre_completo}"
\ No newline at end of file
+        return f"{self.nombre}: {self.marca}"
@@ -0,0 +1,29 @@
+# operaciones/notificaciones.py
+
+from django.core.cache import cache
+
+from .models import OrdenDeServicio
+
+CLAVE_PENDIENTES = 'os_pendientes_autorizacion'
+# El contador se recalcula desde la base de datos como mucho una vez por hora, por si
+# alguna actualización masiva lo desfasó.
+DURACION_CONTADOR = 60 * 60
+
+def contar_pendientes():
+    """Número de OS pendientes de autorización, servido desde la caché."""
+    total = cache.get(CLAVE_PENDIENTES)
+    if total is None:
+        total = OrdenDeServicio.objects.filter(
+            estado_os=OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
+        ).count()
+        cache.add(CLAVE_PENDIENTES, total, timeout=DURACION_CONTADOR)
+    return total
+
+def ajustar_pendientes(delta):
+    """Suma `delta` al contador; si no está en caché, la próxima lectura lo recalcula."""
+    if not delta:
+        return
+    try:
+        cache.incr(CLAVE_PENDIENTES, delta)
+    except ValueError:
+        pass
@@ -0,0 +1,97 @@
+# operaciones/signals.py
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from gestion.models import Asegurado, Contrato
+from .consumo import recalcular_consumo
+from .models import OrdenDeServicio, Siniestro
+from .notificaciones import ajustar_pendientes
+from .siniestralidad import actualizar_dimensiones, mes_de, meses_de, refrescar_cortes
+
+PENDIENTE = OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
+
+def _refrescar_al_confirmar(cortes):
+    if cortes:
+        transaction.on_commit(lambda: refrescar_cortes(cortes))
+
+def _recalcular_consumo_de(asegurado_id):
+    asegurado = Asegurado.objects.select_related('contrato').filter(pk=asegurado_id).first()
+    if asegurado:
+        recalcular_consumo(asegurado)
+
+@receiver(post_save, sender=OrdenDeServicio)
+def os_guardada(sender, instance, created, **kwargs):
+    """
+    Reacciona a las transiciones de estado de la OS: actualiza el libro de consumo cuando
+    entra o sale de un estado que consume cobertura, y el contador de pendientes de autorización.
+    """
+    estado_original = None if created else getattr(instance, '_estado_os_original', None)
+    consumia = estado_original is not None and estado_original not in OrdenDeServicio.ESTADOS_SIN_CONSUMO
+    if not created and consumia != instance.consume_cobertura:
+        _recalcular_consumo_de(instance.siniestro.asegurado_id)
+
+    delta = (instance.estado_os == PENDIENTE) - (estado_original == PENDIENTE)
+    if delta:
+        transaction.on_commit(lambda: ajustar_pendientes(delta))
+    instance._estado_os_original = instance.estado_os
+
+    # El corte nuevo lo toma la actualización incremental (actualizado_en); el del mes anterior
+    # ya no tiene esta OS entre las modificadas y se recalcula aquí.
+    fecha_original = None if created else getattr(instance, '_fecha_emision_original', None)
+    if fecha_original is not None and mes_de(fecha_original) != mes_de(instance.fecha_emision):
+        contrato_id = instance.siniestro.asegurado.contrato_id
+        _refrescar_al_confirmar({(mes_de(fecha_original), contrato_id), (mes_de(instance.fecha_emision), contrato_id)})
+    instance._fecha_emision_original = instance.fecha_emision
+
+@receiver(post_save, sender=Siniestro)
+def siniestro_guardado(sender, instance, created, **kwargs):
+    """Si el siniestro pasa a otro asegurado, su OS cuenta en la siniestralidad de otro contrato."""
+    original = None if created else getattr(instance, '_asegurado_id_original', None)
+    if original is not None and original != instance.asegurado_id:
+        contratos = set(Asegurado.objects.filter(pk__in=(original, instance.asegurado_id)).values_list('contrato_id', flat=True))
+        meses = meses_de(OrdenDeServicio.objects.filter(siniestro=instance))
+        _refrescar_al_confirmar({(mes, contrato_id) for mes in meses for contrato_id in contratos})
+    instance._asegurado_id_original = instance.asegurado_id
+
+@receiver(post_save, sender=Asegurado)
+def asegurado_guardado(sender, instance, created, **kwargs):
+    """Un asegurado que cambia de contrato mueve sus OS de un corte de siniestralidad a otro."""
+    original = None if created else getattr(instance, '_contrato_id_original', None)
+    if original is not None and original != instance.contrato_id:
+        meses = meses_de(OrdenDeServicio.objects.filter(siniestro__asegurado=instance))
+        _refrescar_al_confirmar({(mes, contrato_id) for mes in meses for contrato_id in (original, instance.contrato_id)})
+    instance._contrato_id_original = instance.contrato_id
+
+@receiver(post_save, sender=Contrato)
+def contrato_guardado(sender, instance, created, raw=False, **kwargs):
+    # El resumen copia las dimensiones del contrato para agrupar sin joins.
+    if not created and not raw:
+        actualizar_dimensiones(instance)
+
+@receiver(m2m_changed, sender=OrdenDeServicio.servicios_prestados.through)
+def servicios_os_modificados(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if instance.consume_cobertura:
+        _recalcular_consumo_de(instance.siniestro.asegurado_id)
+
+@receiver(pre_delete, sender=OrdenDeServicio)
+def os_por_eliminar(sender, instance, **kwargs):
+    # En el borrado en cascada desde el Siniestro no podemos leerlo después de eliminado.
+    instance._asegurado_id_consumo, instance._contrato_id_resumen = Siniestro.objects.filter(
+        pk=instance.siniestro_id
+    ).values_list('asegurado_id', 'asegurado__contrato_id').first() or (None, None)
+
+@receiver(post_delete, sender=OrdenDeServicio)
+def os_eliminada(sender, instance, **kwargs):
+    asegurado_id = getattr(instance, '_asegurado_id_consumo', None)
+    if asegurado_id and instance.consume_cobertura:
+        _recalcular_consumo_de(asegurado_id)
+    if instance.estado_os == PENDIENTE:
+        transaction.on_commit(lambda: ajustar_pendientes(-1))
+    # Una OS borrada ya no aparece entre las modificadas desde la marca: su corte se recalcula aquí.
+    contrato_id = getattr(instance, '_contrato_id_resumen', None)
+    if contrato_id:
+        _refrescar_al_confirmar({(mes_de(instance.fecha_emision), contrato_id)})
@@ -0,0 +1,175 @@
+# operaciones/siniestralidad.py
+
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from gestion.models import Contrato
+from .models import LineaOrdenServicio, MarcaResumen, OrdenDeServicio, SiniestralidadMensual
+
+NOMBRE_MARCA = 'siniestralidad_mensual'
+
+# Las OS modificadas poco antes de la marca se vuelven a leer: una transacción larga pudo
+# confirmar después de la última actualización con un actualizado_en anterior a la marca.
+MARGEN_MARCA = timedelta(minutes=10)
+
+# Dimensiones por las que se puede agrupar: {nombre: (columnas del resumen, etiqueta)}.
+DIMENSIONES = {
+    'mes': (('mes',), 'mes'),
+    'cliente': (('cliente_id', 'cliente__razon_social'), 'cliente__razon_social'),
+    'plan': (('plan_id', 'plan__nombre_plan'), 'plan__nombre_plan'),
+    'aseguradora': (('aseguradora',), 'aseguradora'),
+    'ente': (('ente',), 'ente'),
+    'categoria': (('categoria_id', 'categoria__nombre'), 'categoria__nombre'),
+}
+# Filtros aceptados por consultar_siniestralidad: {parámetro: campo del resumen}.
+FILTROS = {'cliente': 'cliente_id', 'plan': 'plan_id', 'aseguradora': 'aseguradora', 'ente': 'ente', 'categoria': 'categoria_id'}
+
+def _limites_mes(mes):
+    inicio = timezone.make_aware(datetime(mes.year, mes.month, 1))
+    fin = timezone.make_aware(datetime(mes.year + mes.month // 12, mes.month % 12 + 1, 1))
+    return inicio, fin
+
+def meses_de(ordenes):
+    """Meses de emisión (primer día, en hora local) de las OS del queryset `ordenes`."""
+    return {
+        timezone.localtime(mes).date()
+        for mes in ordenes.annotate(mes=TruncMonth('fecha_emision')).values_list('mes', flat=True).distinct().order_by()
+    }
+
+def mes_de(fecha_emision):
+    return timezone.localtime(fecha_emision).date().replace(day=1)
+
+def refrescar_cortes(cortes):
+    """
+    Recalcula las filas del resumen de los cortes (mes, contrato_id) indicados, mes por mes:
+    una agregación sobre las líneas de OS de ese mes y esos contratos, y el reemplazo de sus filas.
+    Devuelve la cantidad de filas escritas.
+    """
+    por_mes = {}
+    for mes, contrato_id in cortes:
+        por_mes.setdefault(mes.replace(day=1), set()).add(contrato_id)
+    contratos = {
+        c['id']: c for c in Contrato.objects.filter(
+            id__in={contrato_id for ids in por_mes.values() for contrato_id in ids}
+        ).values('id', 'cliente_id', 'plan_id', 'aseguradora', 'ente')
+    }
+
+    escritas = 0
+    for mes, contrato_ids in sorted(por_mes.items()):
+        inicio, fin = _limites_mes(mes)
+        filas = LineaOrdenServicio.objects.filter(
+            orden__fecha_emision__gte=inicio, orden__fecha_emision__lt=fin,
+            orden__siniestro__asegurado__contrato_id__in=contrato_ids,
+        ).exclude(
+            orden__estado_os__in=OrdenDeServicio.ESTADOS_SIN_CONSUMO
+        ).values(
+            'categoria_id', contrato_id=F('orden__siniestro__asegurado__contrato_id'),
+        ).annotate(
+            ordenes=Count('orden_id', distinct=True), servicios=Sum('cantidad'), monto_usd=Sum('subtotal'),
+        ).order_by()
+        nuevas = [
+            SiniestralidadMensual(
+                mes=mes, contrato_id=f['contrato_id'], categoria_id=f['categoria_id'],
+                cliente_id=contratos[f['contrato_id']]['cliente_id'], plan_id=contratos[f['contrato_id']]['plan_id'],
+                aseguradora=contratos[f['contrato_id']]['aseguradora'], ente=contratos[f['contrato_id']]['ente'],
+                ordenes=f['ordenes'], servicios=f['servicios'], monto_usd=f['monto_usd'],
+            )
+            for f in filas
+        ]
+        with transaction.atomic():
+            SiniestralidadMensual.objects.filter(mes=mes, contrato_id__in=contrato_ids).delete()
+            SiniestralidadMensual.objects.bulk_create(nuevas, batch_size=2000)
+        escritas += len(nuevas)
+    return escritas
+
+def actualizar_dimensiones(contrato):
+    """
+    Copia al resumen el cliente, plan, aseguradora y ente actuales del contrato; las filas que
+    ya los tienen no se tocan. Devuelve la cantidad de filas actualizadas.
+    """
+    return SiniestralidadMensual.objects.filter(contrato_id=contrato.pk).exclude(
+        cliente_id=contrato.cliente_id, plan_id=contrato.plan_id, aseguradora=contrato.aseguradora, ente=contrato.ente,
+    ).update(cliente_id=contrato.cliente_id, plan_id=contrato.plan_id, aseguradora=contrato.aseguradora, ente=contrato.ente)
+
+def refrescar_siniestralidad(completo=False):
+    """
+    Pone al día el resumen con las OS modificadas desde la última marca (todas si `completo`
+    o si nunca se calculó): se recalculan solo los cortes (mes, contrato) de esas OS.
+    Devuelve (cortes, filas escritas). Lo ejecuta el comando actualizar_siniestralidad.
+    """
+    ahora = timezone.now()
+    MarcaResumen.objects.get_or_create(nombre=NOMBRE_MARCA)
+    with transaction.atomic():
+        # La fila de la marca serializa dos actualizaciones simultáneas.
+        marca = MarcaResumen.objects.select_for_update().get(nombre=NOMBRE_MARCA)
+        ordenes = OrdenDeServicio.objects.all()
+        if completo or marca.marca is None:
+            SiniestralidadMensual.objects.all().delete()
+        else:
+            ordenes = ordenes.filter(actualizado_en__gte=marca.marca - MARGEN_MARCA)
+        cortes = {
+            (timezone.localtime(mes).date(), contrato_id)
+            for mes, contrato_id in ordenes.annotate(
+                mes=TruncMonth('fecha_emision'),
+            ).values_list('mes', 'siniestro__asegurado__contrato_id').distinct().order_by()
+        }
+        escritas = refrescar_cortes(cortes)
+        marca.marca = ahora
+        marca.save(update_fields=['marca'])
+    return len(cortes), escritas
+
+def marca_siniestralidad():
+    """Momento hasta el que el resumen está al día (None si nunca se calculó)."""
+    return MarcaResumen.objects.filter(nombre=NOMBRE_MARCA).values_list('marca', flat=True).first()
+
+def consultar_siniestralidad(por='mes', desde=None, hasta=None, **filtros):
+    """
+    Totales de siniestralidad agrupados por una dimensión de DIMENSIONES (o varias, separadas
+    por coma), entre los meses `desde` y `hasta` (inclusive). Lee solo el resumen, así que el
+    costo depende de la cantidad de contratos y categorías, no del historial de OS.
+    Devuelve una lista de dicts con las columnas de la dimensión, ordenes, servicios y monto_usd.
+    """
+    dimensiones = [d.strip() for d in por.split(',') if d.strip()]
+    if not dimensiones or any(d not in DIMENSIONES for d in dimensiones):
+        raise ValueError(f"Dimensión no válida. Opciones: {', '.join(DIMENSIONES)}.")
+    filas = SiniestralidadMensual.objects.all()
+    if desde:
+        filas = filas.filter(mes__gte=desde.replace(day=1))
+    if hasta:
+        filas = filas.filter(mes__lte=hasta)
+    for parametro, valor in filtros.items():
+        if parametro not in FILTROS:
+            raise ValueError(f"Filtro no válido: {parametro}.")
+        if valor not in (None, ''):
+            filas = filas.filter(**{FILTROS[parametro]: valor})
+    columnas = [c for d in dimensiones for c in DIMENSIONES[d][0]]
+    orden = [DIMENSIONES[d][1] for d in dimensiones]
+    return list(
+        filas.values(*columnas).annotate(
+            ordenes=Sum('ordenes'), servicios=Sum('servicios'), monto_usd=Sum('monto_usd'),
+        ).order_by(*orden)
+    )
+
+def _mes(texto):
+    """'AAAA-MM' (o una fecha AAAA-MM-DD) -> primer día del mes; None si viene vacío."""
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    try:
+        anio, mes = texto.split('-')[:2]
+        return date(int(anio), int(mes), 1)
+    except ValueError:
+        raise ValueError(f"Mes no válido: '{texto}' (use AAAA-MM).")
+
+def parametros_consulta(datos):
+    """
+    Argumentos de consultar_siniestralidad a partir de un QueryDict (por, desde, hasta y los
+    filtros de FILTROS). Lanza ValueError si un mes no es válido.
+    """
+    parametros = {'por': ','.join(datos.getlist('por')) or 'mes', 'desde': _mes(datos.get('desde')), 'hasta': _mes(datos.get('hasta'))}
+    parametros.update({nombre: datos.get(nombre) for nombre in FILTROS if datos.get(nombre)})
+    return parametros
@@ -1,3 +1,254 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import tablib
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from gestion.models import (
+    Asegurado, BaremoProveedor, CategoriaServicio, CoberturaCategoriaPlan, Cliente, Contrato,
+    DetallePlan, Plan, Proveedor, PuntoAtencion, SubServicio,
+)
+from gestion.reglas_plan import obtener_reglas_plan
+from .conciliacion import conciliar_estado_de_cuenta
+from .consumo import consumo_por_categoria, inicio_periodo_contrato, reservar_cobertura
+from .models import ConsumoCobertura, LineaOrdenServicio, OrdenDeServicio, SecuenciaOS, SiniestralidadMensual, Siniestro
+from .siniestralidad import mes_de, refrescar_siniestralidad
+
+
+class DatosOperacionesMixin:
+    """Un plan con Consultas (2 al año, 1 al mes) y Laboratorio (5 al año), un asegurado y un proveedor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.localdate()
+        cls.plan = Plan.objects.create(nombre_plan='Plan Oro')
+        cls.consultas = CategoriaServicio.objects.create(nombre='Consultas')
+        cls.laboratorio = CategoriaServicio.objects.create(nombre='Laboratorio')
+        consulta = SubServicio.objects.create(categoria=cls.consultas, codigo='C01', descripcion='Consulta general')
+        hematologia = SubServicio.objects.create(categoria=cls.laboratorio, codigo='L01', descripcion='Hematología')
+        for sub_servicio in (consulta, hematologia):
+            DetallePlan.objects.create(plan=cls.plan, sub_servicio=sub_servicio)
+        CoberturaCategoriaPlan.objects.create(plan=cls.plan, categoria=cls.consultas, cantidad_maxima=2, limite_mensual=1)
+        CoberturaCategoriaPlan.objects.create(plan=cls.plan, categoria=cls.laboratorio, cantidad_maxima=5)
+
+        cliente = Cliente.objects.create(razon_social='ACME C.A.')
+        cls.contrato = Contrato.objects.create(
+            cliente=cliente, plan=cls.plan, numero_contrato='C-001', aseguradora='Seguros X',
+            fecha_emision=hoy, fecha_inicio_vigencia=hoy - timedelta(days=30), fecha_fin_vigencia=hoy + timedelta(days=335),
+        )
+        cls.asegurado = Asegurado.objects.create(
+            contrato=cls.contrato, tipo_documento='V', cedula='12345678', nombre_completo='José Pérez',
+            fecha_nacimiento=date(1980, 1, 1), sexo='M', parentesco='TITULAR',
+        )
+        proveedor = Proveedor.objects.create(rif='J-1', razon_social='Clínica Uno', direccion_fiscal='Caracas')
+        cls.sede = PuntoAtencion.objects.create(
+            proveedor=proveedor, nombre_sede='Sede Centro', estado='Distrito Capital', ciudad='Caracas',
+            municipio='Libertador', direccion='Centro', telefonos='0212',
+        )
+        cls.baremo_consulta = BaremoProveedor.objects.create(proveedor=proveedor, sub_servicio=consulta, precio=10)
+        cls.baremo_hematologia = BaremoProveedor.objects.create(proveedor=proveedor, sub_servicio=hematologia, precio=20)
+
+    def crear_orden(self, **campos):
+        siniestro = Siniestro.objects.create(asegurado=self.asegurado, descripcion_siniestro='Control')
+        return OrdenDeServicio.objects.create(siniestro=siniestro, punto_atencion=self.sede, **campos)
+
+
+class SecuenciaOSTests(DatosOperacionesMixin, TestCase):
+
+    def test_reserva_bloques_consecutivos_por_periodo(self):
+        self.assertEqual(SecuenciaOS.reservar('2026-10', cantidad=5), 1)
+        self.assertEqual(SecuenciaOS.reservar('2026-10'), 6)
+        self.assertEqual(SecuenciaOS.reservar('2026-10', cantidad=3), 7)
+        self.assertEqual(SecuenciaOS.objects.get(serie='2026-10').ultimo, 9)
+        # Cada período lleva su propio correlativo.
+        self.assertEqual(SecuenciaOS.reservar('2026-11'), 1)
+
+    def test_periodo_nuevo_parte_del_mayor_numero_existente(self):
+        self.crear_orden(numero_os='2026-10-41')
+        self.crear_orden(numero_os='2026-10-9')
+        self.crear_orden(numero_os='2026-1-123')  # formato anterior, sin cero en el mes
+        self.crear_orden(numero_os='2026-01-17')
+        self.assertEqual(SecuenciaOS.reservar('2026-10'), 42)
+        self.assertEqual(SecuenciaOS.reservar('2026-01', cantidad=2), 124)
+        self.assertEqual(SecuenciaOS.reservar('2026-01'), 126)
+
+    def test_notificar_asigna_numero_definitivo(self):
+        orden = self.crear_orden()
+        self.assertEqual(orden.numero_os, f"SOL-{orden.siniestro_id}")
+        serie = SecuenciaOS.serie_de(timezone.localtime())
+        SecuenciaOS.reservar(serie, cantidad=7)
+        orden.estado_os = OrdenDeServicio.EstadoOS.NOTIFICADA
+        orden.save()
+        self.assertEqual(orden.numero_os, f"{serie}-8")
+        self.assertIsNotNone(orden.fecha_vencimiento_activacion)
+
+
+class ReservarCoberturaTests(DatosOperacionesMixin, TestCase):
+
+    def setUp(self):
+        self.hoy = timezone.localdate()
+        self.inicio = inicio_periodo_contrato(self.contrato.fecha_inicio_vigencia, self.hoy)
+        self.reglas = obtener_reglas_plan(self.plan.pk)
+
+    def reservar(self, orden, cantidades):
+        baremos = list(BaremoProveedor.objects.select_related('sub_servicio__categoria').filter(pk__in=cantidades))
+        return reservar_cobertura(orden, baremos, self.reglas, hoy=self.hoy, cantidades=cantidades)
+
+    def consumo(self, categoria):
+        return consumo_por_categoria(self.asegurado, self.inicio, self.hoy).get(categoria.pk, (0, 0))
+
+    def test_cuenta_servicios_por_cantidad(self):
+        # Dos consultas con el límite mensual en 1: queda pendiente de autorización.
+        orden = self.crear_orden()
+        motivos = self.reservar(orden, {self.baremo_consulta.pk: 2})
+        orden.refresh_from_db()
+        self.assertEqual(motivos, ["Límite mensual agotado para Consultas."])
+        self.assertEqual(orden.estado_os, OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION)
+        # Mientras espera autorización la OS reserva sus dos consultas; al rechazarla se liberan.
+        self.assertEqual(self.consumo(self.consultas), (2, 2))
+        orden.estado_os = OrdenDeServicio.EstadoOS.RECHAZADA
+        orden.save()
+        self.assertEqual(self.consumo(self.consultas), (0, 0))
+
+        # Tres exámenes de laboratorio caben en el límite anual de 5 y se cuentan como tres.
+        orden = self.crear_orden()
+        self.assertEqual(self.reservar(orden, {self.baremo_hematologia.pk: 3}), [])
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado_os, OrdenDeServicio.EstadoOS.NOTIFICADA)
+        self.assertEqual(orden.monto_referencial_os, 60)
+        self.assertEqual(self.consumo(self.laboratorio), (3, 3))
+
+        # Otros tres ya exceden el anual: la OS queda pendiente (y reserva hasta que se resuelva).
+        orden = self.crear_orden()
+        self.assertEqual(self.reservar(orden, {self.baremo_hematologia.pk: 3}), ["Límite anual agotado para Laboratorio."])
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado_os, OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION)
+        self.assertEqual(self.consumo(self.laboratorio), (6, 6))
+
+    def test_reenvio_no_cuenta_dos_veces(self):
+        orden = self.crear_orden()
+        self.assertEqual(self.reservar(orden, {self.baremo_hematologia.pk: 3}), [])
+        # El operador reenvía el formulario de la misma OS: 3 + 3 superaría el límite, pero
+        # los servicios anteriores de la OS se reemplazan, no se suman.
+        self.assertEqual(self.reservar(orden, {self.baremo_hematologia.pk: 3}), [])
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado_os, OrdenDeServicio.EstadoOS.NOTIFICADA)
+        self.assertEqual(orden.lineas.count(), 1)
+        self.assertEqual(self.consumo(self.laboratorio), (3, 3))
+
+        # Reenviada con menos servicios, el libro baja en consecuencia.
+        self.reservar(orden, {self.baremo_hematologia.pk: 1})
+        self.assertEqual(self.consumo(self.laboratorio), (1, 1))
+        self.assertEqual(
+            sum(ConsumoCobertura.objects.filter(asegurado=self.asegurado, categoria=self.laboratorio).values_list('cantidad', flat=True)),
+            1,
+        )
+
+
+class SiniestralidadTests(DatosOperacionesMixin, TestCase):
+
+    def setUp(self):
+        self.orden = self.crear_orden(estado_os=OrdenDeServicio.EstadoOS.NOTIFICADA)
+        LineaOrdenServicio.objects.create(
+            orden=self.orden, baremo=self.baremo_consulta, categoria=self.consultas,
+            descripcion='Consulta general', cantidad=1, precio_unitario=10, subtotal=10,
+        )
+        refrescar_siniestralidad(completo=True)
+
+    def resumen(self):
+        return list(SiniestralidadMensual.objects.values_list('mes', 'contrato_id', 'cliente_id', 'ente', 'monto_usd'))
+
+    def test_editar_contrato_actualiza_dimensiones(self):
+        otro_cliente = Cliente.objects.create(razon_social='Beta C.A.')
+        self.contrato.cliente = otro_cliente
+        self.contrato.ente = 'Gobernación'
+        self.contrato.save()
+        mes = mes_de(self.orden.fecha_emision)
+        self.assertEqual(self.resumen(), [(mes, self.contrato.pk, otro_cliente.pk, 'Gobernación', 10)])
+
+    def test_asegurado_cambia_de_contrato(self):
+        otro = Contrato.objects.create(
+            cliente=self.contrato.cliente, plan=self.plan, numero_contrato='C-002', aseguradora='Seguros X',
+            fecha_emision=self.contrato.fecha_emision, fecha_inicio_vigencia=self.contrato.fecha_inicio_vigencia,
+            fecha_fin_vigencia=self.contrato.fecha_fin_vigencia,
+        )
+        asegurado = Asegurado.objects.get(pk=self.asegurado.pk)
+        asegurado.contrato = otro
+        with self.captureOnCommitCallbacks(execute=True):
+            asegurado.save()
+        mes = mes_de(self.orden.fecha_emision)
+        self.assertEqual(self.resumen(), [(mes, otro.pk, otro.cliente_id, '', 10)])
+
+    def test_os_cambia_de_mes(self):
+        orden = OrdenDeServicio.objects.get(pk=self.orden.pk)
+        orden.fecha_emision -= timedelta(days=40)
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.save()
+        self.assertEqual(
+            self.resumen(), [(mes_de(orden.fecha_emision), self.contrato.pk, self.contrato.cliente_id, '', 10)],
+        )
+
+
+class ConciliacionTests(DatosOperacionesMixin, TestCase):
+    ACTIVADA = OrdenDeServicio.EstadoOS.ACTIVADA
+
+    def setUp(self):
+        self.proveedor = self.sede.proveedor
+        # Datos de la factura que el operador ya cargó a mano y que el archivo no trae.
+        self.orden = self.crear_orden(
+            numero_os='2026-10-1', estado_os=self.ACTIVADA, monto_referencial_os=100,
+            numero_control_factura='NC-77', tasa_bcv=Decimal('36.5000'),
+        )
+
+    def conciliar(self, *filas, **kwargs):
+        dataset = tablib.Dataset(*filas, headers=['NUMERO OS', 'NUMERO FACTURA', 'FECHA FACTURA', 'MONTO USD'])
+        return conciliar_estado_de_cuenta(self.proveedor, dataset, fecha_recepcion=date(2026, 10, 20), **kwargs)
+
+    def test_concilia_dentro_de_la_tolerancia(self):
+        reporte = self.conciliar(('2026-10-1', 'F-1', '15/10/2026', '101.50'))
+        self.assertEqual([c[1] for c in reporte.conciliadas], ['2026-10-1'])
+        self.assertTrue(reporte.aplicado)
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.estado_os, OrdenDeServicio.EstadoOS.PENDIENTE_PAGO)
+        self.assertEqual(
+            (self.orden.numero_factura, self.orden.fecha_emision_factura, self.orden.monto_factura_usd, self.orden.fecha_recepcion_factura),
+            ('F-1', date(2026, 10, 15), Decimal('101.50'), date(2026, 10, 20)),
+        )
+        # Las columnas que el archivo no trae no borran lo que ya tenía la OS.
+        self.assertEqual((self.orden.numero_control_factura, self.orden.tasa_bcv), ('NC-77', Decimal('36.5000')))
+
+    def test_discrepancia_no_se_aplica(self):
+        reporte = self.conciliar(('2026-10-1', 'F-1', '15/10/2026', '110'))
+        self.assertEqual(reporte.conciliadas, [])
+        self.assertEqual([d[1] for d in reporte.discrepancias], ['2026-10-1'])
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.estado_os, self.orden.numero_factura), (self.ACTIVADA, None))
+
+    def test_factura_ya_registrada_en_otra_os(self):
+        self.crear_orden(numero_os='2026-10-2', estado_os=OrdenDeServicio.EstadoOS.PAGADA, numero_factura='F-1')
+        reporte = self.conciliar(('2026-10-1', 'F-1', '15/10/2026', '100'))
+        self.assertEqual(reporte.conciliadas, [])
+        self.assertEqual(reporte.rechazadas, [(2, '2026-10-1', "La factura F-1 ya está registrada en la OS 2026-10-2.")])
+
+    def test_estado_no_conciliable(self):
+        OrdenDeServicio.objects.filter(pk=self.orden.pk).update(estado_os=OrdenDeServicio.EstadoOS.NOTIFICADA)
+        reporte = self.conciliar(('2026-10-1', 'F-1', '15/10/2026', '100'))
+        self.assertEqual(reporte.conciliadas, [])
+        self.assertEqual(reporte.rechazadas, [(2, '2026-10-1', "La OS está en estado 'Notificada'.")])
+
+    def test_os_que_cambia_de_estado_durante_la_aplicacion(self):
+        def atomic(*args, **kwargs):
+            # Otro usuario suspende la OS entre el cálculo del reporte y su aplicación.
+            OrdenDeServicio.objects.filter(pk=self.orden.pk).update(estado_os=OrdenDeServicio.EstadoOS.SUSPENDIDA)
+            return transaction.atomic(*args, **kwargs)
 
-# Create your tests here.
+        with mock.patch('operaciones.conciliacion.transaction', SimpleNamespace(atomic=atomic)):
+            reporte = self.conciliar(('2026-10-1', 'F-1', '15/10/2026', '100'))
+        self.assertEqual(reporte.conciliadas, [])
+        self.assertEqual(reporte.rechazadas, [(2, '2026-10-1', "La OS cambió de estado durante la conciliación.")])
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.estado_os, self.orden.numero_factura), (OrdenDeServicio.EstadoOS.SUSPENDIDA, None))
@@ -5,12 +5,22 @@ from . import views
 
 urlpatterns = [
     path('validar/', views.validar_asegurabilidad, name='validar_asegurabilidad'),
+    path('validar/lote/', views.validar_lote, name='validar_lote'),
+    path('api/validar-lote/', views.validar_lote_api, name='validar_lote_api'),
+    path('api/precios-baremo/', views.precios_baremo_api, name='precios_baremo_api'),
+    path('api/siniestralidad/', views.siniestralidad_api, name='siniestralidad_api'),
     path('historial/<int:asegurado_id>/', views.consultar_servicios, name='consultar_servicios'),
     path('crear-os/<int:asegurado_id>/', views.crear_orden_de_servicio, name='crear_orden_de_servicio'),
-    path('ajax/puntos-atencion/', views.get_puntos_atencion, name='ajax_get_puntos_atencion'),
+    path('api/catalogo-sedes/', views.catalogo_sedes_api, name='catalogo_sedes_api'),
+    path('api/puntos-cercanos/', views.puntos_cercanos_api, name='puntos_cercanos_api'),
     path('seleccionar-servicios/<int:os_id>/', views.seleccionar_servicios, name='seleccionar_servicios'),
     path('cancelar-os/<int:os_id>/', views.cancelar_creacion_os, name='cancelar_creacion_os'),
     path('bandeja-autorizaciones/', views.bandeja_autorizaciones, name='bandeja_autorizaciones'),
+    path('bandeja-autorizaciones/lote/', views.resolver_autorizaciones_lote, name='resolver_autorizaciones_lote'),
+    path('eventos/autorizaciones/', views.eventos_autorizaciones, name='eventos_autorizaciones'),
     path('aprobar-os/<int:os_id>/', views.aprobar_os, name='aprobar_os'),
     path('rechazar-os/<int:os_id>/', views.rechazar_os, name='rechazar_os'), 
+    path('mapa-proveedores/', views.mapa_proveedores, name='mapa_proveedores_operaciones'),
+    path('api/proveedores-activos/', views.proveedores_activos_api, name='proveedores_activos_operaciones_api'),
+    path('api/mapa-estados/', views.mapa_estados_api, name='mapa_estados_operaciones_api'),
 ]   
\ No newline at end of file
@@ -1,13 +1,43 @@
 # operaciones/views.py
 
-from django.http import JsonResponse
+import asyncio
+import csv
+import io
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils import timezone
-from django.db.models import Count, Sum, Q
-from gestion.models import Asegurado, Contrato, DetallePlan, Proveedor, PuntoAtencion, BaremoProveedor, CoberturaCategoriaPlan
-from .models import OrdenDeServicio, Siniestro
+from django.db import OperationalError
+from django.db.models import Q, Sum
+from core.permisos import perfil_de
+from gestion.models import Asegurado, PuntoAtencion
+from gestion.cercania import LIMITE_CERCANOS, obtener_indice as obtener_indice_cercania, vector_de
+from gestion.busqueda import buscar_asegurados, condicion_busqueda, LIMITE_RESULTADOS, MIN_CARACTERES
+from gestion.catalogo import etag_catalogo_sedes, obtener_catalogo_sedes
+from gestion.disponibilidad import baremos_disponibles
+from gestion.facetas import MAX_CONTEO_FACETAS, conteo_facetas, obtener_facetas
+from gestion.precios import precios_en_lote
+from gestion.geografia import etag_geografia, obtener_geografia
+from gestion.mapa import etag_mapa_estados, respuesta_mapa_estados
+from gestion.reglas_plan import obtener_reglas_plan
+from gestion.utils import Echo, normalize_text
+from .models import LineaOrdenServicio, OrdenDeServicio, Siniestro
+from .elegibilidad import evaluar_elegibilidad, validar_cedulas
+from .consumo import consumo_por_categoria, inicio_periodo_contrato, reservar_cobertura
+from .notificaciones import contar_pendientes
+from .autorizaciones import pagina_pendientes, resolver_autorizaciones
+from .siniestralidad import consultar_siniestralidad, marca_siniestralidad, parametros_consulta
 from django.contrib import messages
 from django.http import HttpResponseForbidden
 
@@ -22,51 +52,46 @@ def validar_asegurabilidad(request):
     ente_filtro = request.GET.get('ente', '')
 
     if query:
-        # Búsqueda parcial por nombre o cédula
-        search_condition = Q(cedula__icontains=query) | Q(nombre_completo__icontains=query)
-        asegurados_encontrados = Asegurado.objects.filter(search_condition).select_related(
+        asegurados_base = Asegurado.objects.select_related(
             'contrato', 'contrato__cliente', 'contrato__plan'
         )
 
         # Aplicar filtros si se especifican
         if cliente_filtro:
-            asegurados_encontrados = asegurados_encontrados.filter(contrato__cliente__razon_social=cliente_filtro)
+            asegurados_base = asegurados_base.filter(contrato__cliente__razon_social=cliente_filtro)
         if aseguradora_filtro:
-            asegurados_encontrados = asegurados_encontrados.filter(contrato__aseguradora=aseguradora_filtro)
+            asegurados_base = asegurados_base.filter(contrato__aseguradora=aseguradora_filtro)
         if ente_filtro:
-            asegurados_encontrados = asegurados_encontrados.filter(contrato__ente=ente_filtro)
+            asegurados_base = asegurados_base.filter(contrato__ente=ente_filtro)
+
+        # Búsqueda indexada por nombre o cédula (sin acentos, con ranking y límite de resultados)
+        asegurados_encontrados = list(buscar_asegurados(query, asegurados_base))
 
-        if asegurados_encontrados.exists():
+        if asegurados_encontrados:
+            contexto['limite_alcanzado'] = len(asegurados_encontrados) >= LIMITE_RESULTADOS
             resultados_validacion = []
             hoy = timezone.now().date()
             for asegurado in asegurados_encontrados:
-                es_elegible = True
-                mensajes = []
-                contrato_actual = asegurado.contrato
-                if not (contrato_actual.activo and contrato_actual.fecha_inicio_vigencia <= hoy and contrato_actual.fecha_fin_vigencia >= hoy):
-                    es_elegible = False
-                    mensajes.append(f"El Contrato N° {contrato_actual.numero_contrato} no está activo o se encuentra vencido.")
-                if asegurado.fecha_baja and asegurado.fecha_baja <= hoy:
-                    es_elegible = False
-                    mensajes.append(f"El asegurado fue dado de baja en fecha {asegurado.fecha_baja.strftime('%d/%m/%Y')}.")
-                if asegurado.estado_individual != Asegurado.EstadoAsegurado.ACTIVO:
-                    es_elegible = False
-                    mensajes.append(f"El estado del asegurado es: {asegurado.get_estado_individual_display()}.")
-                
+                es_elegible, mensajes = evaluar_elegibilidad(asegurado, hoy)
                 resultados_validacion.append({
                     'asegurado': asegurado,
                     'es_elegible': es_elegible,
                     'mensajes_validacion': mensajes,
                 })
             contexto['resultados'] = resultados_validacion
+        elif condicion_busqueda(query) is None:
+            contexto['error'] = f"Escriba al menos {MIN_CARACTERES} letras del nombre, o la cédula."
         else:
             contexto['error'] = f"No se encontró ningún asegurado que coincida con '{query}'."
 
-        # Solo pasamos los filtros si hay una búsqueda
+        # Solo pasamos los filtros si hay una búsqueda: listas en caché + conteos de la búsqueda actual.
+        # Los conteos se limitan a MAX_CONTEO_FACETAS coincidencias; una búsqueda más amplia va sin ellos.
         contexto['show_filters'] = True
-        contexto['clientes'] = Contrato.objects.order_by('cliente__razon_social').values_list('cliente__razon_social', flat=True).distinct()
-        contexto['aseguradoras'] = Contrato.objects.order_by('aseguradora').values_list('aseguradora', flat=True).distinct()
-        contexto['entes'] = Contrato.objects.order_by('ente').values_list('ente', flat=True).distinct()
+        condicion = condicion_busqueda(query)
+        conteos = conteo_facetas(Asegurado.objects.filter(condicion), limite=MAX_CONTEO_FACETAS) if condicion is not None else None
+        for faceta, valores in obtener_facetas().items():
+            conteo = conteos[faceta] if conteos is not None else None
+            contexto[faceta] = [(valor, conteo.get(valor, 0) if conteo is not None else None) for valor in valores]
 
     contexto.update({
         'query': query,
@@ -77,6 +102,107 @@ def validar_asegurabilidad(request):
 
     return render(request, 'operaciones/validacion.html', contexto)
 
+# --- VALIDACIÓN MASIVA (CALL CENTER / RRHH DE CLIENTES) ---
+MAX_CEDULAS_API = 50000
+
+@login_required
+@require_POST
+def validar_lote_api(request):
+    """
+    Valida en bloque las cédulas recibidas como JSON: {"cedulas": ["123", "V-456", ...]}.
+    """
+    if not operaciones_access_check(request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    try:
+        cedulas = json.loads(request.body)['cedulas']
+        if not isinstance(cedulas, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Se esperaba un JSON con la lista "cedulas".'}, status=400)
+    if len(cedulas) > MAX_CEDULAS_API:
+        return JsonResponse({'error': f'Máximo {MAX_CEDULAS_API} cédulas por solicitud.'}, status=400)
+
+    resultados = list(validar_cedulas(cedulas))
+    return JsonResponse({
+        'total': len(resultados),
+        'elegibles': sum(1 for r in resultados if r['es_elegible']),
+        'resultados': resultados,
+    })
+
+MAX_LINEAS_PRECIOS = 50000
+
+@login_required
+@require_POST
+def precios_baremo_api(request):
+    """
+    Precios de lista en bloque para miles de líneas de OS, con una sola query:
+    {"lineas": [[baremo_id, "AAAA-MM-DD"], ...]} -> {"precios": [[baremo_id, fecha, precio o null], ...]}.
+    """
+    if not operaciones_access_check(request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    try:
+        lineas = [(int(baremo_id), date.fromisoformat(fecha)) for baremo_id, fecha in json.loads(request.body)['lineas']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Se esperaba un JSON con la lista "lineas" de pares [baremo, fecha].'}, status=400)
+    if len(lineas) > MAX_LINEAS_PRECIOS:
+        return JsonResponse({'error': f'Máximo {MAX_LINEAS_PRECIOS} líneas por solicitud.'}, status=400)
+
+    precios = precios_en_lote(lineas)
+    return JsonResponse({'precios': [
+        [baremo_id, fecha.isoformat(), precios[(baremo_id, fecha)]] for baremo_id, fecha in lineas
+    ]})
+
+def _leer_cedulas_csv(archivo):
+    """
+    Lee las cédulas de un CSV subido (separado por coma o punto y coma) sin cargarlo entero.
+    Usa la columna cuyo encabezado contenga 'cedula'; si no hay encabezado, la primera columna.
+    """
+    texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', errors='replace', newline='')
+    primera_linea = texto.readline()
+    delimitador = ';' if primera_linea.count(';') > primera_linea.count(',') else ','
+    encabezado = next(csv.reader([primera_linea], delimiter=delimitador), [])
+    columna = next((i for i, nombre in enumerate(encabezado) if 'cedula' in normalize_text(nombre)), None)
+    if columna is None:
+        columna = 0
+        if encabezado:
+            yield encabezado[0]
+    for fila in csv.reader(texto, delimiter=delimitador):
+        if len(fila) > columna:
+            yield fila[columna]
+
+@login_required
+def validar_lote(request):
+    """
+    Formulario de carga de un CSV de cédulas; devuelve (en streaming) un CSV con el resultado
+    de la validación de cada una.
+    """
+    if not operaciones_access_check(request.user):
+        return HttpResponseForbidden("No tiene permisos para acceder a esta página.")
+
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            messages.error(request, "Debe seleccionar un archivo CSV con las cédulas.")
+            return redirect('validar_lote')
+
+        def filas():
+            yield ['CEDULA', 'ENCONTRADO', 'ELEGIBLE', 'NOMBRE', 'CONTRATO', 'CLIENTE', 'PLAN', 'OBSERVACIONES']
+            for resultado in validar_cedulas(_leer_cedulas_csv(archivo)):
+                if not resultado['encontrado']:
+                    yield [resultado['cedula'], 'NO', 'NO', '', '', '', '', 'No se encontró ningún asegurado con esta cédula.']
+                for c in resultado['coincidencias']:
+                    yield [
+                        resultado['cedula'], 'SI', 'SI' if c['es_elegible'] else 'NO', c['nombre_completo'],
+                        c['contrato'], c['cliente'], c['plan'], ' '.join(c['mensajes_validacion']),
+                    ]
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse((writer.writerow(fila) for fila in filas()), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="validacion_asegurabilidad.csv"'
+        return response
+
+    return render(request, 'operaciones/validacion_lote.html')
+
 @login_required
 def consultar_servicios(request, asegurado_id):
     if not operaciones_access_check(request.user):
@@ -87,40 +213,35 @@ def consultar_servicios(request, asegurado_id):
     ordenes_de_servicio = OrdenDeServicio.objects.filter(
         siniestro__asegurado=asegurado,
         fecha_emision__date__range=(contrato_actual.fecha_inicio_vigencia, contrato_actual.fecha_fin_vigencia)
-    ).order_by('-fecha_emision')
+    ).prefetch_related('lineas').order_by('-fecha_emision')
 
     # Filtramos las OS que cuentan como "consumidas"
     ordenes_consumidas = ordenes_de_servicio.exclude(
-        estado_os__in=[OrdenDeServicio.EstadoOS.RECHAZADA, OrdenDeServicio.EstadoOS.SUSPENDIDA]
+        estado_os__in=OrdenDeServicio.ESTADOS_SIN_CONSUMO
     )
 
-    # --- Cálculo de Coberturas y Consumo por Categoría ---
+    # --- Cálculo de Coberturas y Consumo por Categoría (desde el libro de consumo) ---
     coberturas = []
-    coberturas_plan = CoberturaCategoriaPlan.objects.filter(plan=contrato_actual.plan).select_related('categoria')
-    hoy = timezone.now().date()
-    inicio_mes = hoy.replace(day=1)
-
-    for cobertura in coberturas_plan:
-        # Consumo anual por categoría (usando las OS consumidas)
-        consumo_anual = ordenes_consumidas.filter(
-            servicios_prestados__sub_servicio__categoria=cobertura.categoria
-        ).count()
-        
+    reglas = obtener_reglas_plan(contrato_actual.plan_id)
+    hoy = timezone.localdate()
+    # El libro se indexa por el año contractual vigente, no por el inicio del contrato.
+    consumos = consumo_por_categoria(asegurado, inicio_periodo_contrato(contrato_actual.fecha_inicio_vigencia, hoy), hoy)
+
+    for cobertura in reglas.coberturas.values():
+        consumo_anual, consumo_mes = consumos.get(cobertura.categoria_id, (0, 0))
+
         disponible_anual = max(0, cobertura.cantidad_maxima - consumo_anual)
         disponible_final = disponible_anual
 
-        # Consumo mensual si aplica (usando las OS consumidas)
+        # Consumo mensual si aplica
         consumo_mensual = None
         if cobertura.limite_mensual > 0:
-            consumo_mensual = ordenes_consumidas.filter(
-                servicios_prestados__sub_servicio__categoria=cobertura.categoria,
-                fecha_emision__date__gte=inicio_mes
-            ).count()
+            consumo_mensual = consumo_mes
             disponible_mensual = max(0, cobertura.limite_mensual - consumo_mensual)
             disponible_final = min(disponible_anual, disponible_mensual)
 
         coberturas.append({
-            'descripcion': cobertura.categoria.nombre,
+            'descripcion': cobertura.categoria_nombre,
             'cantidad_maxima': cobertura.cantidad_maxima,
             'limite_mensual': cobertura.limite_mensual,
             'consumido_anual': consumo_anual,
@@ -129,10 +250,10 @@ def consultar_servicios(request, asegurado_id):
         })
     
     # Resumen de servicios solicitados (usando las OS consumidas)
-    resumen_servicios = ordenes_consumidas.values(
-        'servicios_prestados__sub_servicio__descripcion'
-    ).annotate(
-        cantidad=Count('servicios_prestados__sub_servicio')
+    resumen_servicios = LineaOrdenServicio.objects.filter(
+        orden__in=ordenes_consumidas
+    ).values('descripcion').annotate(
+        cantidad=Sum('cantidad')
     ).order_by('-cantidad')
 
     contexto = {
@@ -172,10 +293,9 @@ def crear_orden_de_servicio(request, asegurado_id):
         
         return redirect('seleccionar_servicios', os_id=orden_servicio.siniestro_id)
 
-    proveedores = Proveedor.objects.filter(activo=True).order_by('razon_social')
     contexto = {
         'asegurado': asegurado,
-        'proveedores': proveedores,
+        'catalogo_url': f"{reverse('catalogo_sedes_api')}?{urlencode({'v': obtener_catalogo_sedes()[0]})}",
     }
     return render(request, 'operaciones/crear_os.html', contexto)
     pass
@@ -189,56 +309,30 @@ def seleccionar_servicios(request, os_id):
     contrato_actual = asegurado.contrato
     proveedor = orden_servicio.punto_atencion.proveedor
     
-    # Obtenemos los subservicios que el proveedor ofrece Y que están en el plan del asegurado
-    subservicios_incluidos_ids = DetallePlan.objects.filter(plan=contrato_actual.plan).values_list('sub_servicio_id', flat=True)
-    servicios_disponibles = BaremoProveedor.objects.filter(
-        proveedor=proveedor,
-        activo=True,
-        sub_servicio_id__in=subservicios_incluidos_ids
-    ).select_related('sub_servicio__categoria')
+    # Reglas compiladas del plan (en memoria; se invalidan al modificar el plan)
+    reglas = obtener_reglas_plan(contrato_actual.plan_id)
+
+    # Baremos del proveedor cubiertos por el plan, desde el índice precalculado de disponibilidad
+    servicios_disponibles = baremos_disponibles(contrato_actual.plan_id, proveedor.id)
 
     if request.method == 'POST':
         servicios_seleccionados_ids = request.POST.getlist('servicios')
-        servicios_seleccionados = BaremoProveedor.objects.filter(id__in=servicios_seleccionados_ids)
-        
-        necesita_autorizacion = False
-        motivo_autorizacion = []
-
-        # --- LÓGICA DE VALIDACIÓN DE COBERTURAS ---
-        ordenes_previas = OrdenDeServicio.objects.filter(
-            siniestro__asegurado=asegurado,
-            fecha_emision__date__range=(contrato_actual.fecha_inicio_vigencia, timezone.now().date())
-        )
-
-        for servicio_baremo in servicios_seleccionados:
-            categoria = servicio_baremo.sub_servicio.categoria
+        servicios_seleccionados = servicios_disponibles.filter(id__in=servicios_seleccionados_ids)
+        cantidades = {}
+        for servicio in servicios_seleccionados:
             try:
-                cobertura_categoria = CoberturaCategoriaPlan.objects.get(plan=contrato_actual.plan, categoria=categoria)
-                
-                # Calcular consumo
-                consumo_anual = ordenes_previas.filter(servicios_prestados__sub_servicio__categoria=categoria).count()
-                
-                if not cobertura_categoria.es_ilimitada and consumo_anual >= cobertura_categoria.cantidad_maxima:
-                    necesita_autorizacion = True
-                    motivo_autorizacion.append(f"Límite anual agotado para {categoria.nombre}.")
-            
-            except CoberturaCategoriaPlan.DoesNotExist:
-                necesita_autorizacion = True
-                motivo_autorizacion.append(f"La categoría '{categoria.nombre}' no está cubierta por el plan.")
-
-        # Guardamos los servicios seleccionados
-        orden_servicio.servicios_prestados.set(servicios_seleccionados)
-        total = servicios_seleccionados.aggregate(Sum('precio'))['precio__sum'] or 0.00
-        orden_servicio.monto_referencial_os = total
-        
-        if necesita_autorizacion:
-            orden_servicio.estado_os = OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
-            # Podríamos guardar el motivo en un campo de observaciones si fuera necesario
-        else:
-            orden_servicio.estado_os = OrdenDeServicio.EstadoOS.NOTIFICADA
-        
-        orden_servicio.save()
+                cantidades[servicio.id] = max(1, int(request.POST.get(f'cantidad_{servicio.id}', 1)))
+            except ValueError:
+                cantidades[servicio.id] = 1
         
+        # Verificación y reserva de cobertura en una transacción corta, bloqueando solo las filas
+        # del libro de este asegurado y de las categorías elegidas.
+        try:
+            reservar_cobertura(orden_servicio, list(servicios_seleccionados), reglas, cantidades=cantidades)
+        except OperationalError:
+            messages.error(request, "Otra orden para este asegurado se está procesando en este momento. Intente de nuevo.")
+            return redirect('seleccionar_servicios', os_id=orden_servicio.pk)
+
         # Redirigimos a una página de confirmación
         return redirect('validar_asegurabilidad')
 
@@ -249,14 +343,57 @@ def seleccionar_servicios(request, os_id):
     return render(request, 'operaciones/seleccionar_servicios.html', contexto)
     pass
 
+# Tiempo que el navegador reutiliza el catálogo de sedes sin preguntar (la URL cambia con cada versión)
+CACHE_CATALOGO_SEGUNDOS = 24 * 60 * 60
+
 @login_required
-def get_puntos_atencion(request):
+def catalogo_sedes_api(request):
+    """
+    Catálogo de proveedores activos y sus sedes para el formulario de la OS, en una sola respuesta.
+    Pedido con ?v=<versión vigente> el navegador lo reutiliza sin volver a consultar; la versión
+    cambia (y con ella la URL) al modificar un proveedor o un punto de atención.
+    """
+    # Los permisos se revisan antes que el ETag: sin ellos no se responde ni un 304.
     if not operaciones_access_check(request.user):
-        return HttpResponseForbidden("No tiene permisos para acceder a esta página.")
-    proveedor_id = request.GET.get('proveedor_id')
-    puntos = PuntoAtencion.objects.filter(proveedor_id=proveedor_id, activo=True).order_by('nombre_sede')
-    return JsonResponse(list(puntos.values('id', 'nombre_sede')), safe=False)
-    pass
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    return _catalogo_json(request)
+
+@condition(etag_func=etag_catalogo_sedes)
+def _catalogo_json(request):
+    version, catalogo = obtener_catalogo_sedes()
+    respuesta = JsonResponse(catalogo)
+    if request.GET.get('v') == version:
+        patch_cache_control(respuesta, private=True, max_age=CACHE_CATALOGO_SEGUNDOS, immutable=True)
+    else:
+        patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+@login_required
+def puntos_cercanos_api(request):
+    """
+    Los puntos de atención activos más cercanos que ofrecen los sub-servicios pedidos.
+    Parámetros: lat y lng, o asegurado_id (se ubica por su ciudad/estado de residencia);
+    sub_servicio (repetible) y k (máximo LIMITE_CERCANOS).
+    """
+    if not operaciones_access_check(request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    try:
+        k = min(int(request.GET.get('k', 5)), LIMITE_CERCANOS)
+        sub_servicios = [int(s) for s in request.GET.getlist('sub_servicio')]
+        lat, lng = request.GET.get('lat'), request.GET.get('lng')
+        lat, lng = (float(lat), float(lng)) if lat or lng else (None, None)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+
+    indice = obtener_indice_cercania()
+    if lat is not None:
+        origen, fuente = vector_de(lat, lng), 'coordenadas'
+    else:
+        asegurado = get_object_or_404(Asegurado, pk=request.GET.get('asegurado_id') or 0)
+        origen, fuente = indice.ubicar(asegurado.estado_residencia, asegurado.ciudad_residencia)
+        if origen is None:
+            return JsonResponse({'origen': None, 'puntos': [], 'error': 'No hay puntos con coordenadas en la ciudad ni el estado del asegurado.'})
+    return JsonResponse({'origen': fuente, 'puntos': indice.cercanos(origen, k=max(k, 1), sub_servicios=sub_servicios)})
 
 @login_required
 def cancelar_creacion_os(request, os_id):
@@ -277,12 +414,7 @@ def cancelar_creacion_os(request, os_id):
 
 def supervisor_check(user):
     """Función auxiliar para verificar si un usuario es supervisor o superusuario."""
-    if user.is_superuser:
-        return True
-    if hasattr(user, 'rol') and user.rol:
-        # Asumimos que los roles de supervisión pueden contener la palabra "Supervisor"
-        return 'supervisor' in user.rol.nombre_rol.lower()
-    return False
+    return perfil_de(user).puede_autorizar
 
 @login_required
 def bandeja_autorizaciones(request):
@@ -292,15 +424,105 @@ def bandeja_autorizaciones(request):
     if not supervisor_check(request.user):
         return HttpResponseForbidden("No tiene permisos para acceder a esta página.")
 
-    ordenes_pendientes = OrdenDeServicio.objects.filter(
-        estado_os=OrdenDeServicio.EstadoOS.PENDIENTE_AUTORIZACION
-    ).order_by('fecha_emision')
+    cursor = request.GET.get('cursor')
+    antes = request.GET.get('antes')
+    ordenes_pendientes, cursor_anterior, cursor_siguiente = pagina_pendientes(cursor, antes=antes)
 
     contexto = {
         'ordenes': ordenes_pendientes,
+        'cursor': cursor,
+        'antes': antes,
+        'cursor_anterior': cursor_anterior,
+        'cursor_siguiente': cursor_siguiente,
     }
     return render(request, 'operaciones/bandeja_autorizaciones.html', contexto)
 
+@login_required
+@require_POST
+def resolver_autorizaciones_lote(request):
+    """
+    Aprueba o rechaza en una sola transacción las OS marcadas en la bandeja.
+    """
+    if not supervisor_check(request.user):
+        return HttpResponseForbidden("No tiene permisos para realizar esta acción.")
+
+    os_ids = request.POST.getlist('os_ids')
+    accion = request.POST.get('accion')
+    motivo = request.POST.get('motivo_rechazo', '').strip()
+
+    if not os_ids:
+        messages.warning(request, "Seleccione al menos una solicitud de OS.")
+    elif accion == 'rechazar' and not motivo:
+        messages.warning(request, "Indique el motivo del rechazo.")
+    elif accion in ('aprobar', 'rechazar'):
+        resueltas = resolver_autorizaciones(os_ids, request.user, aprobar=accion == 'aprobar', motivo_rechazo=motivo)
+        if accion == 'aprobar':
+            messages.success(request, f"Se aprobaron {len(resueltas)} órdenes de servicio.")
+        else:
+            messages.warning(request, f"Se rechazaron {len(resueltas)} solicitudes de OS.")
+
+    url = reverse('bandeja_autorizaciones')
+    pagina = {campo: request.POST[campo] for campo in ('cursor', 'antes') if request.POST.get(campo)}
+    if pagina:
+        url += '?' + urlencode(pagina)
+    return redirect(url)
+
+# Cada cuánto revisa el stream el contador en caché, y cada cuánto manda un comentario para mantener viva la conexión.
+INTERVALO_EVENTOS = 3
+INTERVALO_KEEPALIVE = 30
+# Ninguna conexión queda abierta indefinidamente: al cumplirse la duración se cierra y el
+# EventSource del navegador se reconecta pasados `retry` milisegundos.
+DURACION_STREAM = 5 * 60
+# Por WSGI cada respuesta ocupa un worker, así que se envía un solo evento y el navegador
+# vuelve a consultar (sondeo) tras este intervalo.
+REINTENTO_WSGI = 15
+
+@login_required
+async def eventos_autorizaciones(request):
+    """
+    Server-Sent Events con el número de OS pendientes de autorización para la cabecera de
+    los supervisores. El contador se lee de la caché (notificaciones.contar_pendientes), que
+    solo cuenta en la base de datos cuando no está en caché.
+
+    Por ASGI (aegis_project/asgi.py) la conexión envía un evento cada vez que el contador
+    cambia y se cierra a los DURACION_STREAM segundos. Por WSGI se responde un solo evento y
+    el navegador repite la consulta cada REINTENTO_WSGI segundos, sin retener el worker.
+    """
+    user = await request.auser()
+    if not supervisor_check(user):
+        return HttpResponseForbidden("No tiene permisos para acceder a esta página.")
+
+    if not isinstance(request, ASGIRequest):
+        total = await sync_to_async(contar_pendientes)()
+        response = StreamingHttpResponse(
+            [f"retry: {REINTENTO_WSGI * 1000}\nevent: pendientes\ndata: {total}\n\n"],
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def eventos():
+        ultimo = None
+        silencio = 0
+        transcurrido = 0
+        yield f"retry: {INTERVALO_EVENTOS * 1000}\n\n"
+        while transcurrido < DURACION_STREAM:
+            total = await sync_to_async(contar_pendientes)()
+            if total != ultimo:
+                ultimo, silencio = total, 0
+                yield f"event: pendientes\ndata: {total}\n\n"
+            elif silencio >= INTERVALO_KEEPALIVE:
+                silencio = 0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(INTERVALO_EVENTOS)
+            silencio += INTERVALO_EVENTOS
+            transcurrido += INTERVALO_EVENTOS
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def aprobar_os(request, os_id):
     """
@@ -350,12 +572,7 @@ def mapa_access_check(user):
     """
     Verifica si un usuario tiene permiso para ver el mapa.
     """
-    if user.is_superuser:
-        return True
-    if hasattr(user, 'rol') and user.rol:
-        rol_nombre = user.rol.nombre_rol.lower()
-        return 'convenios' in rol_nombre or 'operaciones' in rol_nombre or 'supervisor' in rol_nombre
-    return False
+    return perfil_de(user).acceso_mapa
 
 @login_required
 def mapa_proveedores(request):
@@ -366,32 +583,45 @@ def mapa_proveedores(request):
 
 @login_required
 def proveedores_activos_api(request):
+    # Los permisos se revisan antes que el ETag: sin ellos no se responde ni un 304.
     if not mapa_access_check(request.user):
         return JsonResponse({'error': 'No autorizado'}, status=403)
+    return _geografia_json(request)
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_geografia)
+def _geografia_json(request):
+    return JsonResponse(obtener_geografia()[1])
 
 @login_required
-def proveedores_activos_api(request):
-    puntos_activos = PuntoAtencion.objects.filter(activo=True, proveedor__activo=True)
-    
-    estados = list(puntos_activos.values_list('estado', flat=True).distinct())
-    ciudades = {}
-    for estado in estados:
-        ciudades[estado] = list(puntos_activos.filter(estado=estado).values_list('ciudad', flat=True).distinct())
-
-    data = {
-        'estados': estados,
-        'ciudades': ciudades,
-    }
-    return JsonResponse(data)
+def mapa_estados_api(request):
+    """Geometría de los estados con proveedores activos y sus puntos, en una sola respuesta (ver gestion.mapa)."""
+    if not mapa_access_check(request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    return _mapa_estados(request)
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_mapa_estados)
+def _mapa_estados(request):
+    return respuesta_mapa_estados(request)
+
+@login_required
+def siniestralidad_api(request):
+    """
+    Siniestralidad agrupada desde el resumen mensual: ?por=cliente,mes&desde=AAAA-MM&hasta=AAAA-MM
+    y filtros opcionales cliente, plan, aseguradora, ente y categoria. No toca las OS.
+    """
+    if not supervisor_check(request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    try:
+        filas = consultar_siniestralidad(**parametros_consulta(request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e) or 'Parámetros no válidos.'}, status=400)
+    return JsonResponse({'actualizado_al': marca_siniestralidad(), 'filas': filas})
 
 # --- NUEVA FUNCIÓN DE PERMISOS PARA OPERACIONES ---
 def operaciones_access_check(user):
     """
     Verifica si un usuario pertenece al flujo de operaciones (Operador o Supervisor).
     """
-    if user.is_superuser:
-        return True
-    if hasattr(user, 'rol') and user.rol:
-        rol_nombre = user.rol.nombre_rol.lower()
-        return 'operaciones' in rol_nombre or 'supervisor' in rol_nombre
-    return False
\ No newline at end of file
+    return perfil_de(user).acceso_operaciones